@@ -5,6 +5,13 @@ from . import models
 admin.site.register(models.UserProfile)
 admin.site.register(models.Loan)
 admin.site.register(models.LoanTransactionDetail)
+admin.site.register(models.EMISchedule)
 admin.site.register(models.TransactionStore)
 admin.site.register(models.EMITransaction)
-
+admin.site.register(models.AccountBalance)
+admin.site.register(models.IdempotencyKey)
+admin.site.register(models.CreditScoreQueue)
+admin.site.register(models.TransactionMonthSummary)
+admin.site.register(models.TransactionArchive)
+admin.site.register(models.EMITransactionArchive)
+admin.site.register(models.DailyBalanceSnapshot)
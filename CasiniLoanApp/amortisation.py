@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+# Schedules are computed in whole cents (int64) inside numpy. Amounts enter as
+# Decimal, are rounded half up once at the boundary, and interest is rounded half
+# up from exact integers, so every cent matches scalar_installments().
+
+CENT = Decimal("0.01")
+# Monthly interest in cents is balance_cents * rate_millis / RATE_SCALE, with the
+# annual rate in thousandths of a percent (Loan.interest_rate has 3 places).
+RATE_SCALE = 1_200_000
+
+
+def to_decimal(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def to_money(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def scaled(values, places):
+    return np.array(
+        [
+            int(Decimal(str(value)).scaleb(places).quantize(1, rounding=ROUND_HALF_UP))
+            for value in values
+        ],
+        dtype=np.int64,
+    )
+
+
+def monthly_emi(principal, annual_rate, term):
+    principal, annual_rate = Decimal(str(principal)), Decimal(str(annual_rate))
+    if not annual_rate:
+        return (principal / term).quantize(CENT, rounding=ROUND_HALF_UP)
+    rate = annual_rate / 1200
+    growth = (1 + rate) ** term
+    return (principal * rate * growth / (growth - 1)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+# Interest for one month in whole cents, rounded half up.
+def monthly_interest(balance_cents, rate_millis):
+    return (2 * balance_cents * rate_millis + RATE_SCALE) // (2 * RATE_SCALE)
+
+
+# EMIs fall due on the 1st of the month following disbursal.
+def first_due_date(disbursal_date):
+    if isinstance(disbursal_date, datetime):
+        disbursal_date = disbursal_date.date()
+    return (np.datetime64(disbursal_date, "M") + 1).astype("datetime64[D]").item()
+
+
+def due_dates(first_due, count):
+    months = np.datetime64(first_due, "M") + np.arange(count)
+    return months.astype("datetime64[D]").tolist()
+
+
+def split_evenly(amount, count):
+    if count <= 0:
+        return []
+    total_cents = int(scaled([amount], 2)[0])
+    cents = np.full(count, total_cents // count, dtype=np.int64)
+    cents[-1] += total_cents - cents.sum()
+    return [to_decimal(value) for value in cents]
+
+
+@dataclass
+class Schedules:
+    terms: np.ndarray
+    emi_cents: np.ndarray
+    principal_cents: np.ndarray
+    interest_cents: np.ndarray
+    balance_cents: np.ndarray
+    due_dates: np.ndarray
+
+    def __len__(self):
+        return len(self.terms)
+
+    def monthly_emi(self, index):
+        return to_decimal(self.emi_cents[index])
+
+    # Principal still owed once `installments_paid` installments are paid, per loan.
+    def balance_after(self, installments_paid):
+        paid = np.clip(np.asarray(installments_paid, dtype=np.int64), 0, self.terms)
+        rows = np.arange(len(self.terms))
+        owed = self.balance_cents[rows, np.maximum(paid - 1, 0)]
+        return np.where(paid > 0, owed, self.principal_cents.sum(axis=1))
+
+    def installments(self, index):
+        term = int(self.terms[index])
+        # tolist() once per loan; indexing numpy scalars row by row is several times slower.
+        principals = self.principal_cents[index, :term].tolist()
+        interests = self.interest_cents[index, :term].tolist()
+        balances = self.balance_cents[index, :term].tolist()
+        dates = self.due_dates[index, :term].tolist()
+        rows = []
+        for k in range(term):
+            principal = to_decimal(principals[k])
+            interest = to_decimal(interests[k])
+            rows.append(
+                {
+                    "installment": k + 1,
+                    "due_date": dates[k],
+                    "amount_due": principal + interest,
+                    "principal": principal,
+                    "interest": interest,
+                    "balance": to_decimal(balances[k]),
+                }
+            )
+        return rows
+
+
+# Full amortisation tables for a batch of loans; rows are padded to the longest term.
+# Months are stepped in order, each step covering every loan at once.
+def build_schedules(principals, annual_rates, terms, first_due_dates):
+    terms = np.asarray(terms, dtype=np.int64)
+    principals = list(principals)
+    annual_rates = list(annual_rates)
+    rate_millis = scaled(annual_rates, 3)
+    emi_cents = scaled(
+        [
+            monthly_emi(principal, rate, term)
+            for principal, rate, term in zip(principals, annual_rates, terms.tolist())
+        ],
+        2,
+    )
+
+    max_term = int(terms.max()) if terms.size else 0
+    principal_cents = np.zeros((len(terms), max_term), dtype=np.int64)
+    interest_cents = np.zeros_like(principal_cents)
+    balance_cents = np.zeros_like(principal_cents)
+
+    # Every installment but the last charges exactly the EMI; the last one clears
+    # whatever principal is left plus its own interest.
+    balance = scaled(principals, 2)
+    for month in range(max_term):
+        active = month < terms
+        interest = monthly_interest(balance, rate_millis)
+        principal = np.where(month == terms - 1, balance, emi_cents - interest)
+        principal_cents[:, month] = np.where(active, principal, 0)
+        interest_cents[:, month] = np.where(active, interest, 0)
+        balance = balance - principal_cents[:, month]
+        balance_cents[:, month] = balance
+
+    first_months = np.asarray(first_due_dates, dtype="datetime64[M]")
+    return Schedules(
+        terms=terms,
+        emi_cents=emi_cents,
+        principal_cents=principal_cents,
+        interest_cents=interest_cents,
+        balance_cents=balance_cents,
+        due_dates=(first_months[:, None] + np.arange(max_term)).astype("datetime64[D]"),
+    )
+
+
+# One loan at a time in Decimal, rounding half up; the reference build_schedules
+# is checked against.
+def scalar_installments(principal, annual_rate, term, first_due):
+    annual_rate = Decimal(str(annual_rate))
+    emi = monthly_emi(principal, annual_rate, term)
+    balance = to_money(principal)
+    rows = []
+    for k in range(term):
+        month = first_due.month - 1 + k
+        interest = (balance * annual_rate / 1200).quantize(CENT, rounding=ROUND_HALF_UP)
+        principal_paid = balance if k == term - 1 else emi - interest
+        balance -= principal_paid
+        rows.append(
+            {
+                "installment": k + 1,
+                "due_date": date(first_due.year + month // 12, month % 12 + 1, 1),
+                "amount_due": principal_paid + interest,
+                "principal": principal_paid,
+                "interest": interest,
+                "balance": balance,
+            }
+        )
+    return rows
@@ -0,0 +1,193 @@
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, IntegerField, Value
+from django.utils import timezone
+
+from .balances import refresh_balances
+from .models import (
+    EMITransaction,
+    EMITransactionArchive,
+    TransactionArchive,
+    TransactionMonthSummary,
+    TransactionStore,
+)
+from .routers import replica_reads
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+@dataclass
+class ArchiveReport:
+    cutoff: date = None
+    transactions_rolled_up: int = 0
+    summaries_written: int = 0
+    emi_transactions_moved: int = 0
+    elapsed: float = 0.0
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime(day.year, day.month, day.day))
+
+
+# First day of the oldest month kept hot; everything dated before it is a closed period.
+def closed_period_cutoff(today=None, hot_months=None):
+    today = today or date.today()
+    hot_months = settings.ARCHIVE_HOT_MONTHS if hot_months is None else hot_months
+    months = today.year * 12 + today.month - 1 - hot_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+# Rolls one batch of closed-period bank transactions into monthly summaries and
+# moves the rows to TransactionArchive. Balances are refreshed first, so
+# AccountBalance (and with it the credit score) already counts every row that
+# leaves the hot table.
+def roll_up_transactions(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    with transaction.atomic():
+        rows = list(
+            TransactionStore.objects.filter(transaction_date__lt=start_of_day(cutoff))
+            .order_by("id")
+            .values("id", "aadhar_id", "user_id", "amount", "transaction_type", "transaction_date")[
+                :batch_size
+            ]
+        )
+        if not rows:
+            return 0, 0
+        refresh_balances(row["aadhar_id"] for row in rows)
+
+        totals = defaultdict(lambda: {"amount": 0, "count": 0, "last_id": 0, "user_id": None})
+        for row in rows:
+            key = (row["aadhar_id"], month_start(row["transaction_date"]), row["transaction_type"])
+            bucket = totals[key]
+            bucket["amount"] += row["amount"]
+            bucket["count"] += 1
+            bucket["last_id"] = max(bucket["last_id"], row["id"])
+            bucket["user_id"] = bucket["user_id"] or row["user_id"]
+
+        existing = {
+            (summary.aadhar_id, summary.period, summary.transaction_type): summary
+            for summary in TransactionMonthSummary.objects.select_for_update().filter(
+                aadhar_id__in={aadhar_id for aadhar_id, _, _ in totals},
+                period__in={period for _, period, _ in totals},
+            )
+        }
+        to_create, to_update = [], []
+        for (aadhar_id, period, transaction_type), bucket in totals.items():
+            summary = existing.get((aadhar_id, period, transaction_type))
+            if summary is None:
+                summary = TransactionMonthSummary(
+                    aadhar_id=aadhar_id, period=period, transaction_type=transaction_type
+                )
+                to_create.append(summary)
+            else:
+                to_update.append(summary)
+            summary.amount += bucket["amount"]
+            summary.transaction_count += bucket["count"]
+            summary.last_transaction_id = max(summary.last_transaction_id, bucket["last_id"])
+            summary.user_id = summary.user_id or bucket["user_id"]
+
+        TransactionMonthSummary.objects.bulk_create(to_create, batch_size=500)
+        TransactionMonthSummary.objects.bulk_update(
+            to_update, ["amount", "transaction_count", "last_transaction_id", "user"], batch_size=500
+        )
+        TransactionArchive.objects.bulk_create(
+            [
+                TransactionArchive(period=month_start(row["transaction_date"]), **row)
+                for row in rows
+            ],
+            batch_size=500,
+        )
+        TransactionStore.objects.filter(id__in=[row["id"] for row in rows]).delete()
+    return len(rows), len(totals)
+
+
+# Moves one batch of closed-period EMI payments of closed loans into the archive.
+# Statements are only served for active loans, so they never need these rows.
+def move_emi_transactions(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    with transaction.atomic():
+        rows = list(
+            EMITransaction.objects.filter(
+                payment_date__lt=start_of_day(cutoff), loan__loan__is_active=False
+            )
+            .order_by("id")[:batch_size]
+        )
+        if not rows:
+            return 0
+        EMITransactionArchive.objects.bulk_create(
+            [
+                EMITransactionArchive(
+                    id=row.id,
+                    user_id=row.user_id,
+                    loan_id=row.loan_id,
+                    payment=row.payment,
+                    payment_date=row.payment_date,
+                    external_ref=row.external_ref,
+                    period=month_start(row.payment_date),
+                )
+                for row in rows
+            ],
+            batch_size=500,
+        )
+        EMITransaction.objects.filter(id__in=[row.id for row in rows]).delete()
+    return len(rows)
+
+
+def archive_closed_periods(cutoff=None, batch_size=DEFAULT_BATCH_SIZE):
+    report = ArchiveReport(cutoff=cutoff or closed_period_cutoff())
+    started = time.perf_counter()
+    while True:
+        rolled_up, summaries = roll_up_transactions(report.cutoff, batch_size)
+        report.transactions_rolled_up += rolled_up
+        report.summaries_written += summaries
+        if rolled_up < batch_size:
+            break
+    while True:
+        moved = move_emi_transactions(report.cutoff, batch_size)
+        report.emi_transactions_moved += moved
+        if moved < batch_size:
+            break
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+# Bank history of one aadhar: raw hot rows plus one row per archived month and type,
+# newest first. `since` limits the result to rows dated on or after it; when it falls
+# inside the hot window the archive is not read at all.
+@replica_reads()
+def transaction_history(aadhar_id, since=None):
+    hot = TransactionStore.objects.filter(aadhar_id=aadhar_id)
+    if since:
+        hot = hot.filter(transaction_date__gte=start_of_day(since))
+    hot = hot.values(
+        "transaction_type",
+        "amount",
+        date=F("transaction_date__date"),
+        transactions=Value(1, output_field=IntegerField()),
+    )
+    if since and since >= closed_period_cutoff():
+        return list(hot.order_by("-date"))
+
+    archived = TransactionMonthSummary.objects.filter(aadhar_id=aadhar_id)
+    if since:
+        archived = archived.filter(period__gte=month_start(since))
+    archived = archived.values(
+        "transaction_type", "amount", date=F("period"), transactions=F("transaction_count")
+    )
+    return list(hot.union(archived, all=True).order_by("-date"))
+
+
+# Every EMI payment of a loan, archived or not, oldest first.
+@replica_reads()
+def loan_payments(loan_id):
+    fields = ("id", "payment_date", "payment", "external_ref")
+    hot = EMITransaction.objects.filter(loan_id=loan_id).values(*fields)
+    archived = EMITransactionArchive.objects.filter(loan_id=loan_id).values(*fields)
+    return list(hot.union(archived, all=True).order_by("payment_date", "id"))
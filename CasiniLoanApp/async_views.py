@@ -0,0 +1,228 @@
+import uuid
+
+import orjson
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+
+from . import pagination, statement_cache
+from .renderers import dumps
+from .models import Loan, LoanTransactionDetail, UserProfile
+from .serializers import ApplyLoanSerializer, AsyncUserSerializer
+from .views import LoanViewApi, PaymentViewApi, StatementViewApi
+
+# Async counterparts of the four API views for serving under ASGI. Request and
+# response bodies match views.py; only the database access is awaited.
+
+
+def respond(body, status_code=status.HTTP_200_OK):
+    return HttpResponse(dumps(body), status=status_code, content_type="application/json")
+
+
+# Same header and messages as rest_framework.authentication.TokenAuthentication.
+async def authenticate(request):
+    parts = request.headers.get("Authorization", "").split()
+    if len(parts) != 2 or parts[0].lower() != "token":
+        raise exceptions.NotAuthenticated()
+    try:
+        token = await Token.objects.select_related("user").aget(key=parts[1])
+    except Token.DoesNotExist:
+        raise exceptions.AuthenticationFailed("Invalid token.")
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed("User inactive or deleted.")
+    return token.user
+
+
+class AsyncApiView(View):
+    JSON_ERROR = {"result": "error", "message": "Json decoding error"}
+    JSON_ERROR_REGISTER = {"result": "error", "message": "Json decoding error!"}
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await authenticate(request)
+        except exceptions.APIException as e:
+            return respond({"detail": e.detail}, e.status_code)
+        return await super().dispatch(request, *args, **kwargs)
+
+    def parse(self, request):
+        return orjson.loads(request.body or b"null")
+
+
+# (POST) User Registration, async
+class AsyncUserView(AsyncApiView):
+    async def post(self, request):
+        try:
+            data = self.parse(request)
+        except ValueError:
+            return respond(self.JSON_ERROR_REGISTER, status.HTTP_400_BAD_REQUEST)
+
+        serializer = AsyncUserSerializer(data=data)
+        if not serializer.is_valid():
+            return respond(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+        # The unique index does the aadhar check instead of a SELECT before the INSERT.
+        try:
+            user = await UserProfile.objects.acreate(
+                name=data["name"],
+                email_id=data["email_id"],
+                aadhar_id=data["aadhar_id"],
+                annual_income=data["annual_income"],
+            )
+        except IntegrityError:
+            return respond(
+                {"aadhar_id": ["user profile with this aadhar id already exists."]},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        return respond(
+            {"id": user.id, "message": "User registered successfully!"},
+            status.HTTP_201_CREATED,
+        )
+
+
+# (POST) Loan Apply, async
+class AsyncLoanView(AsyncApiView):
+    rules = LoanViewApi()
+
+    async def post(self, request):
+        try:
+            data = self.parse(request)
+        except ValueError:
+            return respond(self.JSON_ERROR_REGISTER, status.HTTP_400_BAD_REQUEST)
+
+        serializer = ApplyLoanSerializer(data=data)
+        if not serializer.is_valid():
+            return respond({"error": serializer.errors}, status.HTTP_400_BAD_REQUEST)
+
+        body, status_code = await self.process_loan_application(serializer.validated_data)
+        return respond(body, status_code)
+
+    async def process_loan_application(self, data):
+        if data["interest_rate"] < 14:
+            return {"error": "Interest rate should be greater than 14%!"}, status.HTTP_400_BAD_REQUEST
+
+        try:
+            user = await UserProfile.objects.aget(id=data["unique_user_id"])
+        except UserProfile.DoesNotExist:
+            return {"error": "User does not exist!"}, status.HTTP_400_BAD_REQUEST
+
+        if await Loan.objects.filter(user_id=user.id).aexists():
+            return {"error": "User previous loan already exists!"}, status.HTTP_400_BAD_REQUEST
+        if not self.rules.check_user_eligibility(user):
+            return {"error": "User is not eligible for the loan!"}, status.HTTP_400_BAD_REQUEST
+
+        emi_details = self.rules.calculate_emi(
+            user,
+            data["loan_amount"],
+            data["interest_rate"],
+            data["term_period"],
+            data["disbursement_date"],
+        )
+        if isinstance(emi_details, tuple):
+            return emi_details
+
+        # Django 4.1 has no async transactions, so the three inserts run in a worker
+        # thread inside LoanViewApi.create_loan's atomic block.
+        loan, _ = await sync_to_async(self.rules.create_loan)(user, data, emi_details)
+        return {"loan_id": loan.id, "due_dates": emi_details["due_dates"]}, status.HTTP_200_OK
+
+
+# (POST) Loan Payment, async. Django 4.1 has no async transactions, so the locked
+# write path of PaymentViewApi runs in a worker thread; parsing, auth and the
+# response stay on the event loop.
+class AsyncPaymentView(AsyncApiView):
+    payments = PaymentViewApi()
+
+    async def post(self, request):
+        try:
+            data = self.parse(request)
+        except ValueError:
+            return respond(self.JSON_ERROR, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            response = await sync_to_async(self.payments.make_loan_payment)(
+                data, request.headers.get("Idempotency-Key")
+            )
+        except exceptions.ValidationError as e:
+            return respond(e.detail, status.HTTP_400_BAD_REQUEST)
+        return respond(response.data, response.status_code)
+
+
+# (GET) Loan Statement, async. Shares cache entries with StatementViewApi; exports
+# stay on the sync view because Django 4.1 cannot stream async iterators.
+class AsyncStatementView(AsyncApiView):
+    statements = StatementViewApi()
+
+    async def get(self, request):
+        try:
+            data = self.parse(request)
+        except ValueError:
+            return respond(self.JSON_ERROR, status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict) or "loan_id" not in data:
+            return respond({"loan_id": ["This field is required."]}, status.HTTP_400_BAD_REQUEST)
+        if data.get("export"):
+            return respond(
+                {"error": "Exports are served by /api/get-statement/"},
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            loan_id = uuid.UUID(str(data["loan_id"]))
+            body, status_code = await statement_cache.aget_or_build(
+                loan_id,
+                self.statements.statement_variant(data),
+                lambda: self.build_statement(loan_id, data),
+            )
+        except (LoanTransactionDetail.DoesNotExist, ValueError):
+            return respond(
+                {"error": "Loan doesn't exist. Passed Loan id is incorrect"},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        except pagination.InvalidCursor as e:
+            return respond({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+        return respond(body, status_code)
+
+    async def build_statement(self, loan_id, data):
+        statements = self.statements
+        loan_details = await LoanTransactionDetail.objects.select_related("loan").aget(
+            loan_id=loan_id
+        )
+        loan = loan_details.loan
+
+        if not loan_details.is_active:
+            return statements.INACTIVE_ERROR, status.HTTP_400_BAD_REQUEST
+
+        user_txn = statements.get_user_txn(loan)
+        installments = statements.get_upcoming_installments(loan)
+        if not any(data.get(key) for key in ("page_size", "prev_cursor", "upcoming_cursor")):
+            response = {
+                "prev_txn": statements.get_prev_txn([txn async for txn in user_txn], loan),
+                "upcoming_transactions": statements.format_upcoming(
+                    [row async for row in installments]
+                ),
+            }
+            return response, status.HTTP_200_OK
+
+        page_size = pagination.page_size_from(data.get("page_size"))
+        prev_rows, prev_cursor = await pagination.akeyset_page(
+            user_txn, statements.PREV_TXN_ORDER, data.get("prev_cursor"), page_size
+        )
+        upcoming_rows, upcoming_cursor = await pagination.akeyset_page(
+            installments, statements.UPCOMING_ORDER, data.get("upcoming_cursor"), page_size
+        )
+        response = {
+            "prev_txn": statements.get_prev_txn(prev_rows, loan),
+            "prev_txn_next_cursor": prev_cursor,
+            "upcoming_transactions": statements.format_upcoming(upcoming_rows),
+            "upcoming_next_cursor": upcoming_cursor,
+        }
+        return response, status.HTTP_200_OK
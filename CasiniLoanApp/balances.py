@@ -0,0 +1,153 @@
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import AccountBalance, TransactionMonthSummary, TransactionStore
+
+ZERO = Decimal("0")
+REFRESH_CHUNK_SIZE = 500
+BALANCE_FIELDS = ["credit_total", "debit_total", "last_transaction_id", "updated_at"]
+
+Drift = namedtuple(
+    "Drift",
+    ["aadhar_id", "stored_credit", "expected_credit", "stored_debit", "expected_debit"],
+)
+
+
+# One GROUP BY aadhar_id query with conditional sums per transaction type.
+def totals_query(queryset):
+    return (
+        queryset.order_by()
+        .values("aadhar_id")
+        .annotate(
+            credit=Sum("amount", filter=Q(transaction_type="credit")),
+            debit=Sum("amount", filter=Q(transaction_type="debit")),
+            last_id=Max("id"),
+        )
+    )
+
+
+def totals_by_aadhar(queryset):
+    return {
+        row["aadhar_id"]: {
+            "credit": row["credit"] or ZERO,
+            "debit": row["debit"] or ZERO,
+            "last_id": row["last_id"],
+        }
+        for row in totals_query(queryset)
+    }
+
+
+# Adds the closed months that archive.roll_up_transactions moved out of TransactionStore.
+def add_archived_totals(totals):
+    archived = (
+        TransactionMonthSummary.objects.order_by()
+        .values("aadhar_id")
+        .annotate(
+            credit=Sum("amount", filter=Q(transaction_type="credit")),
+            debit=Sum("amount", filter=Q(transaction_type="debit")),
+            last_id=Max("last_transaction_id"),
+        )
+    )
+    for row in archived:
+        account = totals.setdefault(
+            row["aadhar_id"], {"credit": ZERO, "debit": ZERO, "last_id": 0}
+        )
+        account["credit"] += row["credit"] or ZERO
+        account["debit"] += row["debit"] or ZERO
+        account["last_id"] = max(account["last_id"], row["last_id"])
+    return totals
+
+
+# Folds TransactionStore rows newer than each account's watermark into its AccountBalance.
+def refresh_balances(aadhar_ids):
+    aadhar_ids = list(set(aadhar_ids))
+    refreshed = {}
+    for start in range(0, len(aadhar_ids), REFRESH_CHUNK_SIZE):
+        chunk = aadhar_ids[start : start + REFRESH_CHUNK_SIZE]
+        with transaction.atomic():
+            AccountBalance.objects.bulk_create(
+                [AccountBalance(aadhar_id=aadhar_id) for aadhar_id in chunk],
+                ignore_conflicts=True,
+            )
+            balances = {
+                balance.aadhar_id: balance
+                for balance in AccountBalance.objects.select_for_update().filter(
+                    aadhar_id__in=chunk
+                )
+            }
+            watermark = AccountBalance.objects.filter(
+                aadhar_id=OuterRef("aadhar_id")
+            ).values("last_transaction_id")
+            pending = TransactionStore.objects.filter(
+                aadhar_id__in=chunk, id__gt=Coalesce(Subquery(watermark), 0)
+            )
+
+            changed = []
+            now = timezone.now()
+            for aadhar_id, totals in totals_by_aadhar(pending).items():
+                balance = balances[aadhar_id]
+                balance.credit_total += totals["credit"]
+                balance.debit_total += totals["debit"]
+                balance.last_transaction_id = totals["last_id"]
+                balance.updated_at = now
+                changed.append(balance)
+            AccountBalance.objects.bulk_update(changed, BALANCE_FIELDS)
+        refreshed.update(balances)
+    return refreshed
+
+
+# Rebuilds every AccountBalance from the full transaction history and reports accounts that drifted.
+def reconcile_balances(apply=True):
+    with transaction.atomic():
+        expected = add_archived_totals(totals_by_aadhar(TransactionStore.objects.all()))
+        stored = {
+            balance.aadhar_id: balance
+            for balance in AccountBalance.objects.select_for_update().iterator()
+        }
+
+        drift = []
+        to_update = []
+        to_create = []
+        now = timezone.now()
+        for aadhar_id in expected.keys() | stored.keys():
+            totals = expected.get(
+                aadhar_id, {"credit": ZERO, "debit": ZERO, "last_id": 0}
+            )
+            balance = stored.get(aadhar_id)
+            if balance is None:
+                drift.append(
+                    Drift(aadhar_id, None, totals["credit"], None, totals["debit"])
+                )
+                balance = AccountBalance(aadhar_id=aadhar_id)
+                to_create.append(balance)
+            else:
+                if (balance.credit_total, balance.debit_total) != (
+                    totals["credit"],
+                    totals["debit"],
+                ):
+                    drift.append(
+                        Drift(
+                            aadhar_id,
+                            balance.credit_total,
+                            totals["credit"],
+                            balance.debit_total,
+                            totals["debit"],
+                        )
+                    )
+                to_update.append(balance)
+            balance.credit_total = totals["credit"]
+            balance.debit_total = totals["debit"]
+            balance.last_transaction_id = totals["last_id"]
+            balance.updated_at = now
+
+        if apply:
+            AccountBalance.objects.bulk_update(
+                to_update, BALANCE_FIELDS, batch_size=1000
+            )
+            AccountBalance.objects.bulk_create(to_create, batch_size=1000)
+    return drift
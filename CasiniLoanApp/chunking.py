@@ -0,0 +1,17 @@
+# Splits an ordered stream of primary keys into (first_id, last_id) ranges of at
+# most chunk_size keys, so workers get two ids per chunk instead of a list.
+def id_ranges(ids, chunk_size):
+    ranges = []
+    first_id = last_id = None
+    count = 0
+    for pk in ids:
+        if first_id is None:
+            first_id = pk
+        last_id = pk
+        count += 1
+        if count == chunk_size:
+            ranges.append((first_id, last_id))
+            first_id, count = None, 0
+    if first_id is not None:
+        ranges.append((first_id, last_id))
+    return ranges
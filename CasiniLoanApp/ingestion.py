@@ -0,0 +1,185 @@
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .balances import refresh_balances
+from .models import TransactionStore, UserProfile
+from .scoring import mark_dirty
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+INGEST_FIELDS = ("aadhar_id", "amount", "transaction_type")
+# Rows without a date are stamped with the time they are loaded.
+OPTIONAL_FIELDS = ("transaction_date",)
+
+
+class RowValidationError(Exception):
+    pass
+
+
+@dataclass
+class IngestionReport:
+    rows_read: int = 0
+    rows_written: int = 0
+    rows_rejected: int = 0
+    start_offset: int = 0
+    end_offset: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self):
+        return self.rows_written / self.elapsed if self.elapsed else 0.0
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(
+        f"Cannot infer input format from '{path}', pass csv or jsonl explicitly."
+    )
+
+
+# Yields (byte offset after the line, csv header, raw line) so a load can resume by seeking.
+# Lines are left as bytes; parse_line decodes them, so a bad byte rejects only its row.
+def iter_lines(fp, fmt, start_offset=0):
+    offset = 0
+    fieldnames = None
+    if fmt == "csv":
+        header = fp.readline()
+        offset = len(header)
+        fieldnames = next(csv.reader([header.decode("utf-8-sig")]))
+
+    if start_offset > offset:
+        fp.seek(start_offset)
+        offset = start_offset
+
+    for line in fp:
+        offset += len(line)
+        line = line.strip()
+        if line:
+            yield offset, fieldnames, line
+
+
+def parse_line(fmt, fieldnames, line):
+    try:
+        text = line.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise RowValidationError(f"invalid UTF-8 at byte {e.start}")
+    if fmt == "csv":
+        return dict(zip(fieldnames, next(csv.reader([text]))))
+    try:
+        record = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise RowValidationError(f"invalid JSON: {e.msg}")
+    if not isinstance(record, dict):
+        raise RowValidationError("expected a JSON object")
+    return record
+
+
+def build_transaction(record):
+    values = {}
+    for name in INGEST_FIELDS + OPTIONAL_FIELDS:
+        if record.get(name) in (None, ""):
+            if name in OPTIONAL_FIELDS:
+                continue
+            raise RowValidationError(f"missing field '{name}'")
+        model_field = TransactionStore._meta.get_field(name)
+        raw = record[name]
+        if name == "transaction_type":
+            raw = str(raw).lower()
+        try:
+            values[name] = model_field.clean(raw, None)
+        except ValidationError as e:
+            raise RowValidationError(f"{name}: {'; '.join(e.messages)}")
+
+    if values["amount"] <= 0:
+        raise RowValidationError("amount: must be positive")
+    # Dates without an offset are read in TIME_ZONE.
+    transaction_date = values.get("transaction_date")
+    if transaction_date is not None and timezone.is_naive(transaction_date):
+        values["transaction_date"] = timezone.make_aware(transaction_date)
+    return TransactionStore(**values)
+
+
+def load_checkpoint(checkpoint_path):
+    try:
+        with open(checkpoint_path) as fp:
+            return json.load(fp)["offset"]
+    except FileNotFoundError:
+        return 0
+
+
+def save_checkpoint(checkpoint_path, offset, rows_written):
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump({"offset": offset, "rows_written": rows_written}, fp)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def link_users(batch):
+    users = dict(
+        UserProfile.objects.filter(aadhar_id__in={row.aadhar_id for row in batch}).values_list(
+            "aadhar_id", "id"
+        )
+    )
+    for row in batch:
+        row.user_id = users.get(row.aadhar_id)
+
+
+def write_batch(batch, batch_size):
+    link_users(batch)
+    with transaction.atomic():
+        TransactionStore.objects.bulk_create(batch, batch_size=batch_size)
+        refresh_balances({row.aadhar_id for row in batch})
+        mark_dirty(row.aadhar_id for row in batch)
+
+
+def ingest_transactions(
+    path,
+    fmt=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    checkpoint_path=None,
+    resume=False,
+):
+    fmt = fmt or detect_format(path)
+    start_offset = load_checkpoint(checkpoint_path) if checkpoint_path and resume else 0
+    report = IngestionReport(start_offset=start_offset, end_offset=start_offset)
+    batch = []
+
+    def flush(offset):
+        if batch:
+            write_batch(batch, batch_size)
+            report.rows_written += len(batch)
+            batch.clear()
+        report.end_offset = offset
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, offset, report.rows_written)
+
+    started = time.perf_counter()
+    with open(path, "rb") as fp:
+        for offset, fieldnames, line in iter_lines(fp, fmt, start_offset):
+            report.rows_read += 1
+            try:
+                batch.append(build_transaction(parse_line(fmt, fieldnames, line)))
+            except RowValidationError as e:
+                report.rows_rejected += 1
+                if len(report.errors) < MAX_REPORTED_ERRORS:
+                    report.errors.append({"offset": offset, "error": str(e)})
+
+            if len(batch) >= batch_size:
+                flush(offset)
+        flush(fp.tell())
+
+    # The checkpoint is left at the end of the file, so resuming a finished load is a no-op.
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,59 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from CasiniLoanApp.views import BulkLoanViewApi
+
+
+class Command(BaseCommand):
+    help = "Apply a partner file of loan applications (JSON list or JSONL) in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--batch-size", type=int, default=BulkLoanViewApi.MAX_APPLICATIONS
+        )
+        parser.add_argument(
+            "--output", help="Write one JSON result per application to this file."
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        try:
+            applications = self.read_applications(options["path"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        view = BulkLoanViewApi()
+        results = []
+        started = time.perf_counter()
+        for offset in range(0, len(applications), options["batch_size"]):
+            batch = applications[offset : offset + options["batch_size"]]
+            for result in view.process_loan_applications(batch):
+                result["index"] += offset
+                results.append(result)
+        elapsed = time.perf_counter() - started
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                for result in results:
+                    output.write(json.dumps(result, cls=DjangoJSONEncoder) + "\n")
+
+        accepted = sum(1 for result in results if "loan_id" in result)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {len(results)} applications in {elapsed:.2f}s: "
+                f"{accepted} accepted, {len(results) - accepted} rejected."
+            )
+        )
+
+    def read_applications(self, path):
+        with open(path) as source:
+            content = source.read().strip()
+        if content.startswith("["):
+            return json.loads(content)
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CasiniLoanApp.archive import DEFAULT_BATCH_SIZE, archive_closed_periods, closed_period_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll closed months of bank transactions into monthly summaries and move "
+        "closed loans' EMI payments into the archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--hot-months",
+            type=int,
+            help="Months kept hot besides the current one (default: ARCHIVE_HOT_MONTHS).",
+        )
+        parser.add_argument(
+            "--before",
+            type=date.fromisoformat,
+            help="Archive everything dated before this day instead (YYYY-MM-DD).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+        if options["hot_months"] is not None and options["hot_months"] < 0:
+            raise CommandError("--hot-months cannot be negative.")
+
+        cutoff = options["before"] or closed_period_cutoff(hot_months=options["hot_months"])
+        report = archive_closed_periods(cutoff, options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived everything before {report.cutoff}: "
+                f"{report.transactions_rolled_up} transactions into "
+                f"{report.summaries_written} monthly summaries, "
+                f"{report.emi_transactions_moved} EMI payments moved, {report.elapsed:.2f}s."
+            )
+        )
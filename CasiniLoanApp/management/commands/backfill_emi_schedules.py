@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from CasiniLoanApp import amortisation
+from CasiniLoanApp.models import EMISchedule, LoanTransactionDetail
+
+
+class Command(BaseCommand):
+    help = "Create EMISchedule rows for active loans that predate the schedule table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        details = (
+            LoanTransactionDetail.objects.filter(is_active=True, emi_rem__gt=0)
+            .exclude(loan__emi_schedule__isnull=False)
+            .select_related("loan")
+            .order_by("id")
+        )
+
+        created = 0
+        batch = []
+        for detail in details.iterator(chunk_size=options["batch_size"]):
+            loan = detail.loan
+            first_due = detail.new_emi_date or amortisation.first_due_date(
+                loan.disbursal_date
+            )
+            first_number = max(loan.loan_term - detail.emi_rem, 0) + 1
+            batch.extend(
+                EMISchedule(
+                    loan=loan,
+                    installment_no=first_number + offset,
+                    due_date=due_date,
+                    amount_due=amount,
+                )
+                for offset, (due_date, amount) in enumerate(
+                    zip(
+                        amortisation.due_dates(first_due, detail.emi_rem),
+                        amortisation.split_evenly(loan.rem_amount, detail.emi_rem),
+                    )
+                )
+            )
+            if len(batch) >= options["batch_size"]:
+                created += self.flush(batch)
+
+        created += self.flush(batch)
+        self.stdout.write(self.style.SUCCESS(f"Created {created} schedule rows."))
+
+    def flush(self, batch):
+        with transaction.atomic():
+            EMISchedule.objects.bulk_create(batch)
+        count = len(batch)
+        batch.clear()
+        return count
@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CasiniLoanApp.snapshots import build_snapshots
+
+
+class Command(BaseCommand):
+    help = "Build daily closing-balance snapshots for every closed day not snapshotted yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="Rebuild from this day (YYYY-MM-DD) instead of the first unbuilt day.",
+        )
+        parser.add_argument(
+            "--until", type=date.fromisoformat, help="Last day to build (default: yesterday)."
+        )
+
+    def handle(self, *args, **options):
+        if options["since"] and options["until"] and options["since"] > options["until"]:
+            raise CommandError("--since must not be after --until.")
+
+        report = build_snapshots(options["since"], options["until"])
+        if not report.days:
+            self.stdout.write("Snapshots are up to date.")
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built {report.snapshots} snapshots for {report.days} days "
+                f"({report.first_day} to {report.last_day}), {report.elapsed:.2f}s."
+            )
+        )
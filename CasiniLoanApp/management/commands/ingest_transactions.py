@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from CasiniLoanApp.ingestion import DEFAULT_BATCH_SIZE, ingest_transactions
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV/JSONL file of bank transactions into TransactionStore."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"], dest="fmt")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--checkpoint",
+            help="Checkpoint file (defaults to <path>.checkpoint).",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue from the offset recorded in the checkpoint file.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+        checkpoint_path = options["checkpoint"] or f"{options['path']}.checkpoint"
+
+        try:
+            report = ingest_transactions(
+                options["path"],
+                fmt=options["fmt"],
+                batch_size=options["batch_size"],
+                checkpoint_path=checkpoint_path,
+                resume=options["resume"],
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report.errors:
+            self.stderr.write(f"offset {error['offset']}: {error['error']}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Read {report.rows_read} rows from offset {report.start_offset}, "
+                f"wrote {report.rows_written}, rejected {report.rows_rejected} "
+                f"in {report.elapsed:.2f}s ({report.rows_per_second:,.0f} rows/s)."
+            )
+        )
@@ -0,0 +1,59 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CasiniLoanApp.ingestion import RowValidationError, detect_format, iter_lines, parse_line
+from CasiniLoanApp.views import BulkPaymentViewApi
+
+
+class Command(BaseCommand):
+    help = (
+        "Post a NACH/settlement file of EMI payments (CSV or JSONL with "
+        "loan_id, amount, external_ref). Rows already posted are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"], dest="fmt")
+        parser.add_argument("--batch-size", type=int, default=BulkPaymentViewApi.MAX_PAYMENTS)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        view = BulkPaymentViewApi()
+        counts = Counter()
+        started = time.perf_counter()
+        try:
+            fmt = options["fmt"] or detect_format(options["path"])
+            with open(options["path"], "rb") as fp:
+                batch, line_numbers = [], []
+                for line_number, (_, fieldnames, line) in enumerate(iter_lines(fp, fmt), start=1):
+                    try:
+                        batch.append(parse_line(fmt, fieldnames, line))
+                    except RowValidationError as e:
+                        counts["rejected"] += 1
+                        self.stderr.write(f"row {line_number}: {e}")
+                        continue
+                    line_numbers.append(line_number)
+                    if len(batch) == options["batch_size"]:
+                        self.post(view, batch, line_numbers, counts)
+                        batch, line_numbers = [], []
+                if batch:
+                    self.post(view, batch, line_numbers, counts)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Posted {counts['posted']}, skipped {counts['duplicate']} already posted, "
+                f"rejected {counts['rejected']} in {time.perf_counter() - started:.2f}s."
+            )
+        )
+
+    def post(self, view, batch, line_numbers, counts):
+        for result in view.post_payments(batch):
+            counts[result["status"]] += 1
+            if result["status"] == "rejected":
+                self.stderr.write(f"row {line_numbers[result['index']]}: {result['error']}")
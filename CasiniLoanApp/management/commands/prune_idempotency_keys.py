@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from CasiniLoanApp.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than --days."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7)
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be a positive integer.")
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} idempotency keys."))
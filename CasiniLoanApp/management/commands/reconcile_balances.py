@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from CasiniLoanApp.balances import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = "Rebuild AccountBalance rows from TransactionStore and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drift without rewriting the stored balances.",
+        )
+        parser.add_argument(
+            "--show", type=int, default=20, help="Drifted accounts to list."
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_balances(apply=not options["dry_run"])
+
+        for item in drift[: options["show"]]:
+            self.stdout.write(
+                f"{item.aadhar_id}: credit {item.stored_credit} -> {item.expected_credit}, "
+                f"debit {item.stored_debit} -> {item.expected_debit}"
+            )
+
+        action = "found" if options["dry_run"] else "rebuilt"
+        style = self.style.WARNING if drift else self.style.SUCCESS
+        self.stdout.write(style(f"{len(drift)} drifted account balances {action}."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from CasiniLoanApp.scoring import DEFAULT_CHUNK_SIZE, rescore_users
+
+
+class Command(BaseCommand):
+    help = "Recompute the credit score of every user from their account balance."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            "--dispatch",
+            action="store_true",
+            help="Fan chunks out to Celery workers as a chord instead of scoring them here.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be a positive integer.")
+
+        if options["dispatch"]:
+            from CasiniLoanApp.tasks import credit_score_workflow
+
+            result = credit_score_workflow(options["chunk_size"]).apply_async()
+            self.stdout.write(
+                self.style.SUCCESS(f"Queued credit score chord {result.id}.")
+            )
+            return
+
+        summary = rescore_users(options["chunk_size"])
+        bands = ", ".join(f"{band}: {count}" for band, count in summary.as_dict()["distribution"].items())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scored {summary.scored} users in {summary.chunks} chunks, "
+                f"{summary.elapsed:.2f}s ({summary.users_per_second:,.0f} users/s). {bands}"
+            )
+        )
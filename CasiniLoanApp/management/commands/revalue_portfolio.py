@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CasiniLoanApp.portfolio import DEFAULT_CHUNK_SIZE, revalue_portfolio
+
+
+class Command(BaseCommand):
+    help = "Recompute outstanding principal, accrued interest and next EMI for all active loans."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            "--as-of", type=date.fromisoformat, help="Valuation date (YYYY-MM-DD)."
+        )
+        parser.add_argument(
+            "--dispatch",
+            action="store_true",
+            help="Fan chunks out to Celery workers instead of processing them here.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be a positive integer.")
+
+        if options["dispatch"]:
+            from CasiniLoanApp.tasks import revalue_portfolio as revalue_portfolio_task
+
+            as_of = options["as_of"].isoformat() if options["as_of"] else None
+            chunks = revalue_portfolio_task(as_of, options["chunk_size"])
+            self.stdout.write(
+                self.style.SUCCESS(f"Queued {chunks} revaluation chunks.")
+            )
+            return
+
+        report = revalue_portfolio(options["as_of"], options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Revalued {report.processed} loans in {report.chunks} chunks, "
+                f"{report.elapsed:.2f}s ({report.loans_per_second:,.0f} loans/s), "
+                f"peak RSS {report.peak_rss_kb / 1024:.1f} MiB."
+            )
+        )
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+# Queries run by the request being served, or None outside a request. Shared with
+# the sync_to_async threads of async views, like profiling.current_profile.
+request_queries = ContextVar("request_queries", default=None)
+
+REQUESTS = Counter(
+    "casini_http_requests_total",
+    "HTTP requests served, by URL name, method and status.",
+    ["view", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "casini_http_request_duration_seconds",
+    "Time to serve an HTTP request, by URL name and method.",
+    ["view", "method"],
+)
+REQUEST_QUERIES = Histogram(
+    "casini_http_request_db_queries",
+    "Database queries run per HTTP request, by URL name.",
+    ["view"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 100, float("inf")),
+)
+QUERY_LATENCY = Histogram(
+    "casini_db_query_duration_seconds",
+    "Time to run one database query, by connection alias.",
+    ["alias"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, float("inf")),
+)
+TASK_RUNTIME = Histogram(
+    "casini_celery_task_duration_seconds",
+    "Time a Celery task spends running, by task name.",
+    ["task"],
+)
+TASK_QUEUE_WAIT = Histogram(
+    "casini_celery_task_queue_wait_seconds",
+    "Time between publishing a Celery task and a worker starting it, by task name.",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, float("inf")),
+)
+TASKS = Counter(
+    "casini_celery_tasks_total",
+    "Celery tasks finished, by task name and final state.",
+    ["task", "state"],
+)
+TASK_FAILURES = Counter(
+    "casini_celery_task_failures_total",
+    "Celery tasks that raised, by task name and exception type.",
+    ["task", "exception"],
+)
+
+# Start times of the tasks running in this process, by task id.
+_task_started = {}
+
+
+# With PROMETHEUS_MULTIPROC_DIR set, every gunicorn and Celery prefork process
+# writes its samples to that directory and a scrape sums them across processes.
+def scrape():
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead(pid):
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+# Installed on every database connection next to profiling.record_query (see signals.py).
+def record_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        QUERY_LATENCY.labels(context["connection"].alias).observe(time.perf_counter() - started)
+        queries = request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+
+
+def task_published(headers):
+    headers.setdefault("published_at", time.time())
+
+
+def task_started(task, task_id):
+    published_at = (task.request.headers or {}).get("published_at")
+    if published_at is not None:
+        TASK_QUEUE_WAIT.labels(task.name).observe(max(time.time() - published_at, 0))
+    _task_started[task_id] = time.perf_counter()
+
+
+def task_finished(task, task_id, state):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_RUNTIME.labels(task.name).observe(time.perf_counter() - started)
+    TASKS.labels(task.name, state or "UNKNOWN").inc()
+
+
+def task_failed(task, exception):
+    TASK_FAILURES.labels(task.name, type(exception).__name__).inc()
+
+
+# Counts and times every request by the name of the URL pattern it resolved to, so
+# label values stay bounded whatever paths clients send.
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        token = request_queries.set([0])
+        try:
+            response = self.get_response(request)
+            self.observe(request, response, started)
+            return response
+        finally:
+            request_queries.reset(token)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        token = request_queries.set([0])
+        try:
+            response = await self.get_response(request)
+            self.observe(request, response, started)
+            return response
+        finally:
+            request_queries.reset(token)
+
+    def observe(self, request, response, started):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match and match.url_name else "unmatched"
+        REQUESTS.labels(view, request.method, str(response.status_code)).inc()
+        REQUEST_LATENCY.labels(view, request.method).observe(time.perf_counter() - started)
+        REQUEST_QUERIES.labels(view).observe(request_queries.get()[0])
@@ -10,7 +10,7 @@ class Migration(migrations.Migration):
 
     operations = [
         migrations.RemoveField(
-            model_name="userprofile",
-            name="userprofile",
+            model_name="customer",
+            name="customer",
         ),
     ]
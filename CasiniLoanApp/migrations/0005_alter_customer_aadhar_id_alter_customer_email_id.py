@@ -10,12 +10,12 @@ class Migration(migrations.Migration):
 
     operations = [
         migrations.AlterField(
-            model_name="userprofile",
+            model_name="customer",
             name="aadhar_id",
             field=models.UUIDField(unique=True),
         ),
         migrations.AlterField(
-            model_name="userprofile",
+            model_name="customer",
             name="email_id",
             field=models.EmailField(max_length=254),
         ),
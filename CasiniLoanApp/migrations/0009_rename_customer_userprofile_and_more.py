@@ -0,0 +1,135 @@
+# Generated by Django 4.1.10 on 2026-10-18 14:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+RENAMED_MODELS = [
+    ("Customer", "UserProfile"),
+    ("AccountTransaction", "TransactionStore"),
+    ("Transaction", "EMITransaction"),
+    ("LoanDetail", "LoanTransactionDetail"),
+]
+
+
+def move_tables(apps, schema_editor, names):
+    existing = set(schema_editor.connection.introspection.table_names())
+    for old_name, new_name in names:
+        old_table = f"CasiniLoanApp_{old_name.lower()}"
+        new_table = f"CasiniLoanApp_{new_name.lower()}"
+        if old_table in existing and new_table not in existing:
+            model = apps.get_model("CasiniLoanApp", old_name)
+            schema_editor.alter_db_table(model, old_table, new_table)
+
+
+def rename_tables(apps, schema_editor):
+    move_tables(apps, schema_editor, RENAMED_MODELS)
+
+
+def unrename_tables(apps, schema_editor):
+    move_tables(
+        apps, schema_editor, [(new_name, old_name) for old_name, new_name in RENAMED_MODELS]
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0008_remove_transaction_remaining_amount"),
+    ]
+
+    operations = [
+        # Databases created before these renames already had their tables renamed by
+        # hand (only the columns kept their old names), so the tables are renamed
+        # only where the old one still exists.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameModel(old_name=old_name, new_name=new_name)
+                for old_name, new_name in RENAMED_MODELS
+            ],
+            database_operations=[
+                migrations.RunPython(rename_tables, unrename_tables),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="userprofile",
+            name="annual_income",
+            field=models.DecimalField(decimal_places=3, max_digits=15),
+        ),
+        migrations.AlterField(
+            model_name="transactionstore",
+            name="amount",
+            field=models.DecimalField(decimal_places=3, max_digits=15),
+        ),
+        migrations.RenameField(
+            model_name="loan",
+            old_name="customer",
+            new_name="user",
+        ),
+        migrations.RenameField(
+            model_name="loan",
+            old_name="remaining_amount",
+            new_name="rem_amount",
+        ),
+        migrations.AlterField(
+            model_name="loan",
+            name="rem_amount",
+            field=models.PositiveIntegerField(default=50),
+        ),
+        migrations.AlterField(
+            model_name="loan",
+            name="interest_rate",
+            field=models.DecimalField(decimal_places=3, max_digits=15),
+        ),
+        migrations.RenameField(
+            model_name="emitransaction",
+            old_name="customer",
+            new_name="user",
+        ),
+        migrations.AlterField(
+            model_name="emitransaction",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="user_transaction",
+                to="CasiniLoanApp.userprofile",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="emitransaction",
+            name="loan",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="loan_transaction",
+                to="CasiniLoanApp.loan",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="emitransaction",
+            name="payment",
+            field=models.DecimalField(decimal_places=3, max_digits=15),
+        ),
+        migrations.RenameField(
+            model_name="loantransactiondetail",
+            old_name="initial_emi_amounts",
+            new_name="init_emi_amounts",
+        ),
+        migrations.RenameField(
+            model_name="loantransactiondetail",
+            old_name="last_transaction_date",
+            new_name="last_txn_date",
+        ),
+        migrations.RenameField(
+            model_name="loantransactiondetail",
+            old_name="next_emi_date",
+            new_name="new_emi_date",
+        ),
+        migrations.RenameField(
+            model_name="loantransactiondetail",
+            old_name="next_emi_amount",
+            new_name="new_emi_amt",
+        ),
+        migrations.RenameField(
+            model_name="loantransactiondetail",
+            old_name="total_emis_left",
+            new_name="emi_rem",
+        ),
+    ]
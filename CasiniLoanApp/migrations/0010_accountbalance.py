@@ -0,0 +1,37 @@
+# Generated by Django 4.1.10 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0009_rename_customer_userprofile_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AccountBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("aadhar_id", models.UUIDField(unique=True)),
+                (
+                    "credit_total",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=20),
+                ),
+                (
+                    "debit_total",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=20),
+                ),
+                ("last_transaction_id", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
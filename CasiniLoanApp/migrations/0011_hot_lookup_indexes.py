@@ -0,0 +1,23 @@
+# Generated by Django 4.1.10 on 2026-10-18 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0010_accountbalance"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="emitransaction",
+            index=models.Index(fields=["user", "loan"], name="emi_txn_user_loan_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transactionstore",
+            index=models.Index(
+                fields=["aadhar_id", "transaction_type", "transaction_date"],
+                name="txn_aadhar_type_date_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.1.10 on 2026-10-18 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0011_hot_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="loantransactiondetail",
+            name="accrued_interest",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=15, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="loantransactiondetail",
+            name="outstanding_principal",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=15, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="loantransactiondetail",
+            name="revalued_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
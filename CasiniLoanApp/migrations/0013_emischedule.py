@@ -0,0 +1,67 @@
+# Generated by Django 4.1.10 on 2026-10-18 14:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0012_loantransactiondetail_revaluation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EMISchedule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("installment_no", models.PositiveIntegerField()),
+                ("due_date", models.DateField()),
+                ("amount_due", models.DecimalField(decimal_places=2, max_digits=15)),
+                (
+                    "amount_paid",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "pending"),
+                            ("partial", "partial"),
+                            ("paid", "paid"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "loan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="emi_schedule",
+                        to="CasiniLoanApp.loan",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="emischedule",
+            index=models.Index(
+                fields=["due_date", "status"], name="emi_schedule_due_status_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="emischedule",
+            constraint=models.UniqueConstraint(
+                fields=("loan", "installment_no"),
+                name="emi_schedule_loan_installment_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.10 on 2026-10-18 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0013_emischedule"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="emitransaction",
+            name="external_ref",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.10 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0015_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CreditScoreQueue",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("aadhar_id", models.UUIDField(unique=True)),
+                ("marked_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.1.10 on 2026-10-18 15:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import utils.abstract_models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0016_creditscorequeue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transactionstore",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="transactions",
+                to="CasiniLoanApp.userprofile",
+            ),
+        ),
+        # The key default is applied in Python, so only the migration state changes;
+        # SQLite would otherwise rebuild both tables just to record the new callable.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="loan",
+                    name="id",
+                    field=models.UUIDField(
+                        default=utils.abstract_models.uuid7,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="userprofile",
+                    name="id",
+                    field=models.UUIDField(
+                        default=utils.abstract_models.uuid7,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+            ],
+        ),
+    ]
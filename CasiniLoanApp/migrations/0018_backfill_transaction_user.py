@@ -0,0 +1,37 @@
+from django.db import migrations, transaction
+from django.db.models import Max, OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+# Links existing transactions to their user in id ranges, one short transaction per
+# batch, so a large TransactionStore is never locked for the whole backfill.
+def backfill_transaction_user(apps, schema_editor):
+    TransactionStore = apps.get_model("CasiniLoanApp", "TransactionStore")
+    UserProfile = apps.get_model("CasiniLoanApp", "UserProfile")
+    db_alias = schema_editor.connection.alias
+
+    transactions = TransactionStore.objects.using(db_alias)
+    last_id = transactions.aggregate(last_id=Max("id"))["last_id"] or 0
+    user_id = Subquery(
+        UserProfile.objects.using(db_alias)
+        .filter(aadhar_id=OuterRef("aadhar_id"))
+        .values("id")[:1]
+    )
+    for first_id in range(1, last_id + 1, BATCH_SIZE):
+        with transaction.atomic(using=db_alias):
+            transactions.filter(
+                id__gte=first_id, id__lt=first_id + BATCH_SIZE, user__isnull=True
+            ).update(user_id=user_id)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("CasiniLoanApp", "0017_uuid7_keys_transaction_user"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_transaction_user, migrations.RunPython.noop),
+    ]
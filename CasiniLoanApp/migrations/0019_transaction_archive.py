@@ -0,0 +1,98 @@
+# Generated by Django 4.1.10 on 2026-10-18 15:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0018_backfill_transaction_user"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransactionMonthSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("aadhar_id", models.UUIDField()),
+                ("period", models.DateField()),
+                (
+                    "transaction_type",
+                    models.CharField(
+                        choices=[("credit", "CREDIT"), ("debit", "DEBIT")],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=20),
+                ),
+                ("transaction_count", models.PositiveIntegerField(default=0)),
+                ("last_transaction_id", models.BigIntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="transaction_months",
+                        to="CasiniLoanApp.userprofile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="EMITransactionArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("payment", models.DecimalField(decimal_places=3, max_digits=15)),
+                ("payment_date", models.DateTimeField()),
+                (
+                    "external_ref",
+                    models.CharField(blank=True, max_length=64, null=True, unique=True),
+                ),
+                ("period", models.DateField(db_index=True)),
+                (
+                    "loan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_emi_transactions",
+                        to="CasiniLoanApp.loan",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_emi_transactions",
+                        to="CasiniLoanApp.userprofile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="transactionmonthsummary",
+            index=models.Index(fields=["period"], name="txn_month_period_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="transactionmonthsummary",
+            constraint=models.UniqueConstraint(
+                fields=("aadhar_id", "period", "transaction_type"),
+                name="txn_month_aadhar_period_type_uniq",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="emitransactionarchive",
+            index=models.Index(
+                fields=["user", "loan"], name="emi_archive_user_loan_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.1.10 on 2026-10-18 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0019_transaction_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyBalanceSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("aadhar_id", models.UUIDField()),
+                ("date", models.DateField()),
+                (
+                    "closing_balance",
+                    models.DecimalField(decimal_places=3, max_digits=20),
+                ),
+                (
+                    "credit_total",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=20),
+                ),
+                (
+                    "debit_total",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=20),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="transactionstore",
+            index=models.Index(fields=["transaction_date"], name="txn_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="dailybalancesnapshot",
+            index=models.Index(fields=["date"], name="balance_snapshot_date_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="dailybalancesnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("aadhar_id", "date"), name="balance_snapshot_aadhar_date_uniq"
+            ),
+        ),
+    ]
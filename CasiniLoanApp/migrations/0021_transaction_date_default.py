@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 15:41
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0020_daily_balance_snapshot"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="transactionstore",
+            name="transaction_date",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1.10 on 2026-10-18 15:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0021_transaction_date_default"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransactionArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("aadhar_id", models.UUIDField()),
+                ("amount", models.DecimalField(decimal_places=3, max_digits=15)),
+                (
+                    "transaction_type",
+                    models.CharField(
+                        choices=[("credit", "CREDIT"), ("debit", "DEBIT")],
+                        max_length=20,
+                    ),
+                ),
+                ("transaction_date", models.DateTimeField()),
+                ("period", models.DateField(db_index=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_transactions",
+                        to="CasiniLoanApp.userprofile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="transactionarchive",
+            index=models.Index(
+                fields=["aadhar_id", "transaction_date"],
+                name="txn_archive_aadhar_date_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.10 on 2026-10-18 15:45
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+# Snapshots built so far counted every transaction that existed when they ran, so
+# they start from the current newest id rather than rebuilding all history.
+def set_snapshot_watermark(apps, schema_editor):
+    TransactionStore = apps.get_model("CasiniLoanApp", "TransactionStore")
+    DailyBalanceSnapshot = apps.get_model("CasiniLoanApp", "DailyBalanceSnapshot")
+    db_alias = schema_editor.connection.alias
+
+    last_id = TransactionStore.objects.using(db_alias).aggregate(last_id=Max("id"))["last_id"]
+    DailyBalanceSnapshot.objects.using(db_alias).update(last_transaction_id=last_id or 0)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0022_transaction_archive_rows"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailybalancesnapshot",
+            name="last_transaction_id",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(set_snapshot_watermark, migrations.RunPython.noop),
+    ]
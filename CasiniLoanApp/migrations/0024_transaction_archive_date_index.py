@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("CasiniLoanApp", "0023_snapshot_transaction_watermark"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transactionarchive",
+            index=models.Index(
+                fields=["transaction_date"], name="txn_archive_date_idx"
+            ),
+        ),
+    ]
@@ -1,4 +1,9 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from utils.abstract_models import PrimaryKeyModel
 
 
@@ -38,6 +43,38 @@ class LoanTransactionDetail(models.Model):
     new_emi_date = models.DateField(blank=True, null=True)
     new_emi_amt = models.DecimalField(decimal_places=2, max_digits=10, blank=True, null=True)
     emi_rem = models.IntegerField()
+    outstanding_principal = models.DecimalField(decimal_places=2, max_digits=15, blank=True, null=True)
+    accrued_interest = models.DecimalField(decimal_places=2, max_digits=15, blank=True, null=True)
+    revalued_at = models.DateTimeField(blank=True, null=True)
+
+# Storing per-installment EMI Schedule of a Loan
+class EMISchedule(models.Model):
+    PENDING = "pending"
+    PARTIAL = "partial"
+    PAID = "paid"
+    STATUS_CHOICES = [
+        (PENDING, "pending"),
+        (PARTIAL, "partial"),
+        (PAID, "paid"),
+    ]
+    OPEN_STATUSES = (PENDING, PARTIAL)
+
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name="emi_schedule")
+    installment_no = models.PositiveIntegerField()
+    due_date = models.DateField()
+    amount_due = models.DecimalField(decimal_places=2, max_digits=15)
+    amount_paid = models.DecimalField(decimal_places=2, max_digits=15, default=0)
+    status = models.CharField(choices=STATUS_CHOICES, max_length=10, default=PENDING)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["loan", "installment_no"], name="emi_schedule_loan_installment_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["due_date", "status"], name="emi_schedule_due_status_idx"),
+        ]
 
 # Storing User Transactions Info
 class TransactionStore(models.Model):
@@ -47,9 +84,23 @@ class TransactionStore(models.Model):
     ]
 
     aadhar_id = models.UUIDField(editable=False)
+    # Set once the aadhar is registered; transactions can arrive before the user does
+    user = models.ForeignKey(
+        UserProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name="transactions"
+    )
     amount = models.DecimalField(max_digits=15, decimal_places=3)
     transaction_type = models.CharField(choices=TRANSACTION_CHOICES, max_length=20)
-    transaction_date = models.DateTimeField(auto_now_add=True)
+    # Taken from the source when it has one (ingested files, backfills), else now.
+    transaction_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["aadhar_id", "transaction_type", "transaction_date"],
+                name="txn_aadhar_type_date_idx",
+            ),
+            models.Index(fields=["transaction_date"], name="txn_date_idx"),
+        ]
 
 # Storing EMI Transaction of User.
 class EMITransaction(models.Model):
@@ -57,3 +108,109 @@ class EMITransaction(models.Model):
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name="loan_transaction")
     payment = models.DecimalField(max_digits=15, decimal_places=3)
     payment_date = models.DateTimeField(auto_now=True)
+    # Settlement file reference (NACH/UTR); unique so a file can be replayed safely
+    external_ref = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "loan"], name="emi_txn_user_loan_idx"),
+        ]
+
+# Closed months of TransactionStore rolled up per aadhar and type; the raw rows are deleted once folded in
+class TransactionMonthSummary(models.Model):
+    aadhar_id = models.UUIDField()
+    user = models.ForeignKey(
+        UserProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name="transaction_months"
+    )
+    period = models.DateField()
+    transaction_type = models.CharField(choices=TransactionStore.TRANSACTION_CHOICES, max_length=20)
+    amount = models.DecimalField(max_digits=20, decimal_places=3, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+    last_transaction_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["aadhar_id", "period", "transaction_type"], name="txn_month_aadhar_period_type_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["period"], name="txn_month_period_idx"),
+        ]
+
+# Bank transactions rolled up into TransactionMonthSummary, moved out of TransactionStore with their ids
+class TransactionArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    aadhar_id = models.UUIDField()
+    user = models.ForeignKey(
+        UserProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name="archived_transactions"
+    )
+    amount = models.DecimalField(max_digits=15, decimal_places=3)
+    transaction_type = models.CharField(choices=TransactionStore.TRANSACTION_CHOICES, max_length=20)
+    transaction_date = models.DateTimeField()
+    period = models.DateField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["aadhar_id", "transaction_date"], name="txn_archive_aadhar_date_idx"),
+            models.Index(fields=["transaction_date"], name="txn_archive_date_idx"),
+        ]
+
+# EMI payments of closed loans moved out of EMITransaction, keeping their ids, by month of payment
+class EMITransactionArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="archived_emi_transactions")
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name="archived_emi_transactions")
+    payment = models.DecimalField(max_digits=15, decimal_places=3)
+    payment_date = models.DateTimeField()
+    external_ref = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    period = models.DateField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "loan"], name="emi_archive_user_loan_idx"),
+        ]
+
+# Storing running Credit/Debit totals per aadhar, folded in from TransactionStore up to last_transaction_id
+class AccountBalance(models.Model):
+    aadhar_id = models.UUIDField(unique=True)
+    credit_total = models.DecimalField(max_digits=20, decimal_places=3, default=0)
+    debit_total = models.DecimalField(max_digits=20, decimal_places=3, default=0)
+    last_transaction_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+# Aadhars with transactions not yet reflected in credit_score; one row per aadhar however many arrive
+class CreditScoreQueue(models.Model):
+    aadhar_id = models.UUIDField(unique=True)
+    marked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+# Closing balance per aadhar at the end of each day it had transactions, with that day's credits and debits
+class DailyBalanceSnapshot(models.Model):
+    aadhar_id = models.UUIDField()
+    date = models.DateField()
+    closing_balance = models.DecimalField(max_digits=20, decimal_places=3)
+    credit_total = models.DecimalField(max_digits=20, decimal_places=3, default=0)
+    debit_total = models.DecimalField(max_digits=20, decimal_places=3, default=0)
+    # Newest TransactionStore id counted; rows above it dated on built days came in late
+    last_transaction_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["aadhar_id", "date"], name="balance_snapshot_aadhar_date_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["date"], name="balance_snapshot_date_idx"),
+        ]
+
+# Storing the response of each Idempotency-Key request so client retries replay it
+class IdempotencyKey(models.Model):
+    key = models.CharField(max_length=255, unique=True)
+    request_hash = models.CharField(max_length=64)
+    response_body = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    response_status = models.PositiveSmallIntegerField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    @staticmethod
+    def fingerprint(data):
+        payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha256(payload.encode()).hexdigest()
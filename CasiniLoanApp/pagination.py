@@ -0,0 +1,100 @@
+import base64
+import binascii
+import datetime
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+# Full-precision ISO strings; DjangoJSONEncoder would cut datetimes to milliseconds.
+def cursor_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values):
+    payload = json.dumps(values, default=cursor_value, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+# Converts each cursor value with its ordering field, so a forged cursor is a 400
+# instead of a database error.
+def cursor_filter_values(model, fields, values):
+    try:
+        values = [
+            model._meta.get_field(field).to_python(value)
+            for field, value in zip(fields, values)
+        ]
+    except (ValidationError, TypeError, ValueError):
+        raise InvalidCursor("Malformed cursor")
+    if any(value is None for value in values):
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+def page_size_from(value):
+    if value in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor("page_size must be an integer")
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+# (a, b) > (x, y) written as a > x OR (a = x AND b > y), so the database can seek on the index.
+def after(fields, values):
+    clauses = []
+    for i, field in enumerate(fields):
+        equal = {name: value for name, value in zip(fields[:i], values[:i])}
+        clauses.append(Q(**equal, **{f"{field}__gt": values[i]}))
+    return reduce(lambda left, right: left | right, clauses)
+
+
+# Keyset pagination over a values() queryset already ordered by `fields`; no OFFSET involved.
+def keyset_page(queryset, fields, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    rows = list(page_queryset(queryset, fields, cursor, page_size))
+    return trim_page(rows, fields, page_size)
+
+
+async def akeyset_page(queryset, fields, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    rows = [row async for row in page_queryset(queryset, fields, cursor, page_size)]
+    return trim_page(rows, fields, page_size)
+
+
+# One row past the page is fetched to tell whether another page follows.
+def page_queryset(queryset, fields, cursor, page_size):
+    if cursor:
+        values = cursor_filter_values(
+            queryset.model, fields, decode_cursor(cursor, len(fields))
+        )
+        queryset = queryset.filter(after(fields, values))
+    return queryset[: page_size + 1]
+
+
+def trim_page(rows, fields, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([rows[-1][field] for field in fields])
+    return rows, next_cursor
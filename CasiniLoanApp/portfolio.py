@@ -0,0 +1,163 @@
+import resource
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from . import amortisation
+from .chunking import id_ranges
+from .models import EMISchedule, LoanTransactionDetail
+
+DEFAULT_CHUNK_SIZE = 2000
+# new_emi_amt is left alone: payments keep it equal to what is still owed on the
+# oldest open installment of the schedule.
+REVALUED_FIELDS = [
+    "outstanding_principal",
+    "accrued_interest",
+    "revalued_at",
+]
+
+
+@dataclass
+class RevaluationReport:
+    processed: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+    peak_rss_kb: int = 0
+
+    @property
+    def loans_per_second(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def merge(self, other):
+        self.processed += other["processed"]
+        self.chunks += other["chunks"]
+        self.peak_rss_kb = max(self.peak_rss_kb, other["peak_rss_kb"])
+
+
+def active_details():
+    return (
+        LoanTransactionDetail.objects.filter(is_active=True)
+        .select_related("loan")
+        .only(
+            "id",
+            "emi_rem",
+            "last_txn_date",
+            "loan",
+            "loan__principal_amount",
+            "loan__interest_rate",
+            "loan__loan_term",
+            "loan__disbursal_date",
+        )
+        .order_by("id")
+    )
+
+
+# Splits the active book into (first_id, last_id) ranges of at most chunk_size loans.
+def plan_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+    ids = active_details().values_list("id", flat=True).iterator(chunk_size=chunk_size)
+    return id_ranges(ids, chunk_size)
+
+
+# Installments paid in full and the amount paid towards part-paid ones, per loan,
+# from the EMI schedule that payments are allocated against.
+def paid_installments(loan_ids):
+    rows = (
+        EMISchedule.objects.filter(loan_id__in=loan_ids)
+        .order_by()
+        .values("loan_id")
+        .annotate(
+            paid=Count("id", filter=Q(status=EMISchedule.PAID)),
+            partial=Sum("amount_paid", filter=Q(status=EMISchedule.PARTIAL)),
+        )
+    )
+    return {row["loan_id"]: (row["paid"], row["partial"] or 0) for row in rows}
+
+
+def revalue_details(details, as_of):
+    loans = [detail.loan for detail in details]
+    terms = np.array([loan.loan_term for loan in loans])
+    emis_left = np.array([max(detail.emi_rem, 0) for detail in details])
+    paid = paid_installments([loan.id for loan in loans])
+    # Loans without a schedule fall back to counting the installments still open.
+    installments_paid = np.array(
+        [
+            paid.get(loan.id, (term - left, 0))[0]
+            for loan, term, left in zip(loans, terms, emis_left)
+        ]
+    )
+    partial = amortisation.scaled([paid.get(loan.id, (0, 0))[1] for loan in loans], 2)
+
+    # The balance comes from the same cent-exact schedule payments are allocated against.
+    schedules = amortisation.build_schedules(
+        [loan.principal_amount for loan in loans],
+        [loan.interest_rate for loan in loans],
+        terms,
+        [amortisation.first_due_date(loan.disbursal_date) for loan in loans],
+    )
+    outstanding = schedules.balance_after(installments_paid)
+    # A part-paid installment covers its month's interest first, then principal.
+    rate_millis = amortisation.scaled([loan.interest_rate for loan in loans], 3)
+    interest_due = amortisation.monthly_interest(outstanding, rate_millis)
+    outstanding = np.clip(outstanding - np.clip(partial - interest_due, 0, None), 0, None)
+
+    # Simple daily accrual since the last payment (or disbursal if nothing was paid yet).
+    last_paid = np.array(
+        [
+            (detail.last_txn_date or detail.loan.disbursal_date).date()
+            for detail in details
+        ],
+        dtype="datetime64[D]",
+    )
+    days = np.clip((np.datetime64(as_of, "D") - last_paid).astype(np.int64), 0, None)
+    accrued = outstanding * rate_millis / 100_000 * days / 365 / 100
+
+    now = timezone.now()
+    for detail, principal, interest in zip(details, outstanding.tolist(), accrued.tolist()):
+        detail.outstanding_principal = amortisation.to_decimal(principal)
+        detail.accrued_interest = amortisation.to_money(interest)
+        detail.revalued_at = now
+    return details
+
+
+# The range is read and written under its row locks, so a payment posted meanwhile
+# waits for the revaluation (or the revaluation for it) instead of being overwritten.
+def revalue_range(first_id, last_id, as_of=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    as_of = as_of or timezone.now().date()
+    started = time.perf_counter()
+    with transaction.atomic():
+        if not connection.features.has_select_for_update:
+            # SQLite: take the write lock up front, as PaymentViewApi.lock_loan_details does.
+            LoanTransactionDetail.objects.filter(
+                id__gte=first_id, id__lte=last_id, is_active=True
+            ).update(emi_rem=F("emi_rem"))
+        details = list(
+            active_details()
+            .filter(id__gte=first_id, id__lte=last_id)
+            .select_for_update()
+            .iterator(chunk_size=chunk_size)
+        )
+        if details:
+            revalue_details(details, as_of)
+            LoanTransactionDetail.objects.bulk_update(
+                details, REVALUED_FIELDS, batch_size=500
+            )
+
+    return {
+        "processed": len(details),
+        "chunks": 1,
+        "elapsed": time.perf_counter() - started,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def revalue_portfolio(as_of=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    report = RevaluationReport()
+    started = time.perf_counter()
+    for first_id, last_id in plan_chunks(chunk_size):
+        report.merge(revalue_range(first_id, last_id, as_of, chunk_size))
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,90 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+class RoutingState:
+    __slots__ = ("replica_reads", "wrote")
+
+    def __init__(self):
+        self.replica_reads = False
+        self.wrote = False
+
+
+# Routing of the request or task being run, or None outside one. Shared with the
+# sync_to_async threads of async views, like profiling.current_profile.
+current_routing = ContextVar("current_routing", default=None)
+
+
+def replica_alias():
+    alias = settings.REPLICA_DATABASE
+    return alias if alias and alias in settings.DATABASES else None
+
+
+# Lets reads inside the block go to the replica, until the surrounding request or
+# task writes anything; usable as a context manager or a decorator.
+@contextmanager
+def replica_reads():
+    state = current_routing.get()
+    token = None
+    if state is None:
+        state = RoutingState()
+        token = current_routing.set(state)
+    previous, state.replica_reads = state.replica_reads, True
+    try:
+        yield
+    finally:
+        state.replica_reads = previous
+        if token is not None:
+            current_routing.reset(token)
+
+
+# Sends reads inside replica_reads() blocks to REPLICA_DATABASE and everything else,
+# writes included, to the primary. The first write pins the rest of the request or
+# task to the primary, so it always reads what it wrote.
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        if state is None or not state.replica_reads or state.wrote:
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+# Gives every request its own RoutingState, so a write pins only that request.
+class RoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = current_routing.set(RoutingState())
+        try:
+            return self.get_response(request)
+        finally:
+            current_routing.reset(token)
+
+    async def __acall__(self, request):
+        token = current_routing.set(RoutingState())
+        try:
+            return await self.get_response(request)
+        finally:
+            current_routing.reset(token)
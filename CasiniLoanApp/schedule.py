@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+from django.db import connection
+
+from .models import EMISchedule
+
+SCHEDULE_BATCH_SIZE = 500
+
+
+def schedule_rows(loan, due_dates):
+    return [
+        EMISchedule(
+            loan=loan,
+            installment_no=number,
+            due_date=installment["date"],
+            amount_due=installment["amount_due"],
+        )
+        for number, installment in enumerate(due_dates, start=1)
+    ]
+
+
+def create_schedule(loan, due_dates):
+    return EMISchedule.objects.bulk_create(
+        schedule_rows(loan, due_dates), batch_size=SCHEDULE_BATCH_SIZE
+    )
+
+
+# Raw executemany for large batches of new schedules; building an EMISchedule per
+# installment dominates bulk_create time once a batch runs into tens of thousands.
+def insert_schedules(loans_with_due_dates):
+    fields = [
+        EMISchedule._meta.get_field(name)
+        for name in ("loan", "installment_no", "due_date", "amount_due", "amount_paid", "status")
+    ]
+    loan_field, _, _, amount_field, _, _ = fields
+    ops = connection.ops
+    rows = []
+    for loan, due_dates in loans_with_due_dates:
+        loan_id = loan_field.get_db_prep_save(loan.pk, connection)
+        for number, installment in enumerate(due_dates, start=1):
+            rows.append(
+                (
+                    loan_id,
+                    number,
+                    ops.adapt_datefield_value(installment["date"]),
+                    ops.adapt_decimalfield_value(
+                        installment["amount_due"],
+                        amount_field.max_digits,
+                        amount_field.decimal_places,
+                    ),
+                    0,
+                    EMISchedule.PENDING,
+                )
+            )
+
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        ops.quote_name(EMISchedule._meta.db_table),
+        ", ".join(ops.quote_name(field.column) for field in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), SCHEDULE_BATCH_SIZE * 10):
+            cursor.executemany(sql, rows[start : start + SCHEDULE_BATCH_SIZE * 10])
+    return len(rows)
+
+
+def open_installments(loan_id):
+    return EMISchedule.objects.filter(
+        loan_id=loan_id, status__in=EMISchedule.OPEN_STATUSES
+    ).order_by("installment_no")
+
+
+# Open installments of many loans in one query, ordered for allocate_payment.
+def open_installments_for(loan_ids):
+    return EMISchedule.objects.filter(
+        loan_id__in=loan_ids, status__in=EMISchedule.OPEN_STATUSES
+    ).order_by("loan_id", "installment_no")
+
+
+def due_between(start, end):
+    return EMISchedule.objects.filter(
+        due_date__range=(start, end), status__in=EMISchedule.OPEN_STATUSES
+    )
+
+
+# Applies a payment to the oldest open installments first; returns the next open
+# installment (None once the loan is fully paid) and how many remain open.
+def allocate_payment(installments, amount):
+    remaining = Decimal(amount)
+    touched = []
+    for installment in installments:
+        if remaining <= 0:
+            break
+        paid = min(installment.amount_due - installment.amount_paid, remaining)
+        installment.amount_paid += paid
+        remaining -= paid
+        installment.status = (
+            EMISchedule.PAID
+            if installment.amount_paid >= installment.amount_due
+            else EMISchedule.PARTIAL
+        )
+        touched.append(installment)
+
+    still_open = [row for row in installments if row.status != EMISchedule.PAID]
+    return touched, (still_open[0] if still_open else None), len(still_open)
+
+
+def apply_payment(loan_id, amount):
+    installments = list(open_installments(loan_id))
+    touched, next_installment, emis_left = allocate_payment(installments, amount)
+    EMISchedule.objects.bulk_update(touched, ["amount_paid", "status"])
+    return next_installment, emis_left
@@ -0,0 +1,162 @@
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .balances import refresh_balances
+from .chunking import id_ranges
+from .models import CreditScoreQueue, UserProfile
+from .routers import replica_reads
+from .snapshots import average_daily_balances
+
+DEFAULT_CHUNK_SIZE = 1000
+# Lower bounds of the score bands reported in summaries; scores run from 300 to 900.
+SCORE_BANDS = (300, 450, 600, 750, 900)
+
+
+def calculate_credit_score(account_balance):
+    if account_balance >= 1000000:
+        return 900
+    elif account_balance <= 100000:
+        return 300
+    else:
+        return 300 + ((account_balance - 100000) // 15000) * 10
+
+
+def score_band(credit_score):
+    lower = max(bound for bound in SCORE_BANDS if bound <= credit_score)
+    upper = next((bound for bound in SCORE_BANDS if bound > lower), None)
+    return f"{lower}-{upper - 1}" if upper else str(lower)
+
+
+@dataclass
+class ScoringSummary:
+    scored: int = 0
+    chunks: int = 0
+    distribution: dict = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def users_per_second(self):
+        return self.scored / self.elapsed if self.elapsed else 0.0
+
+    def merge(self, other):
+        self.scored += other["scored"]
+        self.chunks += other["chunks"]
+        for band, count in other["distribution"].items():
+            self.distribution[band] = self.distribution.get(band, 0) + count
+
+    def as_dict(self):
+        return {
+            "scored": self.scored,
+            "chunks": self.chunks,
+            "distribution": dict(sorted(self.distribution.items())),
+            "elapsed": self.elapsed,
+        }
+
+
+def users_by_id():
+    return UserProfile.objects.only("id", "aadhar_id").order_by("id")
+
+
+# Splits the user base into (first_id, last_id) ranges of at most chunk_size users.
+# Ids are sent as strings so the ranges survive the JSON task serializer.
+@replica_reads()
+def plan_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+    ids = users_by_id().values_list("id", flat=True).iterator(chunk_size=chunk_size)
+    return [(str(first_id), str(last_id)) for first_id, last_id in id_ranges(ids, chunk_size)]
+
+
+# Balance each score is computed from: the current balance (pending transactions
+# folded into AccountBalance first) or, when CREDIT_SCORE_AVERAGE_DAYS is set, the
+# average daily closing balance over that many days from the balance snapshots.
+def scoring_balances(aadhar_ids):
+    if settings.CREDIT_SCORE_AVERAGE_DAYS:
+        return average_daily_balances(aadhar_ids, settings.CREDIT_SCORE_AVERAGE_DAYS)
+    return {
+        aadhar_id: balance.credit_total - balance.debit_total
+        for aadhar_id, balance in refresh_balances(aadhar_ids).items()
+    }
+
+
+# Writes every score of the chunk with a single bulk UPDATE.
+def score_users(users):
+    users = list(users)
+    balances = scoring_balances(user.aadhar_id for user in users)
+    for user in users:
+        user.credit_score = calculate_credit_score(balances[user.aadhar_id])
+    UserProfile.objects.bulk_update(users, ["credit_score"], batch_size=len(users) or 1)
+    return users
+
+
+def score_range(first_id, last_id):
+    started = time.perf_counter()
+    users = score_users(users_by_id().filter(id__gte=first_id, id__lte=last_id))
+    return {
+        "scored": len(users),
+        "chunks": 1,
+        "distribution": dict(Counter(score_band(user.credit_score) for user in users)),
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+def summarise(results, started_at=None):
+    summary = ScoringSummary()
+    for result in results:
+        summary.merge(result)
+    if started_at is not None:
+        summary.elapsed = time.time() - started_at
+    return summary
+
+
+def rescore_users(chunk_size=DEFAULT_CHUNK_SIZE):
+    started_at = time.time()
+    results = [score_range(first_id, last_id) for first_id, last_id in plan_chunks(chunk_size)]
+    return summarise(results, started_at)
+
+
+# Queues aadhars for the next dirty rescoring pass; repeat marks for an aadhar
+# collapse onto its existing row.
+def mark_dirty(aadhar_ids):
+    CreditScoreQueue.objects.bulk_create(
+        [CreditScoreQueue(aadhar_id=aadhar_id) for aadhar_id in set(aadhar_ids)],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+# Rescores one batch of aadhars marked at least settle_seconds ago. The queue rows
+# are deleted in the same transaction as the scores are written, so a failure
+# leaves them queued and a transaction arriving meanwhile marks its aadhar again.
+def rescore_dirty_batch(batch_size=DEFAULT_CHUNK_SIZE, settle_seconds=0):
+    cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+    with transaction.atomic():
+        queued = list(
+            CreditScoreQueue.objects.filter(marked_at__lte=cutoff)
+            .order_by("marked_at")
+            .values_list("id", "aadhar_id")[:batch_size]
+        )
+        if not queued:
+            return {"drained": 0, "scored": 0}
+        CreditScoreQueue.objects.filter(id__in=[queue_id for queue_id, _ in queued]).delete()
+        users = score_users(
+            users_by_id().filter(aadhar_id__in=[aadhar_id for _, aadhar_id in queued])
+        )
+    return {"drained": len(queued), "scored": len(users)}
+
+
+def rescore_dirty(batch_size=DEFAULT_CHUNK_SIZE, settle_seconds=0):
+    totals = {"drained": 0, "scored": 0, "batches": 0}
+    while True:
+        result = rescore_dirty_batch(batch_size, settle_seconds)
+        if not result["drained"]:
+            return totals
+        totals["drained"] += result["drained"]
+        totals["scored"] += result["scored"]
+        totals["batches"] += 1
+        if result["drained"] < batch_size:
+            return totals
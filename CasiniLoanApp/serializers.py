@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import UserProfile, Loan, LoanTransactionDetail
 
@@ -6,6 +8,13 @@ class UserSerializer(serializers.ModelSerializer):
         model = UserProfile
         fields='__all__'
 
+# Leaves the aadhar_id uniqueness check to the database insert (used by the async view)
+class AsyncUserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserProfile
+        fields = '__all__'
+        extra_kwargs = {'aadhar_id': {'validators': []}}
+
 class RegisterUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
@@ -31,10 +40,19 @@ class TransactionSerializer(serializers.ModelSerializer):
         model = LoanDetailSerializer
         fields = ( 'aadhar_id', 'transaction_date', 'amount', 'transaction_type')
 
-class ApplyLoanSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Loan
-        fields = ('loan_type', 'loan_amount')
+class ApplyLoanSerializer(serializers.Serializer):
+    unique_user_id = serializers.UUIDField()
+    loan_type = serializers.ChoiceField(choices=Loan.LOAN_CATEGORIES)
+    loan_amount = serializers.IntegerField(min_value=1)
+    interest_rate = serializers.DecimalField(max_digits=15, decimal_places=3)
+    term_period = serializers.IntegerField(min_value=1)
+    disbursement_date = serializers.DateField(input_formats=["%d-%m-%Y"])
+
+# Amount of a single EMI payment; positive, in whole cents and fits EMITransaction.payment.
+class PaymentAmountSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(
+        max_digits=14, decimal_places=2, min_value=Decimal("0.01")
+    )
 
 class MakePaymentSerializer(serializers.ModelSerializer):
     class Meta:
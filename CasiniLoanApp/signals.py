@@ -0,0 +1,96 @@
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+)
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from . import metrics, profiling, routers
+from .models import TransactionStore, UserProfile
+from .scoring import mark_dirty
+
+
+# Single inserts (admin, shell, views); bulk paths call mark_dirty themselves
+# because bulk_create sends no signals.
+@receiver(post_save, sender=TransactionStore, dispatch_uid="credit_score_mark_dirty")
+def mark_transaction_dirty(sender, instance, created, **kwargs):
+    if created:
+        mark_dirty([instance.aadhar_id])
+
+
+@receiver(pre_save, sender=TransactionStore, dispatch_uid="transaction_link_user")
+def link_transaction_user(sender, instance, **kwargs):
+    if instance.user_id is None:
+        instance.user_id = (
+            UserProfile.objects.filter(aadhar_id=instance.aadhar_id)
+            .values_list("id", flat=True)
+            .first()
+        )
+
+
+# Transactions can be ingested before their aadhar registers; claim them on signup.
+@receiver(post_save, sender=UserProfile, dispatch_uid="user_claim_transactions")
+def claim_user_transactions(sender, instance, created, **kwargs):
+    if created:
+        TransactionStore.objects.filter(aadhar_id=instance.aadhar_id, user__isnull=True).update(
+            user=instance
+        )
+
+
+@receiver(connection_created, dispatch_uid="profiling_record_query")
+def install_query_profiler(sender, connection, **kwargs):
+    for wrapper in (metrics.record_query, profiling.record_query):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+
+@receiver(connection_created, dispatch_uid="sqlite_pragmas")
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@before_task_publish.connect(dispatch_uid="metrics_task_published")
+def stamp_task_published(sender=None, headers=None, **kwargs):
+    if headers is not None:
+        metrics.task_published(headers)
+
+
+@task_prerun.connect(dispatch_uid="metrics_task_started")
+def record_task_started(sender=None, task_id=None, task=None, **kwargs):
+    metrics.task_started(task, task_id)
+
+
+@task_postrun.connect(dispatch_uid="metrics_task_finished")
+def record_task_finished(sender=None, task_id=None, task=None, state=None, **kwargs):
+    metrics.task_finished(task, task_id, state)
+
+
+# Each task gets its own routing scope, so a write pins only that task to the primary.
+@task_prerun.connect(dispatch_uid="routing_task_started")
+def start_task_routing(sender=None, **kwargs):
+    routers.current_routing.set(routers.RoutingState())
+
+
+@task_postrun.connect(dispatch_uid="routing_task_finished")
+def end_task_routing(sender=None, **kwargs):
+    routers.current_routing.set(None)
+
+
+@task_failure.connect(dispatch_uid="metrics_task_failed")
+def record_task_failed(sender=None, exception=None, **kwargs):
+    metrics.task_failed(sender, exception)
+
+
+# Prefork children are replaced over time; let the metrics files know one has exited.
+@worker_process_shutdown.connect(dispatch_uid="metrics_worker_process_shutdown")
+def release_worker_metrics(pid=None, **kwargs):
+    metrics.mark_process_dead(pid)
@@ -0,0 +1,199 @@
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min, Q, Sum
+
+from .archive import month_start, start_of_day
+from .balances import ZERO, totals_by_aadhar
+from .models import (
+    DailyBalanceSnapshot,
+    TransactionArchive,
+    TransactionMonthSummary,
+    TransactionStore,
+)
+from .routers import replica_reads
+
+UPSERT_BATCH_SIZE = 1000
+SNAPSHOT_FIELDS = ["closing_balance", "credit_total", "debit_total", "last_transaction_id"]
+
+
+@dataclass
+class SnapshotReport:
+    first_day: date = None
+    last_day: date = None
+    days: int = 0
+    snapshots: int = 0
+    elapsed: float = 0.0
+
+
+# Credits, debits and newest id per aadhar for one day, from the hot table plus the
+# raw rows the archive moved out of it.
+def day_totals(day):
+    window = Q(
+        transaction_date__gte=start_of_day(day),
+        transaction_date__lt=start_of_day(day + timedelta(days=1)),
+    )
+    totals = {}
+    for model in (TransactionStore, TransactionArchive):
+        for aadhar_id, day_total in totals_by_aadhar(model.objects.filter(window)).items():
+            account = totals.setdefault(aadhar_id, {"credit": ZERO, "debit": ZERO, "last_id": 0})
+            account["credit"] += day_total["credit"]
+            account["debit"] += day_total["debit"]
+            account["last_id"] = max(account["last_id"], day_total["last_id"])
+    return totals
+
+
+# Latest closing balance of each aadhar before `day`, for those with an earlier snapshot.
+def closing_balances_before(aadhar_ids, day):
+    last_dates = dict(
+        DailyBalanceSnapshot.objects.filter(aadhar_id__in=aadhar_ids, date__lt=day)
+        .order_by()
+        .values("aadhar_id")
+        .annotate(last_date=Max("date"))
+        .values_list("aadhar_id", "last_date")
+    )
+    return {
+        snapshot.aadhar_id: snapshot.closing_balance
+        for snapshot in DailyBalanceSnapshot.objects.filter(
+            aadhar_id__in=last_dates.keys(), date__in=set(last_dates.values())
+        ).only("aadhar_id", "date", "closing_balance")
+        if last_dates[snapshot.aadhar_id] == snapshot.date
+    }
+
+
+# Balance each aadhar carries into `day`: its previous closing balance or, before its
+# first snapshot, the net of the months the archive rolled up before day's month.
+def opening_balances(aadhar_ids, day):
+    openings = closing_balances_before(aadhar_ids, day)
+    archived = (
+        TransactionMonthSummary.objects.filter(
+            aadhar_id__in=set(aadhar_ids) - openings.keys(), period__lt=month_start(day)
+        )
+        .order_by()
+        .values("aadhar_id")
+        .annotate(
+            credit=Sum("amount", filter=Q(transaction_type="credit")),
+            debit=Sum("amount", filter=Q(transaction_type="debit")),
+        )
+    )
+    for row in archived:
+        openings[row["aadhar_id"]] = (row["credit"] or ZERO) - (row["debit"] or ZERO)
+    return openings
+
+
+# Snapshots one day: grouped totals of that day's hot and archived transactions, each
+# aadhar carrying its previous closing balance forward. Rerunning a day overwrites it.
+def build_day(day):
+    totals = day_totals(day)
+    aadhar_ids = list(totals)
+    written = 0
+    with transaction.atomic():
+        for start in range(0, len(aadhar_ids), UPSERT_BATCH_SIZE):
+            chunk = aadhar_ids[start : start + UPSERT_BATCH_SIZE]
+            openings = opening_balances(chunk, day)
+            written += upsert(
+                [
+                    DailyBalanceSnapshot(
+                        aadhar_id=aadhar_id,
+                        date=day,
+                        closing_balance=openings.get(aadhar_id, ZERO)
+                        + totals[aadhar_id]["credit"]
+                        - totals[aadhar_id]["debit"],
+                        credit_total=totals[aadhar_id]["credit"],
+                        debit_total=totals[aadhar_id]["debit"],
+                        last_transaction_id=totals[aadhar_id]["last_id"],
+                    )
+                    for aadhar_id in chunk
+                ]
+            )
+    return written
+
+
+def upsert(snapshots):
+    DailyBalanceSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=["aadhar_id", "date"],
+        update_fields=SNAPSHOT_FIELDS,
+    )
+    return len(snapshots)
+
+
+# First day not yet snapshotted: the day after the newest snapshot, or the day of
+# the oldest hot transaction on the first run. Rows inserted since the last build
+# but dated on a day already built (backfills, late files) move it back to their
+# day, so that day and every later closing balance are rebuilt.
+def next_unbuilt_day():
+    built = DailyBalanceSnapshot.objects.aggregate(
+        last=Max("date"), watermark=Max("last_transaction_id")
+    )
+    if not built["last"]:
+        first = TransactionStore.objects.aggregate(first=Min("transaction_date"))["first"]
+        return first.date() if first else None
+    next_day = built["last"] + timedelta(days=1)
+    late = TransactionStore.objects.filter(
+        id__gt=built["watermark"], transaction_date__lt=start_of_day(next_day)
+    ).aggregate(first=Min("transaction_date"))["first"]
+    return min(next_day, late.date()) if late else next_day
+
+
+# Builds every closed day from `since` (default: next_unbuilt_day) through `until`
+# (default: yesterday), oldest first so each day can start from the one before.
+def build_snapshots(since=None, until=None):
+    until = until or date.today() - timedelta(days=1)
+    # Rebuilding a day moves every later closing balance, so days already snapshotted
+    # after `until` are rebuilt with it.
+    newest = DailyBalanceSnapshot.objects.aggregate(newest=Max("date"))["newest"]
+    report = SnapshotReport(
+        first_day=since or next_unbuilt_day(), last_day=max(until, newest or until)
+    )
+    started = time.perf_counter()
+    day = report.first_day
+    while day and day <= report.last_day:
+        report.snapshots += build_day(day)
+        report.days += 1
+        day += timedelta(days=1)
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+# Closing balance at the end of `day`: one descending probe of the (aadhar_id, date) index.
+@replica_reads()
+def balance_on(aadhar_id, day):
+    closing = (
+        DailyBalanceSnapshot.objects.filter(aadhar_id=aadhar_id, date__lte=day)
+        .order_by("-date")
+        .values_list("closing_balance", flat=True)
+        .first()
+    )
+    return closing if closing is not None else ZERO
+
+
+# Average end-of-day balance over the `days` days ending at `until`, carrying each
+# closing balance forward over days without transactions.
+@replica_reads()
+def average_daily_balances(aadhar_ids, days, until=None):
+    until = until or date.today() - timedelta(days=1)
+    window_start = until - timedelta(days=days - 1)
+    aadhar_ids = set(aadhar_ids)
+
+    carried = closing_balances_before(aadhar_ids, window_start)
+
+    totals = {aadhar_id: ZERO for aadhar_id in aadhar_ids}
+    last_seen = {aadhar_id: (window_start, carried.get(aadhar_id, ZERO)) for aadhar_id in aadhar_ids}
+    in_window = (
+        DailyBalanceSnapshot.objects.filter(
+            aadhar_id__in=aadhar_ids, date__gte=window_start, date__lte=until
+        )
+        .order_by("aadhar_id", "date")
+        .values_list("aadhar_id", "date", "closing_balance")
+    )
+    for aadhar_id, day, closing in in_window:
+        since, balance = last_seen[aadhar_id]
+        totals[aadhar_id] += balance * (day - since).days
+        last_seen[aadhar_id] = (day, closing)
+    for aadhar_id, (since, balance) in last_seen.items():
+        totals[aadhar_id] += balance * ((until - since).days + 1)
+    return {aadhar_id: total / days for aadhar_id, total in totals.items()}
@@ -0,0 +1,121 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+STATS = ("hits", "misses", "evictions", "invalidations")
+
+# Statements are cached under statement:<loan>:<version>:<variant>. Writes to a loan
+# bump its version after commit, so stale entries are simply never read again.
+
+
+def get_cache():
+    return caches[settings.STATEMENT_CACHE_ALIAS]
+
+
+def version_key(loan_id):
+    return f"statement:{loan_id}:version"
+
+
+def data_key(loan_id, version, variant):
+    digest = hashlib.sha1(variant.encode()).hexdigest()
+    return f"statement:{loan_id}:{version}:{digest}"
+
+
+def stat_key(name):
+    return f"statement:stats:{name}"
+
+
+def count(cache, name):
+    try:
+        cache.incr(stat_key(name))
+    except ValueError:
+        cache.add(stat_key(name), 0, timeout=None)
+        cache.incr(stat_key(name))
+
+
+# A missing version key starts from the clock rather than 1, so entries written
+# before the key was evicted can never be mistaken for the current version.
+def current_version(cache, loan_id):
+    version = cache.get(version_key(loan_id))
+    if version is None:
+        cache.add(version_key(loan_id), time.time_ns(), timeout=None)
+        version = cache.get(version_key(loan_id))
+    return version
+
+
+def get_or_build(loan_id, variant, build):
+    cache = get_cache()
+    key = data_key(loan_id, current_version(cache, loan_id), variant)
+    # The sentinel lives as long as the entry; finding it alone means the entry was evicted.
+    sentinel = f"{key}:seen"
+    cached = cache.get_many([key, sentinel])
+    if key in cached:
+        count(cache, "hits")
+        return cached[key]
+
+    count(cache, "misses")
+    if sentinel in cached:
+        count(cache, "evictions")
+
+    value = build()
+    cache.set_many(
+        {key: value, sentinel: True}, timeout=settings.STATEMENT_CACHE_TIMEOUT
+    )
+    return value
+
+
+def invalidate(loan_id):
+    def bump():
+        cache = get_cache()
+        try:
+            cache.incr(version_key(loan_id))
+        except ValueError:
+            cache.add(version_key(loan_id), time.time_ns(), timeout=None)
+        count(cache, "invalidations")
+
+    transaction.on_commit(bump)
+
+
+# Async twins of the helpers above for the ASGI views, using the cache's a* methods.
+async def acount(cache, name):
+    try:
+        await cache.aincr(stat_key(name))
+    except ValueError:
+        await cache.aadd(stat_key(name), 0, timeout=None)
+        await cache.aincr(stat_key(name))
+
+
+async def acurrent_version(cache, loan_id):
+    version = await cache.aget(version_key(loan_id))
+    if version is None:
+        await cache.aadd(version_key(loan_id), time.time_ns(), timeout=None)
+        version = await cache.aget(version_key(loan_id))
+    return version
+
+
+async def aget_or_build(loan_id, variant, build):
+    cache = get_cache()
+    key = data_key(loan_id, await acurrent_version(cache, loan_id), variant)
+    sentinel = f"{key}:seen"
+    cached = await cache.aget_many([key, sentinel])
+    if key in cached:
+        await acount(cache, "hits")
+        return cached[key]
+
+    await acount(cache, "misses")
+    if sentinel in cached:
+        await acount(cache, "evictions")
+
+    value = await build()
+    await cache.aset_many(
+        {key: value, sentinel: True}, timeout=settings.STATEMENT_CACHE_TIMEOUT
+    )
+    return value
+
+
+def stats():
+    values = get_cache().get_many([stat_key(name) for name in STATS])
+    return {name: values.get(stat_key(name), 0) for name in STATS}
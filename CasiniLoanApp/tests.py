@@ -1,3 +1,1616 @@
-from django.test import TestCase
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from celery import group
+from celery.signals import before_task_publish
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connections, router
+from django.db.models import Sum
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import (
+    AsyncClient,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from LoanManager.celery import app as celery_app
+from utils.abstract_models import uuid7
+
+from . import (
+    amortisation,
+    archive,
+    metrics,
+    pagination,
+    portfolio,
+    profiling,
+    renderers,
+    routers,
+    scoring,
+    snapshots,
+    tasks,
+)
+from .balances import reconcile_balances, refresh_balances
+from .ingestion import ingest_transactions
+from .models import (
+    AccountBalance,
+    CreditScoreQueue,
+    DailyBalanceSnapshot,
+    EMITransactionArchive,
+    EMISchedule,
+    EMITransaction,
+    Loan,
+    LoanTransactionDetail,
+    TransactionArchive,
+    TransactionMonthSummary,
+    TransactionStore,
+    UserProfile,
+)
+
+
+class LoanApiTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.api_user = User.objects.create(username="api-client")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.api_user)
+
+    def create_profile(self, credit_score=600, annual_income=900000):
+        return UserProfile.objects.create(
+            name="Test User",
+            email_id="test@example.com",
+            aadhar_id=uuid.uuid4(),
+            annual_income=annual_income,
+            credit_score=credit_score,
+        )
+
+    def apply_loan(self, profile, headers=None, **overrides):
+        payload = {
+            "unique_user_id": str(profile.id),
+            "loan_type": "car",
+            "loan_amount": 100000,
+            "interest_rate": 15,
+            "term_period": 12,
+            "disbursement_date": "15-01-2024",
+        }
+        payload.update(overrides)
+        return self.client.post("/api/apply-loan/", payload, format="json", **(headers or {}))
+
+    def make_payment(self, loan_id, amount):
+        return self.client.post(
+            "/api/make-payment/", {"loan_id": str(loan_id), "amount": amount}, format="json"
+        )
+
+    def get_statement(self, loan_id):
+        return self.client.generic(
+            "GET",
+            "/api/get-statement/",
+            json.dumps({"loan_id": str(loan_id)}),
+            content_type="application/json",
+        )
+
+
+# Locks in how many queries each endpoint may issue, independent of loan history.
+class QueryBudgetTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile = self.create_profile()
+        self.loan_id = self.apply_loan(self.profile).data["loan_id"]
+
+    def test_register_user(self):
+        payload = {
+            "name": "New User",
+            "email_id": "new@example.com",
+            "aadhar_id": str(uuid.uuid4()),
+            "annual_income": "500000",
+        }
+        # aadhar_id uniqueness check + insert + claiming transactions ingested earlier
+        with self.assertNumQueries(3):
+            response = self.client.post("/api/register-user/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_apply_loan(self):
+        profile = self.create_profile()
+        # user + existing loan + savepoint pair + loan, detail and schedule inserts
+        with self.assertNumQueries(7):
+            response = self.apply_loan(profile)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["due_dates"]), 12)
+
+    def test_make_payment(self):
+        # savepoint pair + write lock (SQLite) + locked read + ledger insert + balance
+        # update + open installments + installment update + detail update
+        with self.assertNumQueries(9):
+            response = self.make_payment(self.loan_id, 20000)
+        self.assertEqual(response.status_code, 200)
+
+    def test_statement_without_history(self):
+        with self.assertNumQueries(3):
+            response = self.get_statement(self.loan_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["prev_txn"], [])
+        self.assertEqual(len(response.data["upcoming_transactions"]), 12)
+
+    def test_statement_with_long_history(self):
+        EMITransaction.objects.bulk_create(
+            EMITransaction(user=self.profile, loan_id=self.loan_id, payment=Decimal("100"))
+            for _ in range(50)
+        )
+        with self.assertNumQueries(3):
+            response = self.get_statement(self.loan_id)
+        self.assertEqual(len(response.data["prev_txn"]), 50)
+
+    def test_statement_for_unknown_loan(self):
+        with self.assertNumQueries(1):
+            response = self.get_statement(uuid.uuid4())
+        self.assertEqual(response.status_code, 400)
+
+
+class StatementPaginationTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile = self.create_profile()
+        self.loan_id = self.apply_loan(self.profile, term_period=36).data["loan_id"]
+        EMITransaction.objects.bulk_create(
+            EMITransaction(user=self.profile, loan_id=self.loan_id, payment=Decimal(i))
+            for i in range(1, 26)
+        )
+
+    def get_page(self, **params):
+        return self.client.generic(
+            "GET",
+            "/api/get-statement/",
+            json.dumps({"loan_id": str(self.loan_id), **params}),
+            content_type="application/json",
+        ).data
+
+    def walk(self, rows_key, cursor_key, request_key):
+        rows, params = [], {"page_size": 10}
+        while True:
+            page = self.get_page(**params)
+            rows += page[rows_key]
+            if not page[cursor_key]:
+                return rows
+            params[request_key] = page[cursor_key]
+
+    def test_prev_txn_cursor_walks_every_payment_once(self):
+        rows = self.walk("prev_txn", "prev_txn_next_cursor", "prev_cursor")
+        self.assertEqual([row["amount_paid"] for row in rows], [Decimal(i) for i in range(1, 26)])
+
+    def test_upcoming_cursor_walks_every_installment_once(self):
+        rows = self.walk("upcoming_transactions", "upcoming_next_cursor", "upcoming_cursor")
+        dates = [row["emi_date"] for row in rows]
+        self.assertEqual(len(dates), 36)
+        self.assertEqual(dates, sorted(set(dates)))
+
+    def test_malformed_cursor(self):
+        response = self.client.generic(
+            "GET",
+            "/api/get-statement/",
+            json.dumps({"loan_id": str(self.loan_id), "prev_cursor": "not-a-cursor"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_values_of_the_wrong_type(self):
+        for cursor_key, values in (
+            ("upcoming_cursor", [{"a": 1}]),
+            ("upcoming_cursor", ["abc"]),
+            ("upcoming_cursor", [None]),
+            ("prev_cursor", ["not-a-date", 1]),
+            ("prev_cursor", [[2024], 1]),
+        ):
+            with self.subTest(cursor_key=cursor_key, values=values):
+                response = self.client.generic(
+                    "GET",
+                    "/api/get-statement/",
+                    json.dumps(
+                        {
+                            "loan_id": str(self.loan_id),
+                            cursor_key: pagination.encode_cursor(values),
+                        }
+                    ),
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data, {"error": "Malformed cursor"})
+
+    def test_ndjson_export(self):
+        response = self.client.generic(
+            "GET",
+            "/api/get-statement/",
+            json.dumps({"loan_id": str(self.loan_id), "export": "ndjson"}),
+            content_type="application/json",
+        )
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual([row["type"] for row in rows], ["payment"] * 25 + ["installment"] * 36)
+
+    def test_csv_export(self):
+        response = self.client.generic(
+            "GET",
+            "/api/get-statement/",
+            json.dumps({"loan_id": str(self.loan_id), "export": "csv"}),
+            content_type="application/json",
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "type,date,amount,interest,principal")
+        self.assertEqual(len(lines), 1 + 25 + 36)
+
+
+class StatementCacheTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile = self.create_profile()
+        self.loan_id = self.apply_loan(self.profile).data["loan_id"]
+
+    def test_repeat_reads_are_served_from_cache(self):
+        first = self.get_statement(self.loan_id)
+        with self.assertNumQueries(0):
+            second = self.get_statement(self.loan_id)
+        self.assertEqual(first.data, second.data)
+
+    def test_payment_invalidates_statement(self):
+        self.get_statement(self.loan_id)
+        # The version bump waits for the payment's transaction to commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_payment(self.loan_id, 20000)
+        response = self.get_statement(self.loan_id)
+        self.assertEqual(len(response.data["prev_txn"]), 1)
+        self.assertLess(len(response.data["upcoming_transactions"]), 12)
+
+    def test_pages_are_cached_separately(self):
+        full = self.get_statement(self.loan_id)
+        page = self.client.generic(
+            "GET",
+            "/api/get-statement/",
+            json.dumps({"loan_id": str(self.loan_id), "page_size": 5}),
+            content_type="application/json",
+        )
+        self.assertEqual(len(full.data["upcoming_transactions"]), 12)
+        self.assertEqual(len(page.data["upcoming_transactions"]), 5)
+
+    def test_stats_count_hits_and_misses(self):
+        self.api_user.is_staff = True
+        before = self.client.get("/api/statement-cache-stats/").data
+        self.get_statement(self.loan_id)
+        self.get_statement(self.loan_id)
+        after = self.client.get("/api/statement-cache-stats/").data
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+
+    def test_stats_require_staff(self):
+        response = self.client.get("/api/statement-cache-stats/")
+        self.assertEqual(response.status_code, 403)
+
+
+class AmortisationTests(SimpleTestCase):
+    def test_vectorised_schedules_match_the_scalar_path(self):
+        grid = list(
+            itertools.product(
+                [1000, 49999, 100000, 100002, 123457, 8500000],
+                [Decimal(rate) for rate in ("0", "14", "14.5", "15", "18.25", "21.999")],
+                [1, 6, 12, 61, 360],
+            )
+        )
+        principals, rates, terms = zip(*grid)
+        first_due = date(2024, 2, 1)
+        schedules = amortisation.build_schedules(principals, rates, terms, [first_due] * len(grid))
+        for index, (principal, rate, term) in enumerate(grid):
+            with self.subTest(principal=principal, rate=rate, term=term):
+                expected = amortisation.scalar_installments(principal, rate, term, first_due)
+                self.assertEqual(schedules.installments(index), expected)
+                self.assertEqual(schedules.monthly_emi(index), expected[0]["amount_due"])
+
+    def test_half_cent_interest_rounds_up(self):
+        # 100002.00 at 15% a year accrues exactly 1250.025 in the first month.
+        schedules = amortisation.build_schedules([100002], [15], [12], [date(2024, 2, 1)])
+        self.assertEqual(schedules.installments(0)[0]["interest"], Decimal("1250.03"))
+
+
+class LoanApplyAtomicityTests(LoanApiTestCase):
+    def assertNothingCreated(self, profile):
+        self.assertFalse(Loan.objects.filter(user_id=profile.id).exists())
+        self.assertFalse(LoanTransactionDetail.objects.exists())
+        self.assertFalse(EMISchedule.objects.exists())
+
+    def test_failed_schedule_insert_rolls_back_the_loan(self):
+        profile = self.create_profile()
+        with mock.patch.object(
+            EMISchedule.objects, "bulk_create", side_effect=DatabaseError("disk full")
+        ):
+            with self.assertRaises(DatabaseError):
+                self.apply_loan(profile)
+        self.assertNothingCreated(profile)
+
+        response = self.apply_loan(profile)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(EMISchedule.objects.count(), 12)
+
+    async def test_async_apply_rolls_back_on_a_failed_schedule_insert(self):
+        token = await Token.objects.acreate(user=self.api_user)
+        profile = await sync_to_async(self.create_profile)()
+        payload = {
+            "unique_user_id": str(profile.id),
+            "loan_type": "car",
+            "loan_amount": 100000,
+            "interest_rate": 15,
+            "term_period": 12,
+            "disbursement_date": "15-01-2024",
+        }
+        with mock.patch.object(
+            EMISchedule.objects, "bulk_create", side_effect=DatabaseError("disk full")
+        ):
+            with self.assertRaises(DatabaseError):
+                await AsyncClient().post(
+                    "/api/async/apply-loan/",
+                    payload,
+                    content_type="application/json",
+                    authorization=f"Token {token.key}",
+                )
+        await sync_to_async(self.assertNothingCreated)(profile)
+
+
+class BulkLoanApplyTests(LoanApiTestCase):
+    def application(self, profile, **overrides):
+        application = {
+            "unique_user_id": str(profile.id),
+            "loan_type": "car",
+            "loan_amount": 100000,
+            "interest_rate": 15,
+            "term_period": 12,
+            "disbursement_date": "15-01-2024",
+        }
+        application.update(overrides)
+        return application
+
+    def apply_loans(self, applications):
+        return self.client.post(
+            "/api/apply-loans/", {"applications": applications}, format="json"
+        )
+
+    def test_query_count_is_independent_of_batch_size(self):
+        applications = [self.application(self.create_profile()) for _ in range(10)]
+        # users IN + loans IN + savepoint pair + three bulk inserts
+        with self.assertNumQueries(7):
+            response = self.apply_loans(applications)
+        self.assertTrue(all("loan_id" in result for result in response.data["results"]))
+        self.assertEqual(EMISchedule.objects.count(), 10 * 12)
+
+    def test_results_match_single_application_rules(self):
+        eligible = self.create_profile()
+        low_score = self.create_profile(credit_score=100)
+        applications = [
+            self.application(eligible),
+            self.application(eligible),
+            self.application(low_score),
+            self.application(eligible, interest_rate=10),
+            self.application(eligible, unique_user_id=str(uuid.uuid4())),
+            {"loan_type": "car"},
+        ]
+        results = self.apply_loans(applications).data["results"]
+        self.assertIn("loan_id", results[0])
+        self.assertEqual(
+            [result.get("error") for result in results[1:5]],
+            [
+                "User previous loan already exists!",
+                "User is not eligible for the loan!",
+                "Interest rate should be greater than 14%!",
+                "User does not exist!",
+            ],
+        )
+        self.assertIn("unique_user_id", results[5]["error"])
+
+    def test_bulk_and_single_schedules_agree(self):
+        bulk_id = self.apply_loans([self.application(self.create_profile())]).data["results"][0]["loan_id"]
+        single_id = self.apply_loan(self.create_profile()).data["loan_id"]
+        installments = EMISchedule.objects.order_by("installment_no").values_list("amount_due", "due_date")
+        self.assertEqual(
+            list(installments.filter(loan_id=bulk_id)), list(installments.filter(loan_id=single_id))
+        )
+
+    def test_empty_batch_is_rejected(self):
+        self.assertEqual(self.apply_loans([]).status_code, 400)
+
+
+class BulkPaymentTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.loan_ids = [
+            self.apply_loan(self.create_profile()).data["loan_id"] for _ in range(3)
+        ]
+
+    def post_payments(self, payments):
+        return self.client.post("/api/make-payments/", {"payments": payments}, format="json")
+
+    def settlement(self, amount=9025.83):
+        return [
+            {"loan_id": str(loan_id), "amount": amount, "external_ref": f"UTR-{i}"}
+            for i, loan_id in enumerate(self.loan_ids)
+        ]
+
+    def test_posts_batch_with_fixed_query_count(self):
+        # write lock (SQLite) + locked details + posted refs + open installments
+        # + savepoint pair + 4 writes
+        with self.assertNumQueries(10):
+            response = self.post_payments(self.settlement())
+        self.assertEqual([row["status"] for row in response.data["results"]], ["posted"] * 3)
+        for loan_id in self.loan_ids:
+            detail = LoanTransactionDetail.objects.get(loan_id=loan_id)
+            self.assertEqual(detail.emi_rem, 11)
+            self.assertEqual(EMITransaction.objects.filter(loan_id=loan_id).count(), 1)
+
+    def test_replaying_a_file_is_a_no_op(self):
+        self.post_payments(self.settlement())
+        response = self.post_payments(self.settlement())
+        self.assertEqual([row["status"] for row in response.data["results"]], ["duplicate"] * 3)
+        self.assertEqual(EMITransaction.objects.count(), 3)
+
+    def test_matches_single_payment_result(self):
+        self.post_payments(self.settlement(amount=20000)[:1])
+        single_loan = self.apply_loan(self.create_profile()).data["loan_id"]
+        self.make_payment(single_loan, 20000)
+        fields = ("emi_rem", "new_emi_date", "new_emi_amt", "loan__rem_amount")
+        details = LoanTransactionDetail.objects.values_list(*fields)
+        self.assertEqual(
+            details.get(loan_id=self.loan_ids[0]), details.get(loan_id=single_loan)
+        )
+
+    def test_replaying_archived_payments_is_a_no_op(self):
+        self.post_payments(self.settlement()[:1])
+        EMITransaction.objects.update(payment_date=datetime(2024, 1, 10, tzinfo=timezone.utc))
+        LoanTransactionDetail.objects.filter(loan_id=self.loan_ids[0]).update(is_active=False)
+        self.assertEqual(archive.archive_closed_periods().emi_transactions_moved, 1)
+
+        response = self.post_payments(self.settlement()[:1])
+
+        self.assertEqual(response.data["results"][0]["status"], "duplicate")
+        self.assertFalse(EMITransaction.objects.exists())
+        self.assertEqual(EMITransactionArchive.objects.get().external_ref, "UTR-0")
+
+    def test_payments_on_closed_loans_are_rejected(self):
+        LoanTransactionDetail.objects.filter(loan_id=self.loan_ids[0]).update(is_active=False)
+
+        results = self.post_payments(self.settlement()[:2]).data["results"]
+        single = self.make_payment(self.loan_ids[0], 9025.83)
+
+        self.assertEqual([row["status"] for row in results], ["rejected", "posted"])
+        self.assertEqual(results[0]["error"], "Loan is closed")
+        self.assertEqual(single.status_code, 400)
+        self.assertEqual(single.data, {"error": "Loan is closed"})
+        self.assertFalse(EMITransaction.objects.filter(loan_id=self.loan_ids[0]).exists())
+
+    def test_rejects_rows_individually(self):
+        payments = self.settlement()
+        payments[1]["amount"] = -5
+        payments[2]["loan_id"] = str(uuid.uuid4())
+        results = self.post_payments(payments).data["results"]
+        self.assertEqual([row["status"] for row in results], ["posted", "rejected", "rejected"])
+        self.assertEqual(results[2]["error"], "Invalid Loan Id")
+
+    def test_rejects_overlong_external_refs(self):
+        payments = self.settlement()[:2]
+        payments[0]["external_ref"] = "U" * 65
+        results = self.post_payments(payments).data["results"]
+        self.assertEqual([row["status"] for row in results], ["rejected", "posted"])
+        self.assertIn("at most 64 characters", results[0]["error"])
+        self.assertFalse(EMITransaction.objects.filter(loan_id=self.loan_ids[0]).exists())
+
+    def test_rejects_amounts_below_a_cent(self):
+        payments = self.settlement()[:2]
+        payments[0]["amount"] = "9025.835"
+        results = self.post_payments(payments).data["results"]
+        self.assertEqual([row["status"] for row in results], ["rejected", "posted"])
+        self.assertFalse(EMITransaction.objects.filter(loan_id=self.loan_ids[0]).exists())
+
+
+# Real threads, each with its own connection, so the locking is exercised for real.
+class PaymentValidationTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.loan_id = self.apply_loan(self.create_profile()).data["loan_id"]
+        self.rem_amount = Loan.objects.get(pk=self.loan_id).rem_amount
+
+    def assertNothingPosted(self):
+        self.assertEqual(Loan.objects.get(pk=self.loan_id).rem_amount, self.rem_amount)
+        self.assertFalse(EMITransaction.objects.filter(loan_id=self.loan_id).exists())
+        self.assertIsNone(LoanTransactionDetail.objects.get(loan_id=self.loan_id).last_txn_date)
+
+    def test_invalid_amounts_are_rejected(self):
+        for amount in ("abc", 0, -50000, "1e400", "9025.835"):
+            with self.subTest(amount=amount):
+                response = self.make_payment(self.loan_id, amount)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("amount", response.json())
+        self.assertNothingPosted()
+
+    def test_missing_amount_is_rejected(self):
+        response = self.client.post(
+            "/api/make-payment/", {"loan_id": str(self.loan_id)}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertNothingPosted()
+
+    def test_async_view_rejects_negative_amounts(self):
+        token = Token.objects.create(user=self.api_user)
+        response = async_to_sync(AsyncClient().post)(
+            "/api/async/make-payment/",
+            {"loan_id": str(self.loan_id), "amount": -50000},
+            content_type="application/json",
+            authorization=f"Token {token.key}",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertNothingPosted()
+
+
+class PortfolioRevaluationTests(LoanApiTestCase):
+    def revalued(self, loan_id):
+        portfolio.revalue_portfolio(as_of=date.today())
+        return LoanTransactionDetail.objects.get(loan_id=loan_id)
+
+    def test_outstanding_principal_follows_the_amount_paid(self):
+        unpaid = self.apply_loan(self.create_profile()).data["loan_id"]
+        paid = self.apply_loan(self.create_profile()).data["loan_id"]
+        part_paid = self.apply_loan(self.create_profile()).data["loan_id"]
+        self.make_payment(paid, "9025.83")
+        self.make_payment(part_paid, "5000")
+
+        self.assertEqual(self.revalued(unpaid).outstanding_principal, Decimal("100000.00"))
+        # 100000 plus a month's interest (1250) less one EMI
+        self.assertEqual(self.revalued(paid).outstanding_principal, Decimal("92224.17"))
+        # 5000 covers the month's 1250 of interest and 3750 of principal
+        self.assertEqual(self.revalued(part_paid).outstanding_principal, Decimal("96250.00"))
+
+    def test_revaluation_keeps_the_schedule_next_emi(self):
+        loan_id = self.apply_loan(self.create_profile()).data["loan_id"]
+        self.make_payment(loan_id, "5000")
+        owed = LoanTransactionDetail.objects.get(loan_id=loan_id).new_emi_amt
+
+        detail = self.revalued(loan_id)
+        self.assertEqual(detail.new_emi_amt, owed)
+        self.assertEqual(owed, Decimal("4025.83"))
+        self.assertIsNotNone(detail.revalued_at)
+
+    def test_long_loans_match_the_schedule_balance(self):
+        loan = Loan(
+            principal_amount=8500000,
+            interest_rate=Decimal("15.5"),
+            loan_term=360,
+            disbursal_date=datetime(2024, 1, 15, tzinfo=timezone.utc),
+        )
+        rows = amortisation.scalar_installments(8500000, "15.5", 360, date(2024, 2, 1))
+        for paid in (240, 359):
+            with self.subTest(paid=paid):
+                detail = LoanTransactionDetail(loan=loan, emi_rem=360 - paid)
+                portfolio.revalue_details([detail], date(2024, 1, 15))
+                self.assertEqual(detail.outstanding_principal, rows[paid - 1]["balance"])
+
+
+class ConcurrentPaymentTests(TransactionTestCase):
+    THREADS = 8
+
+    def setUp(self):
+        self.api_user = User.objects.create(username="api-client")
+        self.client = APIClient()
+        self.client.force_authenticate(self.api_user)
+        profile = UserProfile.objects.create(
+            name="Test User",
+            email_id="test@example.com",
+            aadhar_id=uuid.uuid4(),
+            annual_income=900000,
+            credit_score=600,
+        )
+        self.loan_id = self.client.post(
+            "/api/apply-loan/",
+            {
+                "unique_user_id": str(profile.id),
+                "loan_type": "car",
+                "loan_amount": 100000,
+                "interest_rate": 15,
+                "term_period": 12,
+                "disbursement_date": "15-01-2024",
+            },
+            format="json",
+        ).data["loan_id"]
+        self.rem_amount = Loan.objects.get(pk=self.loan_id).rem_amount
+
+    def pay_concurrently(self, headers_for):
+        barrier = threading.Barrier(self.THREADS)
+
+        def pay(n):
+            client = APIClient()
+            client.force_authenticate(self.api_user)
+            barrier.wait()
+            try:
+                return client.post(
+                    "/api/make-payment/",
+                    {"loan_id": self.loan_id, "amount": "9025.83"},
+                    format="json",
+                    **headers_for(n),
+                )
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(self.THREADS) as pool:
+            return list(pool.map(pay, range(self.THREADS)))
+
+    def assert_paid_once(self):
+        detail = LoanTransactionDetail.objects.select_related("loan").get(loan_id=self.loan_id)
+        self.assertEqual(EMITransaction.objects.filter(loan_id=self.loan_id).count(), 1)
+        self.assertEqual(detail.loan.rem_amount, self.rem_amount - 9026)
+        self.assertEqual(detail.emi_rem, 11)
+        self.assertEqual(
+            EMISchedule.objects.filter(loan_id=self.loan_id, status=EMISchedule.PAID).count(), 1
+        )
+
+    def test_concurrent_payments_post_exactly_once(self):
+        responses = self.pay_concurrently(lambda n: {})
+        self.assertEqual(sorted(r.status_code for r in responses), [200] + [400] * (self.THREADS - 1))
+        self.assert_paid_once()
+
+    def test_retries_with_one_idempotency_key_replay_the_first_response(self):
+        responses = self.pay_concurrently(lambda n: {"HTTP_IDEMPOTENCY_KEY": "retry-1"})
+        self.assertEqual({r.status_code for r in responses}, {200})
+        self.assertEqual({r.data["message"] for r in responses}, {"Payment successfully received"})
+        self.assert_paid_once()
+
+
+# The async views must answer exactly like their sync counterparts.
+class AsyncViewTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        token = Token.objects.create(user=self.api_user)
+        self.async_client = AsyncClient()
+        # AsyncClient (Django 4.1) takes extra headers by their plain lowercase names.
+        self.auth = {"authorization": f"Token {token.key}"}
+
+    async def apost(self, path, payload):
+        return await self.async_client.post(
+            path, payload, content_type="application/json", **self.auth
+        )
+
+    async def test_rejects_missing_token(self):
+        response = await AsyncClient().post("/api/async/apply-loan/", {}, content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_register_rejects_duplicate_aadhar(self):
+        payload = {
+            "name": "New User",
+            "email_id": "new@example.com",
+            "aadhar_id": str(uuid.uuid4()),
+            "annual_income": "500000",
+        }
+        created = await self.apost("/api/async/register-user/", payload)
+        duplicate = await self.apost("/api/async/register-user/", payload)
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(duplicate.status_code, 400)
+        self.assertIn("aadhar_id", duplicate.json())
+
+    async def test_apply_pay_and_statement_match_sync_views(self):
+        profile = await sync_to_async(self.create_profile)()
+        payload = {
+            "unique_user_id": str(profile.id),
+            "loan_type": "car",
+            "loan_amount": 100000,
+            "interest_rate": 15,
+            "term_period": 12,
+            "disbursement_date": "15-01-2024",
+        }
+        applied = await self.apost("/api/async/apply-loan/", payload)
+        self.assertEqual(applied.status_code, 200)
+        loan_id = applied.json()["loan_id"]
+        again = await self.apost("/api/async/apply-loan/", payload)
+        self.assertEqual(again.json(), {"error": "User previous loan already exists!"})
+
+        paid = await self.apost("/api/async/make-payment/", {"loan_id": loan_id, "amount": 20000})
+        self.assertEqual(paid.json()["message"], "Payment successfully received")
+
+        statement = await self.async_client.generic(
+            "GET",
+            "/api/async/get-statement/",
+            json.dumps({"loan_id": loan_id, "page_size": 5}),
+            content_type="application/json",
+            **self.auth,
+        )
+        sync_statement = await sync_to_async(self.client.generic)(
+            "GET",
+            "/api/get-statement/",
+            json.dumps({"loan_id": loan_id, "page_size": 5}),
+            content_type="application/json",
+        )
+        self.assertEqual(statement.json(), sync_statement.json())
+        self.assertEqual(len(statement.json()["prev_txn"]), 1)
+
+
+class RunningBalanceTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.aadhar_id = uuid.uuid4()
+
+    def add(self, amount, transaction_type="credit", aadhar_id=None):
+        return TransactionStore.objects.create(
+            aadhar_id=aadhar_id or self.aadhar_id, amount=amount, transaction_type=transaction_type
+        )
+
+    def refresh(self):
+        return refresh_balances([self.aadhar_id])[self.aadhar_id]
+
+    def test_refresh_folds_only_rows_past_the_watermark(self):
+        self.add(1000)
+        debit = self.add(300, "debit")
+        balance = self.refresh()
+        self.assertEqual((balance.credit_total, balance.debit_total), (1000, 300))
+        self.assertEqual(balance.last_transaction_id, debit.id)
+
+        # Rows at or below the watermark are never summed again, so editing one
+        # in place does not move the running totals.
+        TransactionStore.objects.filter(id=debit.id).update(amount=999)
+        credit = self.add(500)
+        self.add(70, aadhar_id=uuid.uuid4())
+        balance = self.refresh()
+        self.assertEqual((balance.credit_total, balance.debit_total), (1500, 300))
+        self.assertEqual(balance.last_transaction_id, credit.id)
+
+        unchanged = self.refresh()
+        self.assertEqual((unchanged.credit_total, unchanged.last_transaction_id), (1500, credit.id))
+        self.assertEqual(AccountBalance.objects.get(aadhar_id=self.aadhar_id).credit_total, 1500)
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        self.add(1000)
+        last = self.add(300, "debit")
+        self.refresh()
+        AccountBalance.objects.filter(aadhar_id=self.aadhar_id).update(credit_total=5)
+        unbalanced = uuid.uuid4()
+        self.add(40, aadhar_id=unbalanced)
+
+        drift = reconcile_balances(apply=False)
+        self.assertCountEqual(
+            drift,
+            [
+                (self.aadhar_id, Decimal(5), Decimal(1000), Decimal(300), Decimal(300)),
+                (unbalanced, None, Decimal(40), None, Decimal(0)),
+            ],
+        )
+        self.assertEqual(AccountBalance.objects.get(aadhar_id=self.aadhar_id).credit_total, 5)
+
+        self.assertEqual(len(reconcile_balances()), 2)
+        balance = AccountBalance.objects.get(aadhar_id=self.aadhar_id)
+        self.assertEqual((balance.credit_total, balance.last_transaction_id), (1000, last.id))
+        self.assertEqual(AccountBalance.objects.get(aadhar_id=unbalanced).credit_total, 40)
+        self.assertEqual(reconcile_balances(apply=False), [])
+
+
+class CreditScoreFanOutTests(LoanApiTestCase):
+    BALANCES = [50000, 250000, 400000, 700000, 2000000]
+
+    def setUp(self):
+        super().setUp()
+        # Django settings are loaded under the CELERY_ namespace, so override those keys.
+        eager = {"CELERY_TASK_ALWAYS_EAGER": True, "CELERY_TASK_EAGER_PROPAGATES": True}
+        previous = {key: celery_app.conf.get(key, False) for key in eager}
+        celery_app.conf.update(eager)
+        self.addCleanup(celery_app.conf.update, previous)
+
+        self.profiles = []
+        for balance in self.BALANCES:
+            profile = self.create_profile(credit_score=None)
+            TransactionStore.objects.create(
+                aadhar_id=profile.aadhar_id, amount=balance + 1000, transaction_type="credit"
+            )
+            TransactionStore.objects.create(
+                aadhar_id=profile.aadhar_id, amount=1000, transaction_type="debit"
+            )
+            self.profiles.append(profile)
+
+    def test_chord_scores_every_user_and_summarises(self):
+        summary = tasks.credit_score_workflow(chunk_size=2).apply_async().get()
+
+        self.assertEqual(summary["scored"], len(self.BALANCES))
+        self.assertEqual(summary["chunks"], 3)
+        self.assertEqual(
+            summary["distribution"], {"300-449": 2, "450-599": 1, "600-749": 1, "900": 1}
+        )
+        scores = [
+            UserProfile.objects.get(id=profile.id).credit_score for profile in self.profiles
+        ]
+        self.assertEqual(scores, [300, 400, 500, 700, 900])
+
+    def test_chunk_query_count_is_independent_of_chunk_size(self):
+        first_id, last_id = tasks.scoring.plan_chunks(chunk_size=len(self.BALANCES))[0]
+        with self.assertNumQueries(8):
+            result = tasks.credit_score_chunk(first_id, last_id)
+        self.assertEqual(result["scored"], len(self.BALANCES))
+
+    def test_batch_group_scores_each_list_of_users(self):
+        ids = [str(profile.id) for profile in self.profiles]
+        with CaptureQueriesContext(connections["default"]) as small:
+            tasks.credit_score_calculate_batch([ids[0]])
+        with CaptureQueriesContext(connections["default"]) as large:
+            tasks.credit_score_calculate_batch(ids)
+        self.assertEqual(len(small), len(large))
+
+        UserProfile.objects.update(credit_score=None)
+        batches = group(
+            tasks.credit_score_calculate_batch.s(ids[:3]),
+            tasks.credit_score_calculate_batch.s(ids[3:]),
+        )
+        self.assertEqual(batches.apply_async().get(), [3, 2])
+        scores = [
+            UserProfile.objects.get(id=profile.id).credit_score for profile in self.profiles
+        ]
+        self.assertEqual(scores, [300, 400, 500, 700, 900])
+
+
+class DirtyCreditScoreTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile = self.create_profile(credit_score=None)
+
+    def credit(self, amount):
+        TransactionStore.objects.create(
+            aadhar_id=self.profile.aadhar_id, amount=amount, transaction_type="credit"
+        )
+
+    @override_settings(CREDIT_SCORE_SETTLE_SECONDS=0)
+    def test_transactions_for_one_user_collapse_into_one_rescore(self):
+        for _ in range(3):
+            self.credit(100000)
+        self.assertEqual(CreditScoreQueue.objects.count(), 1)
+
+        result = tasks.credit_score_rescore_dirty()
+
+        self.assertEqual(result, {"drained": 1, "scored": 1, "batches": 1})
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.credit_score, 430)
+        self.assertFalse(CreditScoreQueue.objects.exists())
+
+    def test_recent_marks_wait_for_the_settle_period(self):
+        self.credit(500000)
+
+        self.assertEqual(tasks.credit_score_rescore_dirty()["drained"], 0)
+        self.profile.refresh_from_db()
+        self.assertIsNone(self.profile.credit_score)
+
+    def test_queue_drains_in_batches_until_empty(self):
+        others = [self.create_profile(credit_score=None) for _ in range(4)]
+        self.credit(500000)
+        for profile in others:
+            TransactionStore.objects.create(
+                aadhar_id=profile.aadhar_id, amount=100000, transaction_type="credit"
+            )
+        # An aadhar that has not registered yet is drained without a score.
+        TransactionStore.objects.create(
+            aadhar_id=uuid.uuid4(), amount=100000, transaction_type="credit"
+        )
+
+        result = scoring.rescore_dirty(batch_size=2)
+
+        self.assertEqual(result, {"drained": 6, "scored": 5, "batches": 3})
+        self.assertFalse(CreditScoreQueue.objects.exists())
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.credit_score, 560)
+
+    def test_failed_batch_stays_queued(self):
+        self.credit(500000)
+        with mock.patch.object(scoring, "score_users", side_effect=DatabaseError("locked")):
+            with self.assertRaises(DatabaseError):
+                scoring.rescore_dirty()
+        self.assertTrue(CreditScoreQueue.objects.filter(aadhar_id=self.profile.aadhar_id).exists())
+
+    def test_ingestion_marks_every_aadhar_in_the_file(self):
+        other = self.create_profile(credit_score=None)
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "w") as fp:
+            fp.write("aadhar_id,amount,transaction_type\n")
+            for aadhar_id in (self.profile.aadhar_id, other.aadhar_id, self.profile.aadhar_id):
+                fp.write(f"{aadhar_id},1000,credit\n")
+
+        ingest_transactions(path)
+
+        self.assertEqual(
+            set(CreditScoreQueue.objects.values_list("aadhar_id", flat=True)),
+            {self.profile.aadhar_id, other.aadhar_id},
+        )
+        self.assertFalse(TransactionStore.objects.filter(user__isnull=True).exists())
+
+
+class IngestionTests(LoanApiTestCase):
+    def write_file(self, lines, suffix=".csv"):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "w") as fp:
+            fp.write("".join(f"{line}\n" for line in lines))
+        return path
+
+    def test_resume_after_a_failed_batch_writes_every_row_once(self):
+        aadhar_id = uuid.uuid4()
+        path = self.write_file(
+            ["aadhar_id,amount,transaction_type"]
+            + [f"{aadhar_id},{amount},credit" for amount in range(1, 11)]
+        )
+        checkpoint = f"{path}.checkpoint"
+        bulk_create = TransactionStore.objects.bulk_create
+        calls = []
+
+        def fail_second_batch(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                raise DatabaseError("disk full")
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(TransactionStore.objects, "bulk_create", fail_second_batch):
+            with self.assertRaises(DatabaseError):
+                ingest_transactions(path, batch_size=3, checkpoint_path=checkpoint)
+        self.addCleanup(os.remove, checkpoint)
+        self.assertEqual(TransactionStore.objects.count(), 3)
+
+        report = ingest_transactions(path, batch_size=3, checkpoint_path=checkpoint, resume=True)
+        self.assertEqual(report.rows_written, 7)
+        self.assertEqual(
+            sorted(TransactionStore.objects.values_list("amount", flat=True)),
+            [Decimal(amount) for amount in range(1, 11)],
+        )
+
+        rerun = ingest_transactions(path, batch_size=3, checkpoint_path=checkpoint, resume=True)
+        self.assertEqual((rerun.rows_read, rerun.rows_written), (0, 0))
+        self.assertEqual(TransactionStore.objects.count(), 10)
+        balance = refresh_balances([aadhar_id])[aadhar_id]
+        self.assertEqual(balance.credit_total, Decimal(55))
+
+    def test_malformed_rows_are_reported_and_skipped(self):
+        aadhar_id = uuid.uuid4()
+        path = self.write_file(
+            [
+                "aadhar_id,amount,transaction_type,transaction_date",
+                f"{aadhar_id},100,credit,2024-01-10",
+                "not-a-uuid,100,credit,2024-01-10",
+                f"{aadhar_id},abc,credit,2024-01-10",
+                f"{aadhar_id},-5,debit,2024-01-10",
+                f"{aadhar_id},100,transfer,2024-01-10",
+                f"{aadhar_id},100,debit,yesterday",
+                f"{aadhar_id},,debit,2024-01-10",
+                f"{aadhar_id},40,DEBIT,",
+            ]
+        )
+
+        report = ingest_transactions(path)
+
+        self.assertEqual((report.rows_read, report.rows_written, report.rows_rejected), (8, 2, 6))
+        self.assertEqual(
+            [error["error"].split(":")[0] for error in report.errors],
+            [
+                "aadhar_id",
+                "amount",
+                "amount",
+                "transaction_type",
+                "transaction_date",
+                "missing field 'amount'",
+            ],
+        )
+        self.assertEqual(
+            sorted(TransactionStore.objects.values_list("transaction_type", "amount")),
+            [("credit", Decimal(100)), ("debit", Decimal(40))],
+        )
+
+    def test_undecodable_lines_are_rejected(self):
+        aadhar_id = uuid.uuid4()
+        path = self.write_file(
+            ["aadhar_id,amount,transaction_type", f"{aadhar_id},100,credit", f"{aadhar_id},200,credit"]
+        )
+        with open(path, "rb") as fp:
+            content = fp.read()
+        with open(path, "wb") as fp:
+            fp.write(content.replace(b",100,", b",1\xff00,"))
+
+        report = ingest_transactions(path)
+
+        self.assertEqual((report.rows_read, report.rows_written, report.rows_rejected), (2, 1, 1))
+        self.assertTrue(report.errors[0]["error"].startswith("invalid UTF-8"))
+        self.assertEqual(TransactionStore.objects.get().amount, Decimal(200))
+
+    def test_transaction_date_is_taken_from_the_file(self):
+        aadhar_id = uuid.uuid4()
+        csv_path = self.write_file(
+            [
+                "aadhar_id,amount,transaction_type,transaction_date",
+                f"{aadhar_id},100,credit,2024-01-10",
+                f"{aadhar_id},200,credit,2024-01-11T09:30:00+05:30",
+            ]
+        )
+        jsonl_path = self.write_file(
+            [
+                json.dumps(
+                    {
+                        "aadhar_id": str(aadhar_id),
+                        "amount": 300,
+                        "transaction_type": "debit",
+                        "transaction_date": "2024-01-12T23:15:00Z",
+                    }
+                ),
+                json.dumps({"aadhar_id": str(aadhar_id), "amount": 400, "transaction_type": "debit"}),
+            ],
+            suffix=".jsonl",
+        )
+
+        before = datetime.now(timezone.utc)
+        ingest_transactions(csv_path)
+        ingest_transactions(jsonl_path)
+
+        dates = dict(TransactionStore.objects.values_list("amount", "transaction_date"))
+        self.assertEqual(dates[Decimal(100)], datetime(2024, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(dates[Decimal(200)], datetime(2024, 1, 11, 4, 0, tzinfo=timezone.utc))
+        self.assertEqual(dates[Decimal(300)], datetime(2024, 1, 12, 23, 15, tzinfo=timezone.utc))
+        self.assertGreaterEqual(dates[Decimal(400)], before)
+
+
+class TransactionUserTests(LoanApiTestCase):
+    def test_new_keys_are_time_ordered(self):
+        keys = [uuid7() for _ in range(20000)]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+        self.assertEqual({(key.version, key.variant) for key in keys}, {(7, uuid.RFC_4122)})
+
+        profiles = [self.create_profile() for _ in range(20)]
+        self.assertEqual([p.id for p in profiles], sorted(p.id for p in profiles))
+
+    def test_transactions_link_to_user_before_and_after_registration(self):
+        aadhar_id = uuid.uuid4()
+        early = TransactionStore.objects.create(
+            aadhar_id=aadhar_id, amount=1000, transaction_type="credit"
+        )
+        self.assertIsNone(early.user_id)
+
+        response = self.client.post(
+            "/api/register-user/",
+            {
+                "name": "Late User",
+                "email_id": "late@example.com",
+                "aadhar_id": str(aadhar_id),
+                "annual_income": "500000",
+            },
+            format="json",
+        )
+        late = TransactionStore.objects.create(
+            aadhar_id=aadhar_id, amount=500, transaction_type="debit"
+        )
+
+        user_id = uuid.UUID(str(response.data["id"]))
+        early.refresh_from_db()
+        self.assertEqual(early.user_id, user_id)
+        self.assertEqual(late.user_id, user_id)
+
+
+class ArchiveTests(LoanApiTestCase):
+    OLD = datetime(2024, 1, 10, tzinfo=timezone.utc)
+
+    def setUp(self):
+        super().setUp()
+        self.profile = self.create_profile()
+
+    def transaction(self, amount, transaction_type="credit", when=None):
+        return TransactionStore.objects.create(
+            aadhar_id=self.profile.aadhar_id,
+            amount=amount,
+            transaction_type=transaction_type,
+            transaction_date=when or datetime.now(timezone.utc),
+        )
+
+    def totals(self, queryset):
+        return Counter(
+            dict(
+                queryset.order_by()
+                .values("transaction_type")
+                .annotate(total=Sum("amount"))
+                .values_list("transaction_type", "total")
+            )
+        )
+
+    def test_closed_months_are_rolled_up_without_changing_balances(self):
+        for amount in (100, 200, 300):
+            self.transaction(amount, when=self.OLD)
+        self.transaction(50, "debit", when=self.OLD)
+        recent = self.transaction(1000)
+
+        report = archive.archive_closed_periods()
+
+        self.assertEqual((report.transactions_rolled_up, report.summaries_written), (4, 2))
+        self.assertEqual(list(TransactionStore.objects.values_list("id", flat=True)), [recent.id])
+        credit = TransactionMonthSummary.objects.get(transaction_type="credit")
+        self.assertEqual((credit.period, credit.amount, credit.transaction_count), (date(2024, 1, 1), 600, 3))
+
+        balance = refresh_balances([self.profile.aadhar_id])[self.profile.aadhar_id]
+        self.assertEqual((balance.credit_total, balance.debit_total), (1600, 50))
+        self.assertEqual(reconcile_balances(apply=False), [])
+        self.assertEqual(archive.archive_closed_periods().transactions_rolled_up, 0)
+
+    def test_rolled_up_rows_are_kept_in_the_archive(self):
+        old = [self.transaction(amount, when=self.OLD) for amount in (100, 200)]
+        old.append(self.transaction(75, "debit", when=self.OLD))
+        self.transaction(1000)
+        totals_before = self.totals(TransactionStore.objects.all())
+
+        archive.archive_closed_periods()
+
+        archived = TransactionArchive.objects.order_by("id")
+        self.assertEqual(
+            list(archived.values_list("id", "amount", "transaction_date", "user_id", "period")),
+            [(txn.id, txn.amount, self.OLD, self.profile.id, date(2024, 1, 1)) for txn in old],
+        )
+        self.assertEqual(
+            self.totals(TransactionStore.objects.all())
+            + self.totals(TransactionArchive.objects.all()),
+            totals_before,
+        )
+        summaries = TransactionMonthSummary.objects.values_list("transaction_type", "amount")
+        self.assertEqual(dict(summaries), self.totals(TransactionArchive.objects.all()))
+        self.assertEqual(reconcile_balances(apply=False), [])
+
+    def test_history_unions_hot_rows_and_archived_months(self):
+        self.transaction(100, when=self.OLD)
+        self.transaction(1000)
+        archive.archive_closed_periods()
+
+        history = archive.transaction_history(self.profile.aadhar_id)
+        self.assertEqual(
+            [(row["date"], row["amount"], row["transactions"]) for row in history],
+            [(date.today(), 1000, 1), (date(2024, 1, 1), 100, 1)],
+        )
+        recent = archive.transaction_history(self.profile.aadhar_id, since=date.today())
+        self.assertEqual([row["amount"] for row in recent], [1000])
+
+    def test_only_closed_loans_lose_their_emi_payments(self):
+        closed_loan = self.apply_loan(self.profile).data["loan_id"]
+        open_loan = self.apply_loan(self.create_profile()).data["loan_id"]
+        for loan_id in (closed_loan, open_loan):
+            self.make_payment(loan_id, 9025.83)
+        EMITransaction.objects.update(payment_date=self.OLD)
+        LoanTransactionDetail.objects.filter(loan_id=closed_loan).update(is_active=False)
+
+        report = archive.archive_closed_periods()
+
+        self.assertEqual(report.emi_transactions_moved, 1)
+        self.assertFalse(EMITransaction.objects.filter(loan_id=closed_loan).exists())
+        self.assertTrue(EMITransaction.objects.filter(loan_id=open_loan).exists())
+        self.assertEqual(EMITransactionArchive.objects.get().period, date(2024, 1, 1))
+        self.assertEqual(len(archive.loan_payments(closed_loan)), 1)
+
+
+class BalanceSnapshotTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # Four closed days ending yesterday, so the default windows line up with them
+        self.day = date.today() - timedelta(days=4)
+        self.profile = self.create_profile(credit_score=None)
+        # day 0: +500000, day 2: +300000 -100000, nothing on day 1
+        self.transaction(500000, "credit", 0)
+        self.transaction(300000, "credit", 2)
+        self.transaction(100000, "debit", 2)
+
+    def transaction(self, amount, transaction_type, day_offset):
+        when = datetime.combine(self.day + timedelta(days=day_offset), datetime.min.time())
+        return TransactionStore.objects.create(
+            aadhar_id=self.profile.aadhar_id,
+            amount=amount,
+            transaction_type=transaction_type,
+            transaction_date=when.replace(hour=12, tzinfo=timezone.utc),
+        )
+
+    def test_days_carry_the_previous_closing_balance_forward(self):
+        report = snapshots.build_snapshots(until=self.day + timedelta(days=2))
+
+        self.assertEqual((report.first_day, report.days, report.snapshots), (self.day, 3, 2))
+        rows = DailyBalanceSnapshot.objects.order_by("date").values_list(
+            "date", "closing_balance", "credit_total", "debit_total"
+        )
+        self.assertEqual(
+            list(rows),
+            [
+                (self.day, 500000, 500000, 0),
+                (self.day + timedelta(days=2), 700000, 300000, 100000),
+            ],
+        )
+        with self.assertNumQueries(1):
+            balance = snapshots.balance_on(self.profile.aadhar_id, self.day + timedelta(days=1))
+        self.assertEqual(balance, 500000)
+        self.assertEqual(snapshots.balance_on(self.profile.aadhar_id, self.day - timedelta(days=1)), 0)
+
+        # Incremental: the next run starts after the newest snapshot; rebuilding a day is idempotent.
+        self.assertEqual(snapshots.build_snapshots(until=self.day + timedelta(days=2)).days, 0)
+        snapshots.build_snapshots(since=self.day, until=self.day + timedelta(days=2))
+        self.assertEqual(DailyBalanceSnapshot.objects.count(), 2)
+
+    def test_late_rows_for_built_days_are_picked_up(self):
+        snapshots.build_snapshots(until=self.day + timedelta(days=2))
+        # A backfill for day 1 and a row for today, both inserted after the build.
+        self.transaction(40000, "debit", 1)
+        self.transaction(9999, "credit", 4)
+
+        report = snapshots.build_snapshots(until=self.day + timedelta(days=3))
+
+        self.assertEqual((report.first_day, report.days), (self.day + timedelta(days=1), 3))
+        rows = DailyBalanceSnapshot.objects.order_by("date").values_list("date", "closing_balance")
+        self.assertEqual(
+            list(rows),
+            [
+                (self.day, 500000),
+                (self.day + timedelta(days=1), 460000),
+                (self.day + timedelta(days=2), 660000),
+            ],
+        )
+        # The backfill is counted now and today's row is not late, so the next run
+        # starts after the newest snapshot again.
+        self.assertEqual(snapshots.next_unbuilt_day(), self.day + timedelta(days=3))
+
+        # Once the built days are archived, a backfill is added to the archived rows
+        # of its day rather than replacing them, and carried into later snapshots.
+        archive.archive_closed_periods(cutoff=self.day + timedelta(days=3))
+        self.assertEqual(TransactionArchive.objects.count(), 4)
+        self.transaction(7, "credit", 0)
+        snapshots.build_snapshots(until=self.day + timedelta(days=3))
+        rows = DailyBalanceSnapshot.objects.order_by("date").values_list(
+            "date", "closing_balance", "credit_total"
+        )
+        self.assertEqual(
+            list(rows),
+            [
+                (self.day, 500007, 500007),
+                (self.day + timedelta(days=1), 460007, 0),
+                (self.day + timedelta(days=2), 660007, 300000),
+            ],
+        )
+
+        # Snapshots after an explicit --until are rebuilt too.
+        self.transaction(3, "credit", 0)
+        snapshots.build_snapshots(until=self.day)
+        self.assertEqual(
+            snapshots.balance_on(self.profile.aadhar_id, self.day + timedelta(days=2)), 660010
+        )
+
+    def test_average_balance_feeds_the_credit_score_when_enabled(self):
+        until = self.day + timedelta(days=3)
+        snapshots.build_snapshots(until=until)
+
+        average = snapshots.average_daily_balances([self.profile.aadhar_id], 4, until)
+        # 500000 on days 0-1, 700000 on days 2-3
+        self.assertEqual(average[self.profile.aadhar_id], 600000)
+
+        with override_settings(CREDIT_SCORE_AVERAGE_DAYS=4):
+            tasks.credit_score_calculate(self.profile.id)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.credit_score, 630)
+
+
+@override_settings(PROFILING_MODE="header")
+class ProfilingTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        profiling.recent_profiles().clear()
+        self.profile = self.create_profile()
+
+    def timings(self, response):
+        return {
+            metric.split(";")[0]: metric for metric in response["Server-Timing"].split(", ")
+        }
+
+    def test_profiled_request_reports_queries_and_sections(self):
+        response = self.apply_loan(self.profile, headers={"HTTP_X_PROFILE": "1"})
+
+        timings = self.timings(response)
+        for name in ("total", "db", "parse", "calculate_emi", "create_loan", "serialize"):
+            self.assertIn(name, timings)
+        self.assertRegex(timings["db"], r'desc="[1-9][0-9]* queries"')
+
+        (entry,) = profiling.recent_profiles()
+        self.assertEqual((entry["path"], entry["status"]), ("/api/apply-loan/", 200))
+        self.assertGreater(entry["queries"], 0)
+
+    def test_requests_without_the_header_are_not_profiled(self):
+        response = self.apply_loan(self.profile)
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(len(profiling.recent_profiles()), 0)
+
+    @override_settings(PROFILING_MODE="off")
+    def test_header_is_ignored_when_profiling_is_off(self):
+        response = self.apply_loan(self.profile, headers={"HTTP_X_PROFILE": "1"})
+        self.assertNotIn("Server-Timing", response)
+
+    def test_async_views_count_queries_run_in_threads(self):
+        loan_id = self.apply_loan(self.profile).data["loan_id"]
+        token = Token.objects.create(user=self.api_user)
+        client = AsyncClient()
+
+        response = async_to_sync(client.post)(
+            "/api/async/make-payment/",
+            {"loan_id": str(loan_id), "amount": 9025.83},
+            content_type="application/json",
+            authorization=f"Token {token.key}",
+            x_profile="1",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('db;dur=0.00;desc="0 queries"', response["Server-Timing"])
+        self.assertIn("post_payment", self.timings(response))
+
+    def test_profiles_endpoint_is_staff_only(self):
+        self.apply_loan(self.profile, headers={"HTTP_X_PROFILE": "1"})
+        self.assertEqual(self.client.get("/api/profiles/").status_code, 403)
+
+        self.client.force_authenticate(User.objects.create(username="ops", is_staff=True))
+        body = self.client.get("/api/profiles/", {"path": "/api/apply-loan/"}).json()
+        self.assertEqual(body["summary"]["POST /api/apply-loan/"]["count"], 1)
+        self.assertEqual(len(body["entries"]), 1)
+
+
+class MetricsTests(LoanApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile = self.create_profile()
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_counted_by_url_name_with_their_queries(self):
+        requests = self.sample(
+            "casini_http_requests_total", view="apply_loan", method="POST", status="200"
+        )
+        latencies = self.sample(
+            "casini_http_request_duration_seconds_count", view="apply_loan", method="POST"
+        )
+        queries = self.sample("casini_http_request_db_queries_sum", view="apply_loan")
+
+        self.apply_loan(self.profile)
+
+        self.assertEqual(
+            self.sample(
+                "casini_http_requests_total", view="apply_loan", method="POST", status="200"
+            ),
+            requests + 1,
+        )
+        self.assertEqual(
+            self.sample(
+                "casini_http_request_duration_seconds_count", view="apply_loan", method="POST"
+            ),
+            latencies + 1,
+        )
+        self.assertGreater(
+            self.sample("casini_http_request_db_queries_sum", view="apply_loan"), queries
+        )
+
+    def test_unknown_paths_share_one_label(self):
+        before = self.sample(
+            "casini_http_requests_total", view="unmatched", method="GET", status="404"
+        )
+        self.client.get(f"/api/{uuid.uuid4()}/")
+        self.client.get(f"/api/{uuid.uuid4()}/")
+        self.assertEqual(
+            self.sample("casini_http_requests_total", view="unmatched", method="GET", status="404"),
+            before + 2,
+        )
+
+    def test_credit_score_task_runtime_queue_wait_and_failures(self):
+        name = tasks.credit_score_calculate.name
+        headers = {}
+        before_task_publish.send(sender=name, headers=headers)
+        headers["published_at"] -= 2
+        waits = self.sample("casini_celery_task_queue_wait_seconds_count", task=name)
+        runs = self.sample("casini_celery_task_duration_seconds_count", task=name)
+        failed = {"task": name, "exception": "UserNotFoundException"}
+        failures = self.sample("casini_celery_task_failures_total", **failed)
+
+        tasks.credit_score_calculate.apply(args=[self.profile.id], headers=headers)
+        tasks.credit_score_calculate.apply(args=[uuid.uuid4()])
+
+        self.assertEqual(
+            self.sample("casini_celery_task_queue_wait_seconds_count", task=name), waits + 1
+        )
+        self.assertGreaterEqual(
+            self.sample("casini_celery_task_queue_wait_seconds_sum", task=name), 2
+        )
+        self.assertEqual(
+            self.sample("casini_celery_task_duration_seconds_count", task=name), runs + 2
+        )
+        self.assertEqual(
+            self.sample("casini_celery_task_failures_total", **failed),
+            failures + 1,
+        )
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_metrics_endpoint_serves_text_format(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-me")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b"# TYPE casini_http_request_duration_seconds histogram", response.content)
+        self.assertIn(b"# TYPE casini_db_query_duration_seconds histogram", response.content)
+
+    def test_scrape_sums_samples_written_by_other_processes(self):
+        code = (
+            "from CasiniLoanApp import metrics; "
+            "metrics.REQUESTS.labels('apply_loan', 'POST', '200').inc(3)"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory}
+            for _ in range(2):
+                subprocess.run([sys.executable, "-c", code], env=env, check=True)
+            with mock.patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}):
+                text = metrics.scrape().decode()
+
+        self.assertIn(
+            'casini_http_requests_total{method="POST",status="200",view="apply_loan"} 6.0', text
+        )
+
+
+class JSONRendererTests(LoanApiTestCase):
+    def test_output_matches_drf_renderer(self):
+        data = {
+            "amount_due": Decimal("9025.830"),
+            "emi_date": date(2025, 1, 1),
+            "date": datetime(2024, 1, 1, 9, 30, 15, 250000, tzinfo=timezone.utc),
+            "loan_id": uuid.uuid4(),
+            "errors": {"loan_id": [ErrorDetail("This field is required.", code="required")]},
+            "counts": {600: 2},
+            "note": "line\u2028break",
+        }
+        self.assertEqual(renderers.JSONRenderer().render(data), DRFJSONRenderer().render(data))
+
+    def test_invalid_json_is_a_parse_error(self):
+        response = self.client.post("/api/apply-loan/", "{not json", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("JSON parse error", response.json()["detail"])
+
+
+class SQLitePragmaTests(TestCase):
+    def pragmas(self, *names):
+        connection = connections.create_connection("default")
+        self.addCleanup(connection.close)
+        with connection.cursor() as cursor:
+            values = {}
+            for name in names:
+                cursor.execute(f"PRAGMA {name}")
+                values[name] = cursor.fetchone()[0]
+        return values
+
+    def test_new_connections_apply_the_pragmas(self):
+        self.assertEqual(
+            self.pragmas("journal_mode", "synchronous", "cache_size", "temp_store", "busy_timeout"),
+            {
+                "journal_mode": "wal",
+                "synchronous": 1,
+                "cache_size": -64000,
+                "temp_store": 2,
+                "busy_timeout": settings.DATABASES["default"]["OPTIONS"]["timeout"] * 1000,
+            },
+        )
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_tuning_can_be_switched_off(self):
+        # SQLite's own defaults: synchronous=FULL and a 2 MiB page cache.
+        self.assertEqual(
+            self.pragmas("synchronous", "cache_size"), {"synchronous": 2, "cache_size": -2000}
+        )
+
+
+# The replica is a second SQLite file that nothing replicates into, so a read that
+# reaches it finds none of the rows the test wrote to the primary.
+@override_settings(REPLICA_DATABASE="replica")
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="api-client"))
+        self.profile = UserProfile.objects.create(
+            name="Test User",
+            email_id="test@example.com",
+            aadhar_id=uuid.uuid4(),
+            annual_income=900000,
+            credit_score=600,
+        )
+
+    def apply_loan(self):
+        return self.client.post(
+            "/api/apply-loan/",
+            {
+                "unique_user_id": str(self.profile.id),
+                "loan_type": "car",
+                "loan_amount": 100000,
+                "interest_rate": 15,
+                "term_period": 12,
+                "disbursement_date": "15-01-2024",
+            },
+            format="json",
+        )
+
+    def get_statement(self, loan_id):
+        return self.client.generic(
+            "GET",
+            "/api/get-statement/",
+            json.dumps({"loan_id": str(loan_id)}),
+            content_type="application/json",
+        )
+
+    # Copies the loan to the replica as it was before any payment: a replica that lags.
+    def replicate(self):
+        for model in (UserProfile, Loan, LoanTransactionDetail, EMISchedule):
+            model.objects.using("replica").bulk_create(model.objects.all())
+
+    def test_cached_statements_are_built_on_the_primary(self):
+        loan_id = self.apply_loan().data["loan_id"]
+        self.replicate()
+        self.assertEqual(self.get_statement(loan_id).data["prev_txn"], [])
+
+        self.client.post(
+            "/api/make-payment/", {"loan_id": loan_id, "amount": "9025.83"}, format="json"
+        )
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            first = self.get_statement(loan_id)
+            second = self.get_statement(loan_id)
+        self.assertEqual(len(replica), 0)
+        self.assertEqual(len(first.data["prev_txn"]), 1)
+        self.assertEqual(second.data, first.data)
+
+    def test_exports_are_read_from_the_replica(self):
+        loan_id = self.apply_loan().data["loan_id"]
+        self.replicate()
+        self.client.post(
+            "/api/make-payment/", {"loan_id": loan_id, "amount": "9025.83"}, format="json"
+        )
+
+        response = self.client.generic(
+            "GET",
+            "/api/get-statement/",
+            json.dumps({"loan_id": str(loan_id), "export": "ndjson"}),
+            content_type="application/json",
+        )
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual({row["type"] for row in rows}, {"installment"})
+
+    def test_loan_and_payment_writes_stay_on_the_primary(self):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            loan_id = self.apply_loan().data["loan_id"]
+            response = self.client.post(
+                "/api/make-payment/", {"loan_id": loan_id, "amount": "9025.83"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(replica), 0)
+
+    def test_a_write_pins_later_reads_to_the_primary(self):
+        token = routers.current_routing.set(routers.RoutingState())
+        self.addCleanup(routers.current_routing.reset, token)
+
+        with routers.replica_reads():
+            self.assertEqual(router.db_for_read(Loan), "replica")
+        self.assertEqual(router.db_for_read(Loan), "default")
+
+        self.profile.save()
+        with routers.replica_reads():
+            self.assertEqual(router.db_for_read(Loan), "default")
+
+    def test_reporting_reads_use_the_replica(self):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            snapshots.average_daily_balances([self.profile.aadhar_id], days=30)
+            archive.transaction_history(self.profile.aadhar_id)
+        self.assertGreater(len(replica), 0)
@@ -1,15 +1,38 @@
 from django.urls import path
 
+from CasiniLoanApp.async_views import (
+    AsyncUserView,
+    AsyncLoanView,
+    AsyncPaymentView,
+    AsyncStatementView,
+)
 from CasiniLoanApp.views import (
     UserViewApi,
     LoanViewApi,
+    BulkLoanViewApi,
     PaymentViewApi,
+    BulkPaymentViewApi,
     StatementViewApi,
+    StatementCacheStatsViewApi,
+    ProfilingViewApi,
 )
 
 urlpatterns = [
     path("register-user/", UserViewApi.as_view(), name="register_user"),
     path("apply-loan/", LoanViewApi.as_view(), name="apply_loan"),
+    path("apply-loans/", BulkLoanViewApi.as_view(), name="apply_loans"),
     path("make-payment/", PaymentViewApi.as_view(), name="make_payment"),
+    path("make-payments/", BulkPaymentViewApi.as_view(), name="make_payments"),
     path("get-statement/", StatementViewApi.as_view(), name="get_statement"),
+    path(
+        "statement-cache-stats/",
+        StatementCacheStatsViewApi.as_view(),
+        name="statement_cache_stats",
+    ),
+    path("profiles/", ProfilingViewApi.as_view(), name="profiles"),
+    # Async variants of the four core endpoints, for serving under ASGI
+    path("async/register-user/", AsyncUserView.as_view(), name="async_register_user"),
+    path("async/apply-loan/", AsyncLoanView.as_view(), name="async_apply_loan"),
+    path("async/make-payment/", AsyncPaymentView.as_view(), name="async_make_payment"),
+    path("async/get-statement/", AsyncStatementView.as_view(), name="async_get_statement"),
 ]
@@ -1,17 +1,39 @@
+import csv
+import itertools
+import json
 import math
+import uuid
 from decimal import Decimal
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-from django.core.exceptions import ObjectDoesNotExist
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework import status
-from .serializers import UserSerializer, LoanSerializer, LoanDetailSerializer
-from .models import UserProfile, Loan, TransactionStore, LoanTransactionDetail
+from rest_framework import exceptions, status
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .serializers import (
+    UserSerializer,
+    ApplyLoanSerializer,
+    LoanDetailSerializer,
+    PaymentAmountSerializer,
+)
+from .models import (
+    UserProfile,
+    Loan,
+    EMISchedule,
+    EMITransaction,
+    EMITransactionArchive,
+    IdempotencyKey,
+    LoanTransactionDetail,
+)
+from . import amortisation, metrics, pagination, profiling, routers, schedule, statement_cache
+from .parsers import JSONParser
 from json import JSONDecodeError
-from django.http import JsonResponse
-from rest_framework.parsers import JSONParser
-from rest_framework.permissions import IsAuthenticated
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.authentication import TokenAuthentication
 
 # (POST) User Registration View Api
@@ -70,9 +92,11 @@ class LoanViewApi(APIView):
     def post(self, request):
         try:
             data = JSONParser().parse(request)
-            serializer = LoanSerializer(data=data)
+            serializer = ApplyLoanSerializer(data=data)
             if serializer.is_valid(raise_exception=True):
-                response = self.process_loan_application(data)
+                response = self.process_loan_application(serializer.validated_data)
+                if isinstance(response, tuple):
+                    return Response(response[0], status=response[1])
                 return Response(response, status=status.HTTP_200_OK)
             else:
                 error_message = serializer.errors
@@ -104,7 +128,9 @@ class LoanViewApi(APIView):
                 emi_details = self.calculate_emi(
                     user, principal_amount, interest_rate, loan_term, disbursal_date
                 )
-                loan = self.create_loan(user, loan_type, emi_details)
+                if isinstance(emi_details, tuple):
+                    return emi_details
+                loan, _ = self.create_loan(user, data, emi_details)
                 response = {
                     "loan_id": loan.id,
                     "due_dates": emi_details["due_dates"],
@@ -124,198 +150,478 @@ class LoanViewApi(APIView):
             return None, None
 
     def check_user_eligibility(self, user):
-        if user.credit_score < 450 or user.credit_score is None:
+        if user.credit_score is None or user.credit_score < 450:
             return False
         elif user.annual_income < 150000:
             return False
         return True
 
+    @profiling.section("calculate_emi")
     def calculate_emi(self, user, principal_amount, interest_rate, loan_term, disbursal_date):
-        rate = (interest_rate / 12) / 100
-        emi_amount = (principal_amount * rate * math.pow((1 + rate), loan_term)) / (
-            math.pow((1 + rate), loan_term) - 1
+        schedules = amortisation.build_schedules(
+            [principal_amount],
+            [interest_rate],
+            [loan_term],
+            [amortisation.first_due_date(disbursal_date)],
         )
-        monthly_emi = round(emi_amount, 2)
-        total_recoverable_amount = monthly_emi * loan_term
+        monthly_emi = schedules.monthly_emi(0)
 
-        if monthly_emi > (Decimal(0.6) * user.annual_income):
+        if monthly_emi > (Decimal("0.6") * user.annual_income):
             return {"error": "EMI amount exceeds 60% of annual income"}, status.HTTP_400_BAD_REQUEST
 
-        emi_details = self.generate_emi_schedule(
-            loan_term, disbursal_date, monthly_emi, total_recoverable_amount
-        )
-
-        return emi_details
-
-    def generate_emi_schedule(self, loan_term, disbursal_date, monthly_emi, total_recoverable_amount):
-        emi_start_date = disbursal_date + relativedelta(day=1, months=1)
+        return self.generate_emi_schedule(schedules)
 
-        emi_amount_list = [monthly_emi] * (loan_term - 1)
-        emi_due_date_list = [
-            emi_start_date + relativedelta(day=1, months=i)
-            for i in range(loan_term - 1)
-        ]
+    @profiling.section("generate_emi_schedule")
+    def generate_emi_schedule(self, schedules, index=0):
+        installments = schedules.installments(index)
         due_dates = [
-            {
-                "date": emi_start_date + relativedelta(day=1, months=i),
-                "amount_due": monthly_emi,
-            }
-            for i in range(loan_term - 1)
+            {"date": row["due_date"], "amount_due": row["amount_due"]}
+            for row in installments
         ]
 
-        remaining_amount = total_recoverable_amount - sum(emi_amount_list)
+        return {
+            "monthly_emi": schedules.monthly_emi(index),
+            "total_recoverable_amount": sum(row["amount_due"] for row in due_dates),
+            "due_dates": due_dates,
+        }
+
+    @profiling.section("create_loan")
+    def create_loan(self, user, data, emi_details):
+        loan, loan_detail = self.build_loan(user, data, emi_details)
+        # A failed schedule insert must not leave a loan the user cannot reapply past.
+        with transaction.atomic():
+            loan.save(force_insert=True)
+            loan_detail.save(force_insert=True)
+            schedule.create_schedule(loan, emi_details["due_dates"])
+            statement_cache.invalidate(loan.id)
+
+        return loan, loan_detail
+
+    def build_loan(self, user, data, emi_details):
+        due_dates = emi_details["due_dates"]
+        loan = Loan(
+            loan_type=data["loan_type"],
+            loan_term=data["term_period"],
+            principal_amount=data["loan_amount"],
+            interest_rate=data["interest_rate"],
+            user_id=user.id,
+            rem_amount=int(emi_details["total_recoverable_amount"]),
+        )
+        loan_detail = LoanTransactionDetail(
+            loan=loan,
+            init_emi_amounts=str(emi_details["monthly_emi"]),
+            new_emi_date=due_dates[0]["date"],
+            new_emi_amt=due_dates[0]["amount_due"],
+            emi_rem=len(due_dates),
+            is_active=True,
+        )
+        return loan, loan_detail
+
+# (POST) Bulk Loan Apply View Api
+class BulkLoanViewApi(LoanViewApi):
+    MAX_APPLICATIONS = 5000
 
-        if remaining_amount > 0:
-            emi_amount_list.append(remaining_amount)
-            emi_due_date_list.append(
-                emi_start_date + relativedelta(day=1, months=loan_term - 1)
+    def post(self, request):
+        try:
+            data = JSONParser().parse(request)
+        except JSONDecodeError:
+            return Response(
+                {"result": "error", "message": "Json decoding error!"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            due_dates.append(
-                {
-                    "date": emi_start_date + relativedelta(day=1, months=loan_term - 1),
-                    "amount_due": remaining_amount,
-                }
+
+        applications = data.get("applications") if isinstance(data, dict) else None
+        if not isinstance(applications, list) or not applications:
+            return Response(
+                {"error": "applications must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(applications) > self.MAX_APPLICATIONS:
+            return Response(
+                {"error": f"At most {self.MAX_APPLICATIONS} applications per request"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        return {"due_dates": due_dates}
-
-    def create_loan(self, user, loan_type, emi_details):
-        disbursal_date_dtf = datetime.strptime(emi_details["disbursement_date"], "%d-%m-%Y")
-        loan = Loan.objects.create(
-            loan_type=loan_type,
-            loan_term=emi_details["loan_term"],
-            principal_amount=emi_details["principal_amount"],
-            interest_rate=emi_details["interest_rate"],
-            disbursal_date=disbursal_date_dtf,
-            start_date=datetime.now(),
-            user_id=user.id,
-            remaining_amount=emi_details["total_recoverable_amount"],
+        return Response(
+            {"results": self.process_loan_applications(applications)},
+            status=status.HTTP_200_OK,
         )
 
-        loan_detail = LoanTransactionDetail.objects.create(
-            loan_id_id=loan.id,
-            next_emi_date=emi_details["due_dates"][0]["date"],
-            next_emi_amount=emi_details["due_dates"][0]["amount_due"],
-            total_emis_left=len(emi_details["due_dates"]),
-            is_active=True,
+    # Same rules and messages as process_loan_application, but users and existing loans
+    # come from two IN queries and all accepted loans are written in one transaction.
+    def process_loan_applications(self, applications):
+        results = [None] * len(applications)
+        valid = []
+        # One serializer validates every item, as ListSerializer does, so its fields are built once.
+        serializer = ApplyLoanSerializer()
+        for index, application in enumerate(applications):
+            try:
+                valid.append((index, serializer.run_validation(application)))
+            except exceptions.ValidationError as e:
+                results[index] = {"index": index, "error": e.detail}
+
+        user_ids = {data["unique_user_id"] for _, data in valid}
+        users = UserProfile.objects.in_bulk(user_ids)
+        borrowers = set(
+            Loan.objects.filter(user_id__in=user_ids).values_list("user_id", flat=True)
         )
 
-        return loan, loan_detail
+        candidates = [
+            (index, data)
+            for index, data in valid
+            if data["interest_rate"] >= 14 and data["unique_user_id"] in users
+        ]
+        schedules = self.build_batch_schedules([data for _, data in candidates])
+        positions = {index: position for position, (index, _) in enumerate(candidates)}
+
+        loans, details, schedules_to_insert = [], [], []
+        for index, data in valid:
+            user = users.get(data["unique_user_id"])
+            if data["interest_rate"] < 14:
+                error = "Interest rate should be greater than 14%!"
+            elif not user:
+                error = "User does not exist!"
+            elif user.id in borrowers:
+                error = "User previous loan already exists!"
+            elif not self.check_user_eligibility(user):
+                error = "User is not eligible for the loan!"
+            elif schedules.monthly_emi(positions[index]) > Decimal("0.6") * user.annual_income:
+                error = "EMI amount exceeds 60% of annual income"
+            else:
+                error = None
+
+            if error:
+                results[index] = {"index": index, "error": error}
+                continue
+
+            emi_details = self.generate_emi_schedule(schedules, positions[index])
+            loan, detail = self.build_loan(user, data, emi_details)
+            loans.append(loan)
+            details.append(detail)
+            schedules_to_insert.append((loan, emi_details["due_dates"]))
+            borrowers.add(user.id)
+            results[index] = {
+                "index": index,
+                "loan_id": loan.id,
+                "monthly_emi": emi_details["monthly_emi"],
+                "total_recoverable_amount": emi_details["total_recoverable_amount"],
+            }
+
+        # New loan ids cannot have cached statements, so no version bump is needed.
+        with transaction.atomic():
+            Loan.objects.bulk_create(loans, batch_size=schedule.SCHEDULE_BATCH_SIZE)
+            LoanTransactionDetail.objects.bulk_create(
+                details, batch_size=schedule.SCHEDULE_BATCH_SIZE
+            )
+            schedule.insert_schedules(schedules_to_insert)
+        return results
+
+    def build_batch_schedules(self, applications):
+        return amortisation.build_schedules(
+            [data["loan_amount"] for data in applications],
+            [data["interest_rate"] for data in applications],
+            [data["term_period"] for data in applications],
+            [amortisation.first_due_date(data["disbursement_date"]) for data in applications],
+        )
 
 # (POST) Loan Payment View Api
 class PaymentViewApi(APIView):
     get_auth = (TokenAuthentication,)
     get_permission = (IsAuthenticated,)
 
+    DETAIL_FIELDS = ["last_txn_date", "new_emi_date", "new_emi_amt", "emi_rem", "is_active"]
+    LOAN_CLOSED = "Loan is closed"
+
     def post(self, request):
         try:
             data = JSONParser().parse(request)
-            return self.make_loan_payment(data)
+            return self.make_loan_payment(data, request.headers.get("Idempotency-Key"))
         except JSONDecodeError:
             return Response(
                 {"result": "error", "message": "Json decoding error"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-    def make_loan_payment(self, data):
+    # The whole payment runs under the loan's row lock, so concurrent payments on one
+    # loan are applied one after the other. A retried request carrying the same
+    # Idempotency-Key gets the stored response instead of posting again.
+    def make_loan_payment(self, data, idempotency_key=None):
         try:
             serializer = LoanDetailSerializer(data=data)
             serializer.is_valid(raise_exception=True)
-            
-            loan, loan_details = self.get_loan_and_details(data["loan_id"])
-
-            if not loan or not loan_details:
+            amount = PaymentAmountSerializer(data=data)
+            amount.is_valid(raise_exception=True)
+            if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
                 return Response(
-                    {"error": "Invalid Loan Id"},
+                    {"error": "Idempotency-Key must be 1-255 characters"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            if self.is_payment_already_made(loan_details):
-                return Response(
-                    {"error": "Payment already made"},
-                    status=status.HTTP_400_BAD_REQUEST,
+            with transaction.atomic():
+                loan, loan_details = self.get_loan_and_details(data["loan_id"])
+
+                if not loan or not loan_details:
+                    return Response(
+                        {"error": "Invalid Loan Id"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+                if idempotency_key is not None:
+                    record, created = IdempotencyKey.objects.get_or_create(
+                        key=idempotency_key,
+                        defaults={"request_hash": IdempotencyKey.fingerprint(data)},
+                    )
+                    if not created:
+                        return self.replay(record, data)
+
+                response_data, status_code = self.post_payment(
+                    loan, loan_details, amount.validated_data["amount"]
                 )
 
-            payment_amount = data["amount"]
-            user = loan.user
+                if idempotency_key is not None:
+                    record.response_body = response_data
+                    record.response_status = status_code
+                    record.save(update_fields=["response_body", "response_status"])
+            return Response(response_data, status=status_code)
+        except (ObjectDoesNotExist, ValidationError):
+            return Response(
+                {"error": "Invalid Loan Id"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-            self.create_transaction(payment_amount, user, loan)
+    @profiling.section("post_payment")
+    def post_payment(self, loan, loan_details, payment_amount):
+        if not loan_details.is_active:
+            return {"error": self.LOAN_CLOSED}, status.HTTP_400_BAD_REQUEST
+        if self.is_payment_already_made(loan_details):
+            return {"error": "Payment already made"}, status.HTTP_400_BAD_REQUEST
 
-            if payment_amount != loan_details.next_emi_amount:
-                self.update_next_emi_amount(loan, loan_details, payment_amount)
+        self.create_transaction(payment_amount, loan)
+        next_installment, emis_left = schedule.apply_payment(loan.id, payment_amount)
 
-            self.update_loan_details(loan_details)
+        self.update_next_emi_amount(loan_details, next_installment)
+        self.update_loan_details(loan_details, emis_left)
 
-            response_data = {
-                "loan_id": loan.id,
-                "message": "Payment successfully received",
-            }
-            return Response(response_data, status=status.HTTP_200_OK)
-        except ObjectDoesNotExist:
+        response_data = {
+            "loan_id": loan.id,
+            "message": "Payment successfully received",
+        }
+        return response_data, status.HTTP_200_OK
+
+    def replay(self, record, data):
+        if record.request_hash != IdempotencyKey.fingerprint(data):
             return Response(
-                {"error": "Invalid Loan Id"},
-                status=status.HTTP_400_BAD_REQUEST,
+                {"error": "Idempotency-Key was already used for a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
             )
+        return Response(record.response_body, status=record.response_status)
 
     def get_loan_and_details(self, loan_id):
         try:
-            loan = Loan.objects.get(id=loan_id)
-            loan_details = LoanTransactionDetail.objects.get(loan_id=loan.id)
-            return loan, loan_details
-        except ObjectDoesNotExist:
+            loan_details = self.lock_loan_details([loan_id]).get()
+            return loan_details.loan, loan_details
+        except (ObjectDoesNotExist, ValidationError):
             return None, None
 
+    # Must run inside transaction.atomic. SQLite has no row locks, so a no-op UPDATE
+    # takes its write lock up front; reading first and writing later would fail with
+    # "database is locked" instead of waiting when two payments overlap.
+    def lock_loan_details(self, loan_ids):
+        details = LoanTransactionDetail.objects.filter(loan_id__in=loan_ids)
+        if not connection.features.has_select_for_update:
+            details.update(emi_rem=F("emi_rem"))
+        return details.select_for_update().select_related("loan")
+
     def is_payment_already_made(self, loan_details):
-        today = datetime.now()
-        last_txn = loan_details.last_transaction_date
+        today = timezone.now()
+        last_txn = loan_details.last_txn_date
 
-        if last_txn is not None:
-            if (
-                last_txn.strftime("%m") == today.month
-                and last_txn.strftime("%Y") == today.year
-            ):
-                return True
-            elif (today - last_txn).month > 1:
-                return True
-        return False
-
-    def create_transaction(self, payment_amount, user, loan):
-        today = datetime.now()
-        TransactionStore.objects.create(
+        return last_txn is not None and (last_txn.year, last_txn.month) == (today.year, today.month)
+
+    def create_transaction(self, payment_amount, loan):
+        EMITransaction.objects.create(
             payment=payment_amount,
-            user=user,
+            user_id=loan.user_id,
             loan=loan,
-            payment_date=today,
         )
-        loan.remaining_amount -= payment_amount
-        loan.save()
-
-    def update_next_emi_amount(self, loan, loan_details, payment_amount):
-        rate = Decimal((loan.interest_rate / 12) / 100)
-        emi_amount = (
-            (loan.remaining_amount - payment_amount)
-            * rate
-            * Decimal(math.pow((1 + rate), loan.loan_term))
-            / Decimal(math.pow((1 + rate), loan.loan_term) - 1)
+        # Decremented in SQL, never read-modify-written; truncates like int(rem_amount - payment).
+        Loan.objects.filter(pk=loan.pk).update(
+            rem_amount=Greatest(F("rem_amount") - math.ceil(payment_amount), 0)
         )
-        loan_details.next_emi_amount = emi_amount
 
-    def update_loan_details(self, loan_details):
-        today = datetime.now()
-        loan_details.last_transaction_date = today
-        loan_details.next_emi_date = today + relativedelta(day=1, months=1)
-        loan_details.total_emis_left -= 1
+    # Next EMI is whatever is still owed on the oldest open installment.
+    def update_next_emi_amount(self, loan_details, next_installment):
+        if next_installment is None:
+            loan_details.new_emi_date = None
+            loan_details.new_emi_amt = Decimal("0")
+        else:
+            loan_details.new_emi_date = next_installment.due_date
+            loan_details.new_emi_amt = next_installment.amount_due - next_installment.amount_paid
+
+    def update_loan_details(self, loan_details, emis_left):
+        self.record_payment(loan_details, emis_left)
+        loan_details.save(update_fields=self.DETAIL_FIELDS)
+        statement_cache.invalidate(loan_details.loan_id)
+
+    def record_payment(self, loan_details, emis_left):
+        loan_details.last_txn_date = timezone.now()
+        loan_details.emi_rem = emis_left
 
-        if loan_details.total_emis_left == 0:
+        if loan_details.emi_rem == 0:
             loan_details.is_active = False
 
-        loan_details.save()
+# (POST) Bulk Payment View Api, for settlement files
+class BulkPaymentViewApi(PaymentViewApi):
+    MAX_PAYMENTS = 5000
+    MAX_REF_LENGTH = EMITransaction._meta.get_field("external_ref").max_length
+    INVALID_ROW = (
+        f"loan_id, a positive amount in cents and an external_ref of at most "
+        f"{MAX_REF_LENGTH} characters are required"
+    )
+
+    def post(self, request):
+        try:
+            data = JSONParser().parse(request)
+        except JSONDecodeError:
+            return Response(
+                {"result": "error", "message": "Json decoding error"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        payments = data.get("payments") if isinstance(data, dict) else None
+        if not isinstance(payments, list) or not payments:
+            return Response(
+                {"error": "payments must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(payments) > self.MAX_PAYMENTS:
+            return Response(
+                {"error": f"At most {self.MAX_PAYMENTS} payments per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({"results": self.post_payments(payments)}, status=status.HTTP_200_OK)
+
+    # Posts a batch in one transaction: affected details are locked with a single
+    # select_for_update, payments are applied in memory in file order, and everything
+    # is written back with bulk_create/bulk_update. Rows whose external_ref is already
+    # in the ledger are reported as duplicates, so replaying a file is a no-op.
+    def post_payments(self, payments):
+        results = [None] * len(payments)
+        valid = []
+        for index, payment in enumerate(payments):
+            try:
+                valid.append((index, self.parse_payment(payment)))
+            except (KeyError, TypeError, ValueError, ArithmeticError):
+                results[index] = {
+                    "index": index,
+                    "status": "rejected",
+                    "error": self.INVALID_ROW,
+                }
+
+        loan_ids = {payment["loan_id"] for _, payment in valid}
+        with transaction.atomic():
+            details = {detail.loan_id: detail for detail in self.lock_loan_details(loan_ids)}
+            # Read after taking the locks, so a concurrent run of the same file is seen.
+            # Archived payments of closed loans keep their references, so a replayed
+            # old file is still recognised.
+            refs = [payment["external_ref"] for _, payment in valid]
+            posted = set(
+                EMITransaction.objects.filter(external_ref__in=refs)
+                .values_list("external_ref", flat=True)
+                .union(
+                    EMITransactionArchive.objects.filter(external_ref__in=refs).values_list(
+                        "external_ref", flat=True
+                    ),
+                    all=True,
+                )
+            )
+            installments = {}
+            for installment in schedule.open_installments_for(list(details)):
+                installments.setdefault(installment.loan_id, []).append(installment)
+
+            ledger, paid, touched = [], {}, {}
+            for index, payment in valid:
+                result = {"index": index, "external_ref": payment["external_ref"]}
+                results[index] = result
+                loan_details = details.get(payment["loan_id"])
+                if payment["external_ref"] in posted:
+                    result["status"] = "duplicate"
+                    continue
+                if loan_details is None:
+                    result.update(status="rejected", error="Invalid Loan Id")
+                    continue
+                if not loan_details.is_active:
+                    result.update(status="rejected", error=self.LOAN_CLOSED)
+                    continue
+                if self.is_payment_already_made(loan_details):
+                    result.update(status="rejected", error="Payment already made")
+                    continue
+
+                loan = loan_details.loan
+                ledger.append(
+                    EMITransaction(
+                        payment=payment["amount"],
+                        user_id=loan.user_id,
+                        loan=loan,
+                        external_ref=payment["external_ref"],
+                    )
+                )
+                loan.rem_amount = max(int(loan.rem_amount - payment["amount"]), 0)
+
+                changed, next_installment, emis_left = schedule.allocate_payment(
+                    installments.get(loan.id, []), payment["amount"]
+                )
+                touched.update((installment.id, installment) for installment in changed)
+                self.update_next_emi_amount(loan_details, next_installment)
+                self.record_payment(loan_details, emis_left)
+                paid[loan.id] = loan_details
+                posted.add(payment["external_ref"])
+                result["status"] = "posted"
+
+            EMITransaction.objects.bulk_create(ledger, batch_size=schedule.SCHEDULE_BATCH_SIZE)
+            Loan.objects.bulk_update(
+                [detail.loan for detail in paid.values()],
+                ["rem_amount"],
+                batch_size=schedule.SCHEDULE_BATCH_SIZE,
+            )
+            LoanTransactionDetail.objects.bulk_update(
+                paid.values(), self.DETAIL_FIELDS, batch_size=schedule.SCHEDULE_BATCH_SIZE
+            )
+            EMISchedule.objects.bulk_update(
+                touched.values(), ["amount_paid", "status"], batch_size=schedule.SCHEDULE_BATCH_SIZE
+            )
+            for loan_id in paid:
+                statement_cache.invalidate(loan_id)
+        return results
+
+    def parse_payment(self, payment):
+        amount = Decimal(str(payment["amount"]))
+        external_ref = str(payment["external_ref"]).strip()
+        # Whole cents only, like PaymentAmountSerializer, so the ledger and the
+        # installment allocation agree on the amount paid.
+        if not amount > 0 or amount.as_tuple().exponent < -2:
+            raise ValueError(payment)
+        if not 0 < len(external_ref) <= self.MAX_REF_LENGTH:
+            raise ValueError(payment)
+        return {
+            "loan_id": uuid.UUID(str(payment["loan_id"])),
+            "amount": amount,
+            "external_ref": external_ref,
+        }
 
 # (GET) Loan Statement View Api
 class StatementViewApi(APIView):
     authentication = (TokenAuthentication,)
     permission = (IsAuthenticated,)
 
+    PREV_TXN_ORDER = ("payment_date", "id")
+    UPCOMING_ORDER = ("installment_no",)
+    EXPORT_COLUMNS = ("type", "date", "amount", "interest", "principal")
+    EXPORT_CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+    EXPORT_CHUNK_SIZE = 500
+    INACTIVE_ERROR = {"error": "Loan is not in Active State"}
+
     def get(self, request):
         try:
             data = JSONParser().parse(request)
@@ -326,72 +632,192 @@ class StatementViewApi(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+    # Cached statements are built on the primary: an entry built from a lagging replica
+    # would be stored under the version bumped by the latest payment and outlive the lag.
     def get_loan_statement(self, data):
         try:
             serializer = LoanDetailSerializer(data=data)
             serializer.is_valid(raise_exception=True)
-            loan = self.get_loan(data["loan_id"])
-            loan_details = LoanTransactionDetail.objects.get(loan_id=loan.id)
-            
-            if not loan_details.is_active:
-                return Response(
-                    {"error": "Loan is not in Active State"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+            loan_id = uuid.UUID(str(data["loan_id"]))
 
-            user_txn = self.get_user_txn(loan)
-            
-            if not user_txn:
-                upcoming_transactions = self.calculate_upcoming_transactions(loan, loan_details)
-                return Response(
-                    {"prev_txn": [], "upcoming_transactions": upcoming_transactions},
-                    status=status.HTTP_200_OK,
-                )
-
-            prev_txn = self.get_prev_txn(user_txn, loan)
-            
-            response = {
-                "prev_txn": prev_txn,
-                "upcoming_transactions": self.calculate_upcoming_transactions(loan, loan_details),
-            }
+            if data.get("export"):
+                loan_details = self.get_loan_details(loan_id)
+                if not loan_details.is_active:
+                    return Response(self.INACTIVE_ERROR, status=status.HTTP_400_BAD_REQUEST)
+                return self.export_statement(loan_details.loan, data["export"])
 
-            return Response(response, status=status.HTTP_200_OK)
-        except ObjectDoesNotExist:
+            body, status_code = statement_cache.get_or_build(
+                loan_id, self.statement_variant(data), lambda: self.build_statement(loan_id, data)
+            )
+            return Response(body, status=status_code)
+        except (ObjectDoesNotExist, ValidationError, ValueError):
             return Response(
                 {"error": "Loan doesn't exist. Passed Loan id is incorrect"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        except pagination.InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Everything a statement depends on besides the loan itself; part of the cache key.
+    def statement_variant(self, data):
+        if any(data.get(key) for key in ("page_size", "prev_cursor", "upcoming_cursor")):
+            return "page:{}:{}:{}".format(
+                pagination.page_size_from(data.get("page_size")),
+                data.get("prev_cursor") or "",
+                data.get("upcoming_cursor") or "",
+            )
+        return "full"
+
+    # Returns (body, status) so the inactive-loan answer is cached alongside statements.
+    @profiling.section("build_statement")
+    def build_statement(self, loan_id, data):
+        loan_details = self.get_loan_details(loan_id)
+        loan = loan_details.loan
+
+        if not loan_details.is_active:
+            return self.INACTIVE_ERROR, status.HTTP_400_BAD_REQUEST
 
-    def get_loan(self, loan_id):
-        return Loan.objects.get(id=loan_id)
+        if any(data.get(key) for key in ("page_size", "prev_cursor", "upcoming_cursor")):
+            return self.get_statement_page(loan, data), status.HTTP_200_OK
+
+        response = {
+            "prev_txn": self.get_prev_txn(self.get_user_txn(loan), loan),
+            "upcoming_transactions": self.calculate_upcoming_transactions(loan, loan_details),
+        }
+        return response, status.HTTP_200_OK
+
+    def get_loan_details(self, loan_id):
+        return LoanTransactionDetail.objects.select_related("loan").get(loan_id=loan_id)
 
     def get_user_txn(self, loan):
-        return TransactionStore.objects.filter(
-            user_id=loan.user.id,
-            loan_id=loan.id,
+        return (
+            EMITransaction.objects.filter(user_id=loan.user_id, loan_id=loan.id)
+            .order_by(*self.PREV_TXN_ORDER)
+            .values("id", "payment_date", "payment")
         )
 
-    def calculate_upcoming_transactions(self, loan, loan_details):
-        monthly_emi = loan.remaining_amount / loan_details.total_emis_left
-        disbursal_date_dtf = datetime.strptime(loan.disbursal_date, "%d-%m-%Y")
-        emi_start_date = disbursal_date_dtf + relativedelta(day=1, months=1)
-        upcoming = []
+    def get_upcoming_installments(self, loan):
+        return schedule.open_installments(loan.id).values(
+            "installment_no", "due_date", "amount_due", "amount_paid"
+        )
 
-        for i in range(loan_details.total_emis_left):
-            data = {}
-            data["amount_due"] = monthly_emi
-            data["emi_date"] = emi_start_date + relativedelta(day=1, months=i)
-            upcoming.append(data)
+    @profiling.section("calculate_upcoming_transactions")
+    def calculate_upcoming_transactions(self, loan, loan_details):
+        return self.format_upcoming(self.get_upcoming_installments(loan))
 
-        return upcoming
+    def format_upcoming(self, installments):
+        return [
+            {"amount_due": row["amount_due"] - row["amount_paid"], "emi_date": row["due_date"]}
+            for row in installments
+        ]
 
     def get_prev_txn(self, user_txn, loan):
-        prev_txn = []
-        for txn in user_txn:
-            past_txn = {}
-            past_txn["date"] = txn.payment_date
-            past_txn["amount_paid"] = txn.payment
-            past_txn["interest"] = loan.interest_rate
-            past_txn["principal"] = loan.remaining_amount
-            prev_txn.append(past_txn)
-        return prev_txn
\ No newline at end of file
+        return [
+            {
+                "date": txn["payment_date"],
+                "amount_paid": txn["payment"],
+                "interest": loan.interest_rate,
+                "principal": loan.rem_amount,
+            }
+            for txn in user_txn
+        ]
+
+    def get_statement_page(self, loan, data):
+        page_size = pagination.page_size_from(data.get("page_size"))
+        prev_rows, prev_cursor = pagination.keyset_page(
+            self.get_user_txn(loan), self.PREV_TXN_ORDER, data.get("prev_cursor"), page_size
+        )
+        upcoming_rows, upcoming_cursor = pagination.keyset_page(
+            self.get_upcoming_installments(loan),
+            self.UPCOMING_ORDER,
+            data.get("upcoming_cursor"),
+            page_size,
+        )
+        return {
+            "prev_txn": self.get_prev_txn(prev_rows, loan),
+            "prev_txn_next_cursor": prev_cursor,
+            "upcoming_transactions": self.format_upcoming(upcoming_rows),
+            "upcoming_next_cursor": upcoming_cursor,
+        }
+
+    # Full statement as NDJSON/CSV, read with server-side iterators so memory stays flat.
+    def export_statement(self, loan, export_format):
+        if export_format not in self.EXPORT_CONTENT_TYPES:
+            return Response(
+                {"error": f"Unsupported export format, use one of {sorted(self.EXPORT_CONTENT_TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rows = self.iter_statement_rows(loan)
+        if export_format == "csv":
+            writer = csv.writer(Echo())
+            content = itertools.chain(
+                [writer.writerow(self.EXPORT_COLUMNS)],
+                (writer.writerow([row[column] for column in self.EXPORT_COLUMNS]) for row in rows),
+            )
+        else:
+            content = (json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows)
+
+        response = StreamingHttpResponse(content, content_type=self.EXPORT_CONTENT_TYPES[export_format])
+        response["Content-Disposition"] = f'attachment; filename="statement-{loan.id}.{export_format}"'
+        return response
+
+    # Exports are not cached, so they can read from the replica (see routers.py). Runs
+    # while the response streams, after the request's routing scope has closed.
+    def iter_statement_rows(self, loan):
+        with routers.replica_reads():
+            for txn in self.get_user_txn(loan).iterator(chunk_size=self.EXPORT_CHUNK_SIZE):
+                yield {
+                    "type": "payment",
+                    "date": txn["payment_date"],
+                    "amount": txn["payment"],
+                    "interest": loan.interest_rate,
+                    "principal": loan.rem_amount,
+                }
+            for row in self.get_upcoming_installments(loan).iterator(
+                chunk_size=self.EXPORT_CHUNK_SIZE
+            ):
+                yield {
+                    "type": "installment",
+                    "date": row["due_date"],
+                    "amount": row["amount_due"] - row["amount_paid"],
+                    "interest": None,
+                    "principal": None,
+                }
+
+
+# (GET) Recent request profiles (see profiling.ProfilingMiddleware), for staff
+class ProfilingViewApi(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        entries = list(profiling.recent_profiles())
+        path = request.query_params.get("path")
+        if path:
+            entries = [entry for entry in entries if entry["path"] == path]
+        return Response(
+            {"summary": profiling.summarise(entries), "entries": entries},
+            status=status.HTTP_200_OK,
+        )
+
+
+# (GET) Prometheus text exposition of request, query and Celery task metrics
+def metrics_view(request):
+    expected = settings.METRICS_TOKEN
+    if expected and request.META.get("HTTP_AUTHORIZATION") != f"Bearer {expected}":
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(metrics.scrape(), content_type=metrics.CONTENT_TYPE_LATEST)
+
+
+# (GET) Statement cache counters, for monitoring
+class StatementCacheStatsViewApi(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(statement_cache.stats(), status=status.HTTP_200_OK)
+
+
+# Pseudo-buffer for csv.writer so each row can be streamed as soon as it is formatted.
+class Echo:
+    def write(self, value):
+        return value
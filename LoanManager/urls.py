@@ -2,8 +2,11 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
 
+from CasiniLoanApp.views import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("CasiniLoanApp.urls")),
     path("api-token-auth/", obtain_auth_token, name="api-token-auth"),
+    path("metrics", metrics_view, name="metrics"),
 ]
@@ -0,0 +1,53 @@
+"""
+Times full EMI schedule generation for a synthetic portfolio with the
+vectorised engine in CasiniLoanApp.amortisation against its per-loan
+Decimal reference, amortisation.scalar_installments.
+
+    python -m benchmarks.amortisation --loans 100000
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+
+from CasiniLoanApp import amortisation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--loans", type=int, default=100000)
+    parser.add_argument("--loop-sample", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    principals = rng.integers(50000, 5000000, args.loans)
+    rates = rng.choice([14.5, 15.0, 18.0, 21.0], args.loans)
+    terms = rng.choice([12, 24, 60, 120, 360], args.loans)
+    first_due = [date(2024, 1, 1)] * args.loans
+
+    started = time.perf_counter()
+    amortisation.build_schedules(principals, rates, terms, first_due)
+    vectorised = time.perf_counter() - started
+    installments = int(terms.sum())
+    print(
+        f"vectorised: {args.loans} loans / {installments} installments "
+        f"in {vectorised:.2f}s ({installments / vectorised:,.0f} installments/s)"
+    )
+
+    sample = min(args.loop_sample, args.loans)
+    started = time.perf_counter()
+    for i in range(sample):
+        amortisation.scalar_installments(
+            int(principals[i]), str(rates[i]), int(terms[i]), first_due[i]
+        )
+    scalar = time.perf_counter() - started
+    looped_installments = int(terms[:sample].sum())
+    print(
+        f"scalar: {sample} loans / {looped_installments} installments "
+        f"in {scalar:.2f}s ({looped_installments / scalar:,.0f} installments/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
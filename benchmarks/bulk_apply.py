@@ -0,0 +1,102 @@
+"""
+Posts the same number of loan applications one request at a time to
+/api/apply-loan/ and in batches to /api/apply-loans/, and prints the
+throughput of each.
+
+    python -m benchmarks.bulk_apply --applications 5000 --batch-size 1000
+"""
+import argparse
+import random
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+from benchmarks.common import migrate, setup_django
+
+
+def make_applications(count, rng):
+    from CasiniLoanApp.models import UserProfile
+
+    profiles = [
+        UserProfile(
+            name=f"applicant-{i}",
+            email_id=f"applicant{i}@example.com",
+            aadhar_id=uuid.UUID(int=rng.getrandbits(128), version=4),
+            annual_income=Decimal(rng.randint(150000, 5000000)),
+            credit_score=rng.choice([300, 450, 600, 900]),
+        )
+        for i in range(count)
+    ]
+    UserProfile.objects.bulk_create(profiles, batch_size=5000)
+    return [
+        {
+            "unique_user_id": str(profile.id),
+            "loan_type": rng.choice(["car", "home", "personal"]),
+            "loan_amount": rng.randint(50000, 5000000),
+            "interest_rate": rng.choice([14.5, 15, 18, 21]),
+            "term_period": rng.choice([12, 24, 60, 120]),
+            "disbursement_date": "15-01-2024",
+        }
+        for profile in profiles
+    ]
+
+
+def api_client():
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+
+    client = APIClient(HTTP_HOST="127.0.0.1")
+    client.force_authenticate(User.objects.get_or_create(username="bench")[0])
+    return client
+
+
+def apply_one_by_one(client, applications):
+    for application in applications:
+        client.post("/api/apply-loan/", application, format="json")
+
+
+def apply_in_batches(client, applications, batch_size):
+    for offset in range(0, len(applications), batch_size):
+        batch = applications[offset : offset + batch_size]
+        client.post("/api/apply-loans/", {"applications": batch}, format="json")
+
+
+def timed(label, func, count):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label}: {count} applications in {elapsed:.2f}s ({count / elapsed:,.0f}/s)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--applications", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / "bench.sqlite3")
+        migrate()
+        rng = random.Random(42)
+        client = api_client()
+
+        applications = make_applications(args.applications, rng)
+        single = timed(
+            "one by one",
+            lambda: apply_one_by_one(client, applications),
+            args.applications,
+        )
+        applications = make_applications(args.applications, rng)
+        bulk = timed(
+            f"batches of {args.batch_size}",
+            lambda: apply_in_batches(client, applications, args.batch_size),
+            args.applications,
+        )
+        print(f"speed-up: {single / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+# Points the project at a scratch SQLite file so benchmarks never touch db.sqlite3.
+def setup_django(db_path):
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LoanManager.settings")
+
+    import django
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = str(db_path)
+    django.setup()
+
+
+def migrate(target=None):
+    from django.core.management import call_command
+
+    args = ["CasiniLoanApp", target] if target else []
+    call_command("migrate", *args, verbosity=0)
+
+
+def time_call(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+    }
@@ -0,0 +1,88 @@
+"""
+Load-tests statement reads and payment writes through gunicorn with per-request
+connections and SQLite defaults, with persistent connections, and with persistent
+connections plus the WAL pragmas in SQLITE_PRAGMAS, each on a copy of one seed.
+
+    python -m benchmarks.connections --workers 4 --concurrency 16 --requests 2000
+"""
+import argparse
+import itertools
+import os
+import random
+import shutil
+import tempfile
+from argparse import Namespace
+from pathlib import Path
+
+from benchmarks.common import migrate, setup_django, summarize
+from benchmarks.load_test import ENDPOINTS, payloads, run_load, start_server
+
+# Environment the gunicorn workers are started with for each configuration.
+CONFIGS = {
+    "per-request": {"DB_CONN_MAX_AGE": "0", "SQLITE_TUNING": "0"},
+    "persistent": {"DB_CONN_MAX_AGE": "600", "SQLITE_TUNING": "0"},
+    "persistent+wal": {"DB_CONN_MAX_AGE": "600", "SQLITE_TUNING": "1"},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--endpoints", default="statement,payment")
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--loans", type=int, default=500)
+    args = parser.parse_args()
+
+    # Seed in rollback-journal mode so every configuration starts from the same file.
+    os.environ["SQLITE_TUNING"] = "0"
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_path = Path(tmp) / "seed.sqlite3"
+        setup_django(seed_path)
+        migrate()
+
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from rest_framework.authtoken.models import Token
+
+        token = Token.objects.create(user=User.objects.create(username="pool")).key
+        rng = random.Random(42)
+        total = args.warmup + args.requests
+        bodies = {
+            endpoint: list(
+                itertools.islice(
+                    payloads(endpoint, Namespace(requests=total, loans=args.loans), rng), total
+                )
+            )
+            for endpoint in args.endpoints.split(",")
+        }
+        connection.close()
+
+        for config in args.configs.split(","):
+            os.environ.update(CONFIGS[config])
+            for endpoint, requests in bodies.items():
+                db_path = Path(tmp) / f"{config}-{endpoint}.sqlite3"
+                shutil.copyfile(seed_path, db_path)
+                method, path = ENDPOINTS[endpoint]
+                process, port, prefix = start_server("wsgi", args.workers, db_path)
+                try:
+                    stream, url = iter(requests), prefix + path
+                    run_load(port, method, url, token, stream, args.warmup, args.concurrency)
+                    elapsed, samples, statuses = run_load(
+                        port, method, url, token, stream, args.requests, args.concurrency
+                    )
+                finally:
+                    process.terminate()
+                    process.wait()
+                stats = summarize(samples)
+                print(
+                    f"{config}/{endpoint}: {len(samples) / elapsed:,.0f} req/s, "
+                    f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+                    f"p99 {stats['p99_ms']:.1f} ms, statuses {statuses}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmarks register-user, apply-loan, make-payment and get-statement through
+Django's test client and through a local gunicorn server, and writes throughput,
+latency percentiles and queries per request to a JSON file that can be compared
+with the results of another commit.
+
+    python -m benchmarks.endpoints --users 2000 --output before.json
+    python -m benchmarks.endpoints --users 2000 --output after.json --compare before.json
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from argparse import Namespace
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.common import BASE_DIR, migrate, setup_django, summarize
+from benchmarks.load_test import ENDPOINTS, payloads, run_load, start_server
+
+# Metrics where a larger number is better; everything else is a cost.
+HIGHER_IS_BETTER = {"requests_per_second"}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result(elapsed, samples, statuses, queries=None):
+    stats = summarize(samples)
+    stats["requests_per_second"] = len(samples) / elapsed
+    stats["statuses"] = {str(code): count for code, count in sorted(statuses.items(), key=str)}
+    if queries is not None:
+        stats["queries_per_request"] = sum(queries) / len(queries)
+        stats["max_queries"] = max(queries)
+    return stats
+
+
+# In-process: the full DRF stack minus the network, with the SQL of every request counted.
+def run_client(method, path, token, bodies, total, warmup):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+
+    client = APIClient(HTTP_HOST="127.0.0.1")
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+    for _ in range(warmup):
+        client.generic(method, path, json.dumps(next(bodies)), content_type="application/json")
+
+    samples, queries, statuses = [], [], {}
+    started = time.perf_counter()
+    for _ in range(total):
+        body = json.dumps(next(bodies))
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            response = client.generic(method, path, body, content_type="application/json")
+            samples.append((time.perf_counter() - request_started) * 1000)
+        queries.append(len(captured))
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return result(time.perf_counter() - started, samples, statuses, queries)
+
+
+def run_server(method, path, token, bodies, args, db_path):
+    process, port, prefix = start_server("wsgi", args.workers, db_path)
+    try:
+        # Workers import the project lazily; keep that out of the measured requests.
+        run_load(port, method, prefix + path, token, bodies, args.warmup, args.concurrency)
+        elapsed, samples, statuses = run_load(
+            port, method, prefix + path, token, bodies, args.requests, args.concurrency
+        )
+    finally:
+        process.terminate()
+        process.wait()
+    return result(elapsed, samples, statuses)
+
+
+def compare(current, baseline):
+    print(f"\n=== vs {baseline['meta'].get('commit') or 'baseline'}")
+    for mode, endpoints in current["results"].items():
+        for endpoint, stats in endpoints.items():
+            before = baseline["results"].get(mode, {}).get(endpoint)
+            if not before:
+                continue
+            changes = []
+            for metric in ("requests_per_second", "p50_ms", "p95_ms", "p99_ms", "queries_per_request"):
+                if metric not in stats or not before.get(metric):
+                    continue
+                change = (stats[metric] - before[metric]) / before[metric] * 100
+                worse = change < 0 if metric in HIGHER_IS_BETTER else change > 0
+                flag = " !" if worse and abs(change) >= 10 else ""
+                changes.append(f"{metric} {change:+.1f}%{flag}")
+            print(f"{mode}/{endpoint}: " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=2000, help="Seeded users, one loan each.")
+    parser.add_argument(
+        "--transactions", type=int, default=20, help="Seeded bank transactions per user."
+    )
+    parser.add_argument("--emis", type=int, default=6, help="Seeded EMI payments per loan.")
+    parser.add_argument("--loans", type=int, default=500, help="Loans the payment/statement runs hit.")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint and mode.")
+    parser.add_argument(
+        "--warmup", type=int, default=20, help="Unmeasured requests before each run."
+    )
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--modes", default="client,server")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", type=Path, default=Path("benchmark-results.json"))
+    parser.add_argument("--compare", type=Path, help="Earlier --output file to diff against.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "endpoints.sqlite3"
+        setup_django(db_path)
+        migrate()
+
+        import django
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+
+        from benchmarks.seed import seed
+
+        seed(args.users, args.transactions, args.emis, random.Random(42))
+        token = Token.objects.create(user=User.objects.create(username="bench")).key
+        rng = random.Random(7)
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "args": {
+                    key: value
+                    for key, value in vars(args).items()
+                    if key not in ("output", "compare")
+                },
+            },
+            "results": {},
+        }
+        for mode in args.modes.split(","):
+            report["results"][mode] = {}
+            for endpoint in args.endpoints.split(","):
+                method, path = ENDPOINTS[endpoint]
+                bodies = payloads(
+                    endpoint, Namespace(requests=args.requests + args.warmup, loans=args.loans), rng
+                )
+                if mode == "client":
+                    stats = run_client(
+                        method, "/api/" + path, token, bodies, args.requests, args.warmup
+                    )
+                else:
+                    stats = run_server(method, path, token, bodies, args, db_path)
+                report["results"][mode][endpoint] = stats
+                queries = (
+                    f", {stats['queries_per_request']:.1f} queries/request"
+                    if "queries_per_request" in stats
+                    else ""
+                )
+                print(
+                    f"{mode}/{endpoint}: {stats['requests_per_second']:,.0f} req/s, "
+                    f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+                    f"p99 {stats['p99_ms']:.1f} ms{queries}, statuses {stats['statuses']}"
+                )
+
+    args.output.write_text(json.dumps(report, indent=2, default=str) + "\n")
+    print(f"\nwrote {args.output}")
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Inserts the same number of UserProfile rows keyed by uuid4 and by the uuid7
+default of PrimaryKeyModel, and prints the insert rate as the table grows and
+the size and fill of the primary key index for each.
+
+    python -m benchmarks.key_layout --rows 10000000 --batch-size 10000
+"""
+import argparse
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from benchmarks.common import migrate, setup_django
+
+TABLE = "CasiniLoanApp_userprofile"
+SLICES = 10
+
+
+def insert_rows(make_key, rows, batch_size):
+    from django.db import connection, transaction
+
+    sql = (
+        f'INSERT INTO "{TABLE}" (id, name, email_id, aadhar_id, annual_income, credit_score) '
+        "VALUES (%s, %s, %s, %s, %s, NULL)"
+    )
+    slice_rows = max(rows // SLICES, 1)
+    rates = []
+    inserted, slice_started = 0, time.perf_counter()
+    started = slice_started
+    while inserted < rows:
+        count = min(batch_size, rows - inserted)
+        params = [
+            (make_key().hex, "bench", "bench@example.com", uuid.uuid4().hex, "500000")
+            for _ in range(count)
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        inserted += count
+        if inserted % slice_rows < count or inserted == rows:
+            now = time.perf_counter()
+            rates.append(slice_rows / (now - slice_started))
+            slice_started = now
+    return rows / (time.perf_counter() - started), rates
+
+
+# Page count and fill of every b-tree on the table, from SQLite's dbstat table.
+def index_stats():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT s.name, COUNT(*), SUM(s.pgsize), SUM(s.unused) "
+            "FROM dbstat AS s JOIN sqlite_master AS m ON m.name = s.name "
+            "WHERE m.tbl_name = %s GROUP BY s.name ORDER BY s.name",
+            [TABLE],
+        )
+        return cursor.fetchall()
+
+
+def primary_key_index():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA index_list('{TABLE}')")
+        return next(row[1] for row in cursor.fetchall() if row[3] == "pk")
+
+
+def reset_table():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{TABLE}"')
+        cursor.execute("VACUUM")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / "bench.sqlite3")
+        migrate()
+
+        from utils.abstract_models import uuid7
+
+        pk_index = primary_key_index()
+        for label, make_key in (("uuid4", uuid.uuid4), ("uuid7", uuid7)):
+            reset_table()
+            rate, rates = insert_rows(make_key, args.rows, args.batch_size)
+            print(f"\n=== {label}: {args.rows:,} rows, {rate:,.0f} rows/s overall")
+            print("rows/s per tenth: " + ", ".join(f"{r:,.0f}" for r in rates))
+            for name, pages, size, unused in index_stats():
+                marker = " (primary key)" if name == pk_index else ""
+                print(
+                    f"  {name}{marker}: {pages:,} pages, {size / 2**20:,.1f} MiB, "
+                    f"{100 * (1 - unused / size):.0f}% full"
+                )
+
+
+if __name__ == "__main__":
+    main()
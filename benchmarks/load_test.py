@@ -0,0 +1,219 @@
+"""
+Load-tests one endpoint served by gunicorn (WSGI, sync DRF views) and by
+uvicorn (ASGI, async views under /api/async/) with the same worker count,
+and prints requests/s and latency percentiles for each.
+
+    python -m benchmarks.load_test --endpoint statement --workers 4 --concurrency 32
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+from benchmarks.common import BASE_DIR, migrate, setup_django, summarize
+
+ENDPOINTS = {
+    "register": ("POST", "register-user/"),
+    "apply": ("POST", "apply-loan/"),
+    "payment": ("POST", "make-payment/"),
+    "statement": ("GET", "get-statement/"),
+}
+SERVERS = {
+    "wsgi": (["-m", "gunicorn", "LoanManager.wsgi:application", "--bind"], "/api/"),
+    "asgi": (
+        ["-m", "uvicorn", "LoanManager.asgi:application", "--no-access-log", "--bind"],
+        "/api/async/",
+    ),
+}
+
+
+def create_profiles(count, rng):
+    from CasiniLoanApp.models import UserProfile
+
+    profiles = [
+        UserProfile(
+            name=f"load-{i}",
+            email_id=f"load{i}@example.com",
+            aadhar_id=uuid.UUID(int=rng.getrandbits(128), version=4),
+            annual_income=Decimal(2000000),
+            credit_score=900,
+        )
+        for i in range(count)
+    ]
+    UserProfile.objects.bulk_create(profiles, batch_size=5000)
+    return profiles
+
+
+def create_loans(profiles):
+    from CasiniLoanApp.views import BulkLoanViewApi
+
+    application = {
+        "loan_type": "car",
+        "loan_amount": 100000,
+        "interest_rate": 15,
+        "term_period": 12,
+        "disbursement_date": "15-01-2024",
+    }
+    results = BulkLoanViewApi().process_loan_applications(
+        [{**application, "unique_user_id": str(profile.id)} for profile in profiles]
+    )
+    return [str(result["loan_id"]) for result in results]
+
+
+# Endless payloads for the chosen endpoint; apply needs a fresh borrower per request.
+def payloads(endpoint, args, rng):
+    if endpoint == "register":
+        return (
+            {
+                "name": "Load User",
+                "email_id": "load@example.com",
+                "aadhar_id": str(uuid.uuid4()),
+                "annual_income": "900000",
+            }
+            for _ in itertools.count()
+        )
+    if endpoint == "apply":
+        return (
+            {
+                "unique_user_id": str(profile.id),
+                "loan_type": "car",
+                "loan_amount": 100000,
+                "interest_rate": 15,
+                "term_period": 12,
+                "disbursement_date": "15-01-2024",
+            }
+            for profile in create_profiles(args.requests, rng)
+        )
+
+    loan_ids = create_loans(create_profiles(args.loans, rng))
+    if endpoint == "payment":
+        return ({"loan_id": rng.choice(loan_ids), "amount": 9025.83} for _ in itertools.count())
+    return ({"loan_id": rng.choice(loan_ids)} for _ in itertools.count())
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, workers, db_path):
+    command, prefix = SERVERS[mode]
+    port = free_port()
+    bind = f"127.0.0.1:{port}"
+    if mode == "asgi":
+        command = command[:-1] + ["--host", "127.0.0.1", "--port", str(port)]
+    else:
+        command = command + [bind]
+    env = dict(
+        os.environ, DJANGO_SETTINGS_MODULE="benchmarks.settings", BENCH_DB_PATH=str(db_path)
+    )
+    process = subprocess.Popen(
+        [sys.executable, *command, "--workers", str(workers)],
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, port, prefix
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+def run_load(port, method, path, token, bodies, total, concurrency):
+    lock = threading.Lock()
+    samples, statuses = [], {}
+    remaining = iter(range(total))
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        headers = {"Authorization": f"Token {token}", "Content-Type": "application/json"}
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    break
+                body = json.dumps(next(bodies))
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                code = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                code = "error"
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples.append(elapsed)
+                statuses[code] = statuses.get(code, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, samples, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="statement")
+    parser.add_argument("--modes", default="wsgi,asgi")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--loans", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "load.sqlite3"
+        setup_django(db_path)
+        migrate()
+
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+
+        token = Token.objects.create(user=User.objects.create(username="load")).key
+        rng = random.Random(42)
+        method, path = ENDPOINTS[args.endpoint]
+
+        for mode in args.modes.split(","):
+            bodies = payloads(args.endpoint, args, rng)
+            process, port, prefix = start_server(mode, args.workers, db_path)
+            try:
+                elapsed, samples, statuses = run_load(
+                    port, method, prefix + path, token, bodies, args.requests, args.concurrency
+                )
+            finally:
+                process.terminate()
+                process.wait()
+            stats = summarize(samples)
+            print(
+                f"{mode}: {args.requests / elapsed:,.0f} req/s, "
+                f"p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms, "
+                f"statuses {dict(sorted(statuses.items(), key=str))}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Seeds a synthetic dataset into a scratch SQLite database and prints
+EXPLAIN QUERY PLAN and latency for the hot lookups in views.py and
+tasks.py, before and after the composite indexes added in migration 0011.
+The database is migrated to head so the seed matches the current models;
+"before" is measured with those two indexes dropped.
+
+    python -m benchmarks.query_plans --users 5000 --transactions 40
+"""
+import argparse
+import random
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import migrate, setup_django, summarize, time_call
+
+# (model, index name) pairs added by 0011_hot_lookup_indexes.
+HOT_LOOKUP_INDEXES = [
+    ("EMITransaction", "emi_txn_user_loan_idx"),
+    ("TransactionStore", "txn_aadhar_type_date_idx"),
+]
+
+
+def hot_lookup_indexes():
+    from django.apps import apps
+
+    for model_name, index_name in HOT_LOOKUP_INDEXES:
+        model = apps.get_model("CasiniLoanApp", model_name)
+        index = next(i for i in model._meta.indexes if i.name == index_name)
+        yield model, index
+
+
+def drop_hot_lookup_indexes():
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        for model, index in hot_lookup_indexes():
+            editor.remove_index(model, index)
+
+
+def restore_hot_lookup_indexes():
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        for model, index in hot_lookup_indexes():
+            editor.add_index(model, index)
+
+
+def hot_queries(profiles, loans, rng):
+    from CasiniLoanApp.balances import totals_query
+    from CasiniLoanApp.models import (
+        EMITransaction,
+        Loan,
+        LoanTransactionDetail,
+        TransactionStore,
+    )
+
+    def random_profile():
+        return rng.choice(profiles)
+
+    def random_loan():
+        return rng.choice(loans)
+
+    def emi_transactions():
+        loan = random_loan()
+        return EMITransaction.objects.filter(user_id=loan.user_id, loan_id=loan.id)
+
+    return {
+        # tasks.credit_score_calculate via refresh_balances
+        "balance refresh": lambda: totals_query(
+            TransactionStore.objects.filter(
+                aadhar_id__in=[random_profile().aadhar_id], id__gt=0
+            )
+        ),
+        "credit total by type": lambda: TransactionStore.objects.filter(
+            aadhar_id=random_profile().aadhar_id, transaction_type="credit"
+        ),
+        # LoanViewApi.get_user_and_loan
+        "loan by user": lambda: Loan.objects.filter(
+            user_id=random_profile().id
+        ).order_by("pk")[:1],
+        # PaymentViewApi.get_loan_and_details / StatementViewApi.get_loan_statement
+        "detail by loan": lambda: LoanTransactionDetail.objects.filter(
+            loan_id=random_loan().id
+        ),
+        # StatementViewApi.get_user_txn
+        "emi txns by user+loan": emi_transactions,
+    }
+
+
+def report(label, queries, repeat):
+    print(f"\n=== {label}")
+    for name, build in queries.items():
+        plan = build().explain()
+        stats = summarize(time_call(lambda: list(build()), repeat))
+        print(
+            f"\n-- {name}: p50 {stats['p50_ms']:.3f} ms, p95 {stats['p95_ms']:.3f} ms"
+        )
+        print(plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument(
+        "--transactions", type=int, default=40, help="Bank transactions per user."
+    )
+    parser.add_argument("--emis", type=int, default=12, help="EMI payments per loan.")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / "bench.sqlite3")
+        migrate()
+
+        from benchmarks.seed import seed
+
+        profiles, loans = seed(args.users, args.transactions, args.emis)
+        rng = random.Random(7)
+        queries = hot_queries(profiles, loans, rng)
+
+        drop_hot_lookup_indexes()
+        report("before (without 0011 indexes)", queries, args.repeat)
+        restore_hot_lookup_indexes()
+        report("after (with 0011 indexes)", queries, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Times rendering a 360-installment loan statement with DRF's JSONRenderer and with
+the orjson-backed renderer in CasiniLoanApp.renderers, and parsing the resulting
+body with both parsers.
+
+    python -m benchmarks.renderers --installments 360 --repeat 2000
+"""
+import argparse
+import io
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+from benchmarks.common import setup_django, summarize, time_call
+
+
+# A statement as StatementViewApi.build_statement returns it: a year of payments made
+# and the rest of the schedule still due.
+def statement(installments, paid=12):
+    from CasiniLoanApp.views import StatementViewApi
+
+    view = StatementViewApi()
+    loan = SimpleNamespace(interest_rate=Decimal("15.000"), rem_amount=Decimal("8421055.125"))
+    started = datetime(2024, 1, 1, 9, 30, tzinfo=timezone.utc)
+    payments = [
+        {"id": i, "payment_date": started + timedelta(days=30 * i), "payment": Decimal("9025.830")}
+        for i in range(paid)
+    ]
+    due = [
+        {
+            "installment_no": i,
+            "due_date": date(2025 + i // 12, i % 12 + 1, 1),
+            "amount_due": Decimal("9025.83"),
+            "amount_paid": Decimal("0.00") if i else Decimal("1200.00"),
+        }
+        for i in range(installments - paid)
+    ]
+    return {
+        "prev_txn": view.get_prev_txn(payments, loan),
+        "upcoming_transactions": view.format_upcoming(due),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--installments", type=int, default=360)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / "bench.sqlite3")
+
+        from rest_framework import parsers, renderers
+
+        from CasiniLoanApp.parsers import JSONParser
+        from CasiniLoanApp.renderers import JSONRenderer
+
+        data = statement(args.installments)
+        old, new = renderers.JSONRenderer(), JSONRenderer()
+        body = old.render(data)
+        assert new.render(data) == body, "renderers disagree"
+        print(f"statement: {args.installments} installments, {len(body):,} bytes")
+
+        timings = {
+            "render drf": lambda: old.render(data),
+            "render orjson": lambda: new.render(data),
+            "parse drf": lambda: parsers.JSONParser().parse(io.BytesIO(body)),
+            "parse orjson": lambda: JSONParser().parse(io.BytesIO(body)),
+        }
+        results = {}
+        for label, func in timings.items():
+            time_call(func, min(args.repeat, 100))
+            results[label] = summarize(time_call(func, args.repeat))
+            stats = results[label]
+            print(
+                f"{label}: mean {stats['mean_ms'] * 1000:,.0f} us, "
+                f"p50 {stats['p50_ms'] * 1000:,.0f} us, p99 {stats['p99_ms'] * 1000:,.0f} us"
+            )
+        for step in ("render", "parse"):
+            speedup = results[f"{step} drf"]["mean_ms"] / results[f"{step} orjson"]["mean_ms"]
+            print(f"{step}: orjson {speedup:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import random
+import uuid
+from decimal import Decimal
+
+BATCH_SIZE = 5000
+
+
+# Bulk-loads synthetic users, one loan each, and bank/EMI transaction history.
+def seed(users, transactions_per_user, emis_per_loan, rng=None):
+    from CasiniLoanApp.models import (
+        EMITransaction,
+        Loan,
+        LoanTransactionDetail,
+        TransactionStore,
+        UserProfile,
+    )
+
+    rng = rng or random.Random(42)
+    profiles = [
+        UserProfile(
+            name=f"user-{i}",
+            email_id=f"user{i}@example.com",
+            aadhar_id=uuid.UUID(int=rng.getrandbits(128), version=4),
+            annual_income=Decimal(rng.randint(150000, 5000000)),
+            credit_score=rng.choice([None, 300, 450, 600, 900]),
+        )
+        for i in range(users)
+    ]
+    UserProfile.objects.bulk_create(profiles, batch_size=BATCH_SIZE)
+
+    loans = [
+        Loan(
+            user=profile,
+            loan_type=rng.choice(["car", "home", "education", "personal"]),
+            principal_amount=rng.randint(50000, 5000000),
+            interest_rate=Decimal(rng.choice(["14.5", "15", "18", "21"])),
+            loan_term=rng.choice([12, 24, 60, 120, 360]),
+            rem_amount=rng.randint(10000, 5000000),
+        )
+        for profile in profiles
+    ]
+    Loan.objects.bulk_create(loans, batch_size=BATCH_SIZE)
+
+    LoanTransactionDetail.objects.bulk_create(
+        [
+            LoanTransactionDetail(
+                loan=loan,
+                init_emi_amounts="",
+                emi_rem=loan.loan_term,
+                new_emi_amt=Decimal(loan.principal_amount) / loan.loan_term,
+            )
+            for loan in loans
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    _bulk_create_stream(
+        TransactionStore,
+        (
+            TransactionStore(
+                aadhar_id=profile.aadhar_id,
+                amount=Decimal(rng.randint(100, 200000)),
+                transaction_type=rng.choice(["credit", "credit", "debit"]),
+            )
+            for profile in profiles
+            for _ in range(transactions_per_user)
+        ),
+    )
+    _bulk_create_stream(
+        EMITransaction,
+        (
+            EMITransaction(
+                user_id=loan.user_id,
+                loan=loan,
+                payment=Decimal(rng.randint(1000, 50000)),
+            )
+            for loan in loans
+            for _ in range(emis_per_loan)
+        ),
+    )
+    return profiles, loans
+
+
+def _bulk_create_stream(model, objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    model.objects.bulk_create(batch)
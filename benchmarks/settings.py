@@ -0,0 +1,9 @@
+# Project settings for servers started by the benchmarks, pointed at the scratch
+# database named in BENCH_DB_PATH so db.sqlite3 is never touched.
+import os
+
+from LoanManager.settings import *  # noqa: F401,F403
+from LoanManager.settings import DATABASES
+
+DATABASES["default"]["NAME"] = os.environ["BENCH_DB_PATH"]
+DATABASES["replica"]["NAME"] = os.environ.get("DATABASE_REPLICA_NAME", os.environ["BENCH_DB_PATH"])
@@ -0,0 +1,8 @@
+# Picked up by gunicorn when started from this directory.
+
+
+# Let the metrics files shared through PROMETHEUS_MULTIPROC_DIR know a worker has exited.
+def child_exit(server, worker):
+    from CasiniLoanApp.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
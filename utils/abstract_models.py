@@ -1,9 +1,47 @@
+import os
+import threading
+import time
 import uuid
 from django.db import models
 
+_uuid7_lock = threading.Lock()
+_uuid7_last_millis = 0
+_uuid7_counter = 0
+
+
+# Time-ordered UUID (RFC 9562 version 7): a 48-bit Unix millisecond timestamp ahead of
+# random bits, so new keys land at the right-hand edge of the primary key index
+# instead of splitting pages all over it the way uuid4 does. rand_a holds a 12-bit
+# counter (RFC 9562 section 6.2, method 1), so keys from one process also sort in
+# creation order within a millisecond; when it overflows the timestamp moves on a
+# millisecond early, and a clock stepping back never makes keys go backwards.
+def uuid7():
+    global _uuid7_last_millis, _uuid7_counter
+    rand = int.from_bytes(os.urandom(10), "big")
+    with _uuid7_lock:
+        millis = time.time_ns() // 1_000_000
+        if millis > _uuid7_last_millis:
+            _uuid7_last_millis = millis
+            # Random start in the lower half, leaving room to count up.
+            _uuid7_counter = rand >> 69
+        else:
+            _uuid7_counter += 1
+            if _uuid7_counter > 0xFFF:
+                _uuid7_last_millis += 1
+                _uuid7_counter = 0
+        millis, counter = _uuid7_last_millis, _uuid7_counter
+    value = (
+        (millis & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | counter << 64
+        | 0b10 << 62
+        | rand & 0x3FFF_FFFF_FFFF_FFFF
+    )
+    return uuid.UUID(int=value)
+
 
 class PrimaryKeyModel(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    id = models.UUIDField(primary_key=True, default=uuid7)
 
     class Meta:
         abstract = True